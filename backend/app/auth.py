@@ -1,31 +1,40 @@
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, Optional, Tuple
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
 
 from app.config import settings
-from app.database import get_db
-from app.models import User
+from app.database import get_db, get_async_db
+from app.models import User, DriverProfile
+from app.services.passwords import password_service
 
-# Handle bcrypt version issue
-try:
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-except AttributeError:
-    # Fallback if there's an issue with bcrypt version detection
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__backends=["bcrypt"])
+# Hashing is configured in the password service; pwd_context kept for existing imports
+pwd_context = password_service.context
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a password against a hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    """Verify a password against a hash (blocking; use verify_password_async in handlers)"""
+    return password_service.verify_sync(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    """Hash a password"""
-    return pwd_context.hash(password)
+    """Hash a password (blocking; use get_password_hash_async in handlers)"""
+    return password_service.hash_sync(password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against a hash in the hashing thread pool"""
+    return await password_service.verify(plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password in the hashing thread pool"""
+    return await password_service.hash(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token"""
@@ -47,8 +56,134 @@ def decode_access_token(token: str) -> Optional[dict]:
     except JWTError:
         return None
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
-    """Get the current authenticated user"""
+class PrincipalCache:
+    """
+    Short-lived cache of authenticated users keyed by token subject (email),
+    with their driver profile loaded. Entries are detached snapshots that are
+    merged into the request session without a query.
+
+    Invalidation is per process: commits made by this worker drop the entry,
+    but writes from other workers only show up once it expires, so any
+    column can be up to ttl_seconds old. Treat mutable columns such as
+    wallet_balance as display-only; anything that reads and writes them
+    must re-select (populate_existing) or use an atomic UPDATE.
+    """
+
+    def __init__(self, ttl_seconds: float = 30, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._by_email: "OrderedDict[str, Tuple[float, User]]" = OrderedDict()
+        self._email_by_id: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def get(self, email: str) -> Optional[User]:
+        if self.ttl_seconds <= 0:
+            return None
+        with self._lock:
+            entry = self._by_email.get(email)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if time.monotonic() > expires_at:
+                self._drop_locked(email)
+                return None
+            self._by_email.move_to_end(email)
+            return user
+
+    def put(self, email: str, user: User):
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._drop_locked(email)
+            self._by_email[email] = (time.monotonic() + self.ttl_seconds, user)
+            self._email_by_id[user.id] = email
+            while len(self._by_email) > self.max_entries:
+                self._drop_locked(next(iter(self._by_email)))
+
+    def _drop_locked(self, email: str):
+        entry = self._by_email.pop(email, None)
+        if entry is not None and self._email_by_id.get(entry[1].id) == email:
+            del self._email_by_id[entry[1].id]
+
+    def invalidate(self, user_id: Optional[int] = None, email: Optional[str] = None):
+        with self._lock:
+            if user_id is not None:
+                cached_email = self._email_by_id.get(user_id)
+                if cached_email is not None:
+                    self._drop_locked(cached_email)
+            if email is not None:
+                self._drop_locked(email)
+
+    def clear(self):
+        with self._lock:
+            self._by_email.clear()
+            self._email_by_id.clear()
+
+principal_cache = PrincipalCache(ttl_seconds=settings.principal_cache_ttl_seconds)
+
+_PENDING_PRINCIPALS = "pending_principal_invalidations"
+
+def invalidate_principal_on_commit(session: Session, user_id: Optional[int]):
+    """
+    Drop the user's cached principal once `session` commits. For writes the
+    flush hook cannot see (bulk UPDATEs); pass AsyncSession.sync_session.
+    Invalidating before the commit would let a concurrent request re-cache
+    the old row in between.
+    """
+    if user_id is not None:
+        session.info.setdefault(_PENDING_PRINCIPALS, set()).add(user_id)
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_principals(session, flush_context):
+    """Remember users whose row or driver profile was written through the ORM"""
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User):
+            invalidate_principal_on_commit(session, obj.id)
+        elif isinstance(obj, DriverProfile):
+            invalidate_principal_on_commit(session, obj.user_id)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_principals(session):
+    for user_id in session.info.pop(_PENDING_PRINCIPALS, ()):
+        principal_cache.invalidate(user_id=user_id)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_principals(session):
+    session.info.pop(_PENDING_PRINCIPALS, None)
+
+def _cache_principal(db, email: str, user: User) -> User:
+    """Detach a freshly loaded user (and profile) and keep it as the cached snapshot"""
+    if user.driver_profile is not None:
+        db.expunge(user.driver_profile)
+    db.expunge(user)
+    principal_cache.put(email, user)
+    return user
+
+def load_principal(db: Session, email: str) -> Optional[User]:
+    """User (with driver profile) for a token subject, served from the principal cache when fresh"""
+    cached = principal_cache.get(email)
+    if cached is None:
+        user = db.query(User).options(joinedload(User.driver_profile)).filter(User.email == email).first()
+        if user is None:
+            return None
+        cached = _cache_principal(db, email, user)
+    # The request gets its own session-bound copy of the snapshot
+    return db.merge(cached, load=False)
+
+async def load_principal_async(db: AsyncSession, email: str) -> Optional[User]:
+    """load_principal for AsyncSession handlers"""
+    cached = principal_cache.get(email)
+    if cached is None:
+        result = await db.execute(
+            select(User).options(joinedload(User.driver_profile)).where(User.email == email)
+        )
+        user = result.scalars().first()
+        if user is None:
+            return None
+        cached = _cache_principal(db, email, user)
+    return await db.merge(cached, load=False)
+
+def _token_subject(token: str) -> str:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -63,17 +198,37 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     if email is None:
         raise credentials_exception
     
-    user = db.query(User).filter(User.email == email).first()
+    return email
+
+def _require_principal(user: Optional[User]) -> User:
     if user is None:
-        raise credentials_exception
-    
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
 
+def _require_active(user: User) -> User:
+    if not user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return user
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+    """Get the current authenticated user"""
+    return _require_principal(load_principal(db, _token_subject(token)))
+
 async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
     """Get the current active user"""
-    if not current_user.is_active:
-        raise HTTPException(status_code=400, detail="Inactive user")
-    return current_user
+    return _require_active(current_user)
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> User:
+    """Get the current authenticated user, bound to the request's AsyncSession"""
+    return _require_principal(await load_principal_async(db, _token_subject(token)))
+
+async def get_current_active_user_async(current_user: User = Depends(get_current_user_async)) -> User:
+    """Get the current active user, bound to the request's AsyncSession"""
+    return _require_active(current_user)
 
 async def require_role(required_roles: list):
     """Dependency to require specific user roles"""
@@ -3,12 +3,54 @@ from functools import lru_cache
 
 class Settings(BaseSettings):
     database_url: str
+    # Connection pool (ignored for SQLite); applies to the sync and async engines
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    # SQLite (local / dev)
+    sqlite_wal: bool = True
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout_ms: int = 5000
     secret_key: str
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 1440
+    principal_cache_ttl_seconds: float = 30  # per worker (other workers' writes show up after expiry); 0 disables
+    bcrypt_rounds: int = 12  # existing hashes are upgraded on next login when this changes
+    password_hash_workers: int = 4
     google_maps_api_key: str = ""
+    # Outbound HTTP (shared pooled client for weather / geocoding / OSM)
+    http_timeout_seconds: float = 10.0
+    http_max_connections: int = 20
+    geocoding_url: str = "https://geocoding-api.open-meteo.com/v1/search"
+    forecast_url: str = "https://api.open-meteo.com/v1/forecast"
+    overpass_url: str = "http://overpass-api.de/api/interpreter"
+    # Upstream result caches: in-process LRU, plus a shared Redis tier with cache_backend="redis"
+    cache_backend: str = "memory"
+    cache_max_entries: int = 1024
+    geocode_cache_ttl_seconds: float = 7 * 24 * 3600
+    forecast_cache_ttl_seconds: float = 3600
+    travel_buddy_tool_timeout_seconds: float = 8.0  # per research tool; slower tools fall back
+    itinerary_cache_ttl_seconds: float = 3600  # capped at the forecast TTL; 0 disables
+    itinerary_budget_bucket_percent: float = 5  # cache-key budget step, relative so it fits any currency (0 keeps budgets exact)
     stripe_secret_key: str = ""
     redis_url: str = "redis://localhost:6379"
+    websocket_backend: str = "memory"  # "memory" (single worker), "redis" or "fakeredis"
+    websocket_queue_size: int = 100
+    websocket_send_timeout_seconds: float = 5.0
+    
+    # Logging
+    log_level: str = "INFO"
+    log_levels: str = ""  # per-module overrides, e.g. "app.routers.rides=DEBUG,sqlalchemy.engine=WARNING"
+    log_format: str = "json"  # "json" or "text"
+    log_sample_rate: float = 1.0  # fraction of DEBUG/INFO records kept
+    log_queue_size: int = 10000
+    
+    # SQL instrumentation (development / tests)
+    sql_query_budget: int = 0  # statements per request before warning; 0 disables
+    sql_repeat_threshold: int = 0  # warn when one statement shape repeats this often in a request (N+1); 0 disables
+    sql_budget_strict: bool = False  # raise QueryBudgetExceeded instead of warning
     
     # Email Settings (SMTP)
     email_host: str = "smtp.gmail.com"
@@ -16,7 +58,14 @@ class Settings(BaseSettings):
     email_username: str = ""
     email_password: str = ""
     email_from: str = "noreply@voyago.com"
-    
+
+    # Driver Matching
+    driver_index_cell_deg: float = 0.1
+    driver_index_refresh_seconds: int = 30
+    dispatch_wave_size: int = 5
+    dispatch_wave_timeout_seconds: float = 15.0
+    dispatch_max_waves: int = 5
+
     class Config:
         env_file = ".env"
 
@@ -1,6 +1,11 @@
-from sqlalchemy import create_engine
+import threading
+import time
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from app.config import settings
 
 # Handle Render / Supabase postgres:// URL format for newer SQLAlchemy
@@ -8,15 +13,114 @@ sqlalchemy_database_url = (settings.database_url or "").strip()
 if sqlalchemy_database_url.startswith("postgres://"):
     sqlalchemy_database_url = sqlalchemy_database_url.replace("postgres://", "postgresql://", 1)
 
-if sqlalchemy_database_url and sqlalchemy_database_url.startswith("sqlite"):
+is_sqlite = sqlalchemy_database_url.startswith("sqlite")
+is_sqlite_memory = is_sqlite and (":memory:" in sqlalchemy_database_url or sqlalchemy_database_url.rstrip("/") in ("sqlite:", "sqlite+pysqlite:"))
+
+
+class PoolStats:
+    """Checkout counters for one engine's pool, read by /health/db"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, waited: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def snapshot(self, pool) -> dict:
+        with self._lock:
+            checkouts = self.checkouts
+            attempts = checkouts + self.timeouts
+            data = {
+                "checkouts": checkouts,
+                "checkout_timeouts": self.timeouts,
+                "wait_seconds_total": round(self.wait_seconds_total, 4),
+                "wait_seconds_max": round(self.wait_seconds_max, 4),
+                "wait_seconds_avg": round(self.wait_seconds_total / attempts, 6) if attempts else 0.0
+            }
+        data.update({
+            "pool_class": type(pool).__name__,
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "max_overflow": getattr(pool, "_max_overflow", None),
+            "timeout": pool.timeout()
+        })
+        return data
+
+
+class TimedPoolMixin:
+    """Times every checkout (including waits for a free connection) into cls.stats"""
+
+    stats: PoolStats
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.stats.record(time.perf_counter() - start)
+        return conn
+
+
+def timed_pool_class(base, stats: PoolStats):
+    # Stats live on the class so they survive Pool.recreate() (which rebuilds via self.__class__)
+    return type(f"Timed{base.__name__}", (TimedPoolMixin, base), {"stats": stats})
+
+
+engine_stats = PoolStats("sync")
+async_engine_stats = PoolStats("async")
+
+def pool_options(base) -> dict:
+    """Pool arguments for an engine; SQLite keeps SQLAlchemy's sizing, in-memory SQLite its own pool"""
+    if is_sqlite_memory:
+        return {}
+    stats = async_engine_stats if base is AsyncAdaptedQueuePool else engine_stats
+    options = {"poolclass": timed_pool_class(base, stats)}
+    if not is_sqlite:
+        options.update(
+            pool_pre_ping=settings.db_pool_pre_ping,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=settings.db_pool_recycle
+        )
+    return options
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL lets readers run alongside a writer; busy_timeout waits on locks instead of failing"""
+    cursor = dbapi_connection.cursor()
+    try:
+        if settings.sqlite_wal and not is_sqlite_memory:
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+    finally:
+        cursor.close()
+
+if sqlalchemy_database_url and is_sqlite:
     engine = create_engine(
         sqlalchemy_database_url,
-        connect_args={"check_same_thread": False}
+        connect_args={"check_same_thread": False},
+        **pool_options(QueuePool)
     )
 else:
     engine = create_engine(
         sqlalchemy_database_url,
-        pool_pre_ping=True
+        **pool_options(QueuePool)
     )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -28,3 +132,48 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def build_async_url(url: str):
+    """Same database through an asyncio driver (aiosqlite / asyncpg), plus driver connect args"""
+    async_url = make_url(url)
+    connect_args = {}
+    if async_url.drivername.startswith("sqlite"):
+        async_url = async_url.set(drivername="sqlite+aiosqlite")
+    elif async_url.drivername.startswith("postgresql"):
+        # asyncpg takes ssl as a connect argument instead of libpq's sslmode
+        query = dict(async_url.query)
+        sslmode = query.pop("sslmode", None)
+        if sslmode:
+            connect_args["ssl"] = sslmode
+        async_url = async_url.set(drivername="postgresql+asyncpg", query=query)
+    return async_url, connect_args
+
+# Async path for request handlers: queries await the driver instead of blocking the event loop
+async_database_url, async_connect_args = build_async_url(sqlalchemy_database_url)
+async_engine = create_async_engine(
+    async_database_url,
+    connect_args=async_connect_args,
+    **pool_options(AsyncAdaptedQueuePool)
+)
+
+if is_sqlite:
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+
+# expire_on_commit=False: attributes stay readable after commit without an implicit (sync) reload
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False, class_=AsyncSession)
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def pool_metrics() -> dict:
+    """Connection pool usage for both engines"""
+    metrics = {}
+    for name, eng, stats in (("sync", engine, engine_stats), ("async", async_engine.sync_engine, async_engine_stats)):
+        pool = eng.pool
+        if isinstance(pool, TimedPoolMixin):
+            metrics[name] = stats.snapshot(pool)
+        else:
+            metrics[name] = {"pool_class": type(pool).__name__, "status": pool.status()}
+    return metrics
@@ -0,0 +1,214 @@
+"""
+In-process request metrics rendered in the Prometheus text exposition format.
+
+- http_request_duration_seconds: latency histogram per method and route
+- http_requests_total: responses per method, route and status code
+- http_requests_in_flight: requests currently being handled
+- http_request_db_queries: SQL statements executed per request, per route
+  (counted by app.sql_audit)
+- websocket_connections / websocket_users: sockets held by this worker
+
+Route labels are the route template ("/rides/{ride_id}"), with the /api
+prefix stripped so the duplicated /api/* and /* mounts report as one route.
+Metrics are per worker process; scrape every worker or run a single one.
+"""
+
+import bisect
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in items
+        ]
+
+
+class Gauge(Metric):
+    """Settable gauge; pass `callback` to read the value at scrape time instead"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation)
+        self.callback = callback
+        self._value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    def set(self, value: float):
+        with self._lock:
+            self._value = value
+
+    @property
+    def value(self) -> float:
+        return float(self.callback()) if self.callback else self._value
+
+    def render(self) -> List[str]:
+        return self.header() + [f"{self.name} {_format_value(self.value)}"]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (non-cumulative, last one is +Inf), sum]
+        self._series: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, *labels: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._series.items())
+        lines = self.header()
+        for labels, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                bucket_labels = _format_labels(self.labelnames, labels, 'le="%s"' % le)
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency in seconds", ("method", "route")
+))
+requests_total = registry.register(Counter(
+    "http_requests_total", "HTTP responses by status code", ("method", "route", "status")
+))
+requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled"
+))
+request_db_queries = registry.register(Histogram(
+    "http_request_db_queries", "SQL statements executed per HTTP request", ("method", "route"), buckets=QUERY_BUCKETS
+))
+db_queries_total = registry.register(Counter(
+    "db_queries_total", "SQL statements executed, including outside requests"
+))
+
+
+def register_gauge(name: str, documentation: str, callback: Callable[[], float]) -> Gauge:
+    return registry.register(Gauge(name, documentation, callback=callback))
+
+
+class RouteLabeler:
+    """Maps a matched endpoint to its route template, collapsing the /api mounts"""
+
+    def __init__(self, prefix: str = "/api"):
+        self.prefix = prefix
+        self._labels: Optional[Dict[Callable, str]] = None
+
+    def _normalize(self, path: str) -> str:
+        if path == self.prefix or path.startswith(self.prefix + "/"):
+            path = path[len(self.prefix):] or "/"
+        return path
+
+    def _build(self, routes) -> Dict[Callable, str]:
+        labels = {}
+        for route in routes:
+            endpoint = getattr(route, "endpoint", None)
+            path = getattr(route, "path", None)
+            if endpoint is not None and path is not None:
+                labels.setdefault(endpoint, self._normalize(path))
+        return labels
+
+    def label(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if self._labels is None:
+            self._labels = self._build(scope["app"].routes)
+        return self._labels.get(endpoint, "unmatched")
+
+
+route_labeler = RouteLabeler()
+
+
+def render_metrics() -> str:
+    return registry.render()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Enum, Text
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Enum, Text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -64,6 +64,8 @@ class DriverProfile(Base):
     vehicle_color = Column(String, nullable=True)
     city = Column(String, nullable=True)
     rating = Column(Float, default=5.0)
+    rating_sum = Column(Integer, default=0)  # Running totals behind `rating`
+    rating_count = Column(Integer, default=0)
     total_rides = Column(Integer, default=0)
     is_available = Column(Boolean, default=True)
     current_lat = Column(Float, nullable=True)
@@ -104,6 +106,11 @@ class Ride(Base):
     driver = relationship("User", back_populates="rides_as_driver", foreign_keys=[driver_id])
     vacation = relationship("Vacation", back_populates="rides")
 
+    __table_args__ = (
+        # Serves the pending-ride queue polled by drivers (GET /rides/available)
+        Index("ix_rides_status_driver_vehicle_created", "status", "driver_id", "vehicle_type", "created_at"),
+    )
+
 class City(Base):
     __tablename__ = "cities"
     
@@ -224,6 +231,13 @@ class Message(Base):
     receiver = relationship("User", foreign_keys=[receiver_id])
     ride = relationship("Ride")
 
+    __table_args__ = (
+        # Conversation lookups and the per-counterpart summaries (GET /messages/recent)
+        Index("ix_messages_sender_receiver_created", "sender_id", "receiver_id", "created_at"),
+        # Unread counts for the receiving side
+        Index("ix_messages_receiver_is_read", "receiver_id", "is_read"),
+    )
+
 class SavedCard(Base):
     __tablename__ = "saved_cards"
     
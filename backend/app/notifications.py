@@ -5,6 +5,9 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from typing import List
+from app.log import get_logger
+
+logger = get_logger(__name__)
 
 class NotificationService:
     """Service for sending notifications via various channels"""
@@ -13,26 +16,25 @@ class NotificationService:
     def send_ride_notification(user_email: str, ride_status: str, ride_details: dict):
         """Send ride status notification"""
         # In production, implement actual email/SMS sending
-        print(f"📧 Notification to {user_email}: Ride status changed to {ride_status}")
-        print(f"   Details: {ride_details}")
+        logger.info("📧 Notification to %s: Ride status changed to %s (%s)", user_email, ride_status, ride_details)
         return True
     
     @staticmethod
     def send_driver_assignment(rider_email: str, driver_name: str, ride_id: int):
         """Notify rider that a driver has been assigned"""
-        print(f"📧 Driver {driver_name} assigned to ride #{ride_id} for {rider_email}")
+        logger.info("📧 Driver %s assigned to ride #%s for %s", driver_name, ride_id, rider_email)
         return True
     
     @staticmethod
     def send_booking_confirmation(user_email: str, booking_type: str, booking_id: str):
         """Send booking confirmation"""
-        print(f"📧 {booking_type} booking confirmed for {user_email}: {booking_id}")
+        logger.info("📧 %s booking confirmed for %s: %s", booking_type, user_email, booking_id)
         return True
     
     @staticmethod
     async def send_sms(phone_number: str, message: str):
         """Send SMS notification (placeholder for Twilio integration)"""
-        print(f"📱 SMS to {phone_number}: {message}")
+        logger.info("📱 SMS to %s: %s", phone_number, message)
         return True
 
 notification_service = NotificationService()
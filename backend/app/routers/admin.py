@@ -7,6 +7,8 @@ from app.database import get_db
 from app.models import User, Ride, DriverProfile, UserRole, RideStatus
 from app.schemas import AdminStats, UserResponse
 from app.auth import get_current_active_user
+from app.services.driver_index import driver_spatial_index, driver_city_index
+from app.services.ttl_cache import caches
 
 router = APIRouter()
 
@@ -36,7 +38,8 @@ async def get_admin_stats(
     
     # Calculate Platform Revenue (Admin Wallet Balance or Sum of Platform Fees)
     # Method 1: Get Admin User Wallet Balance (Most Accurate based on new rides.py logic)
-    admin_user = db.query(User).filter(User.role == UserRole.ADMIN).first()
+    # populate_existing: the requesting admin may already be in the session as a cached principal
+    admin_user = db.query(User).filter(User.role == UserRole.ADMIN).order_by(User.id).execution_options(populate_existing=True).first()
     total_revenue = float(admin_user.wallet_balance) if admin_user and admin_user.wallet_balance else 0.0
     
     return {
@@ -82,6 +85,10 @@ async def toggle_user_active(
     user.is_active = not user.is_active
     db.commit()
     
+    if user.driver_profile:
+        driver_spatial_index.sync_profile(user.driver_profile, bool(user.is_active))
+        driver_city_index.sync_profile(user.driver_profile, bool(user.is_active))
+    
     return {
         "user_id": user.id,
         "is_active": user.is_active,
@@ -111,11 +118,38 @@ async def delete_user(
     
     db.delete(user)
     db.commit()
+    driver_spatial_index.remove(user_id)
+    driver_city_index.remove(user_id)
     
     return {"message": "User deleted successfully"}
 
+@router.get("/cache")
+async def get_cache_stats(current_user: User = Depends(verify_admin)):
+    """Result caches on this worker (hit rates are on /metrics as cache_requests_total)"""
+    return {
+        name: {"local_entries": len(cache.local), "shared_tier": cache.redis is not None}
+        for name, cache in caches.items()
+    }
+
+@router.delete("/cache/{name}")
+async def purge_cache(
+    name: str,
+    prefix: str = "",
+    current_user: User = Depends(verify_admin)
+):
+    """
+    Purge a cache ("itinerary", "geocode", "forecast") from this worker and
+    the shared Redis tier. Itinerary keys start with the lowercased city,
+    so prefix="goa:" drops every cached Goa guide.
+    """
+    cache = caches.get(name)
+    if not cache:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cache not found")
+    purged = await cache.invalidate_prefix(prefix)
+    return {"cache": name, "prefix": prefix, "purged": purged}
+
 # --- SEEDING ENDPOINT (FOR DEV ONLY) ---
-from app.auth import get_password_hash
+from app.auth import get_password_hash_async
 @router.post("/seed")
 async def seed_database(
     secret: str,
@@ -135,7 +169,7 @@ async def seed_database(
         {"name": "Driver Five", "email": "driver5@example.com", "phone": "9999999905", "city": "Bangalore"},
     ]
     
-    password_hash = get_password_hash("driver123")
+    password_hash = await get_password_hash_async("driver123")
     
     for i, d in enumerate(test_drivers):
         existing = db.query(User).filter(User.email == d["email"]).first()
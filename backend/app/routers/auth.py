@@ -9,9 +9,13 @@ from app.database import get_db
 from app.models import User, UserRole, DriverProfile, LoyaltyPoints
 from app.schemas import UserCreate, UserResponse, Token, DriverProfileCreate, OTPVerify, EmailOTP, VerifyEmailOTP
 from pydantic import BaseModel
-from app.auth import get_password_hash, verify_password, create_access_token
+from app.auth import get_password_hash_async, create_access_token
+from app.services.passwords import password_service
+from app.services.driver_index import driver_city_index
+from app.log import get_logger
 
 router = APIRouter()
+logger = get_logger(__name__)
 
 @router.post("/register", response_model=Token, status_code=status.HTTP_201_CREATED)
 async def register(user_data: UserCreate, db: Session = Depends(get_db)):
@@ -25,7 +29,7 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     
     try:
         new_user = User(
@@ -69,7 +73,7 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
         }
     except Exception as e:
         db.rollback()
-        print(f"--- REGISTRATION ERROR: {e} ---")
+        logger.exception("Registration failed for %s", user_data.email)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Registration failed: {str(e)}"
@@ -87,7 +91,8 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
             headers={"WWW-Authenticate": "Bearer"},
         )
         
-    if not verify_password(form_data.password, user.password):
+    password_ok, new_hash = await password_service.verify_and_update(form_data.password, user.password)
+    if not password_ok:
         # Temp debug: return hash comparison info
         # WARNING: This leaks hash info, remove after debug
         raise HTTPException(
@@ -102,6 +107,12 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
             detail="Debug: Inactive user account"
         )
     
+    if new_hash:
+        # Stored hash used a different bcrypt cost; upgrade it now that we know the password
+        user.password = new_hash
+        db.commit()
+        db.refresh(user)
+    
     access_token = create_access_token(data={"sub": user.email})
     
     return {
@@ -136,7 +147,7 @@ async def register_driver(
         )
     
     # Create new driver user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     
     new_user = User(
         name=user_data.name,
@@ -166,6 +177,7 @@ async def register_driver(
     
     db.add(new_driver_profile)
     db.commit()
+    driver_city_index.sync_profile(new_driver_profile)
     
     # Create access token
     access_token = create_access_token(data={"sub": new_user.email})
@@ -257,9 +269,7 @@ def send_email_otp(data: EmailOTP):
     # Store OTP
     email_otp_storage[data.email] = otp
     
-    print(f"============================================")
-    print(f"📧 EMAIL OTP for {data.email}: {otp}")
-    print(f"============================================")
+    logger.info("📧 EMAIL OTP for %s: %s", data.email, otp)
     
     # Try sending via SMTP if credentials exist
     if settings.email_username and settings.email_password:
@@ -286,14 +296,14 @@ def send_email_otp(data: EmailOTP):
                 server.login(settings.email_username, settings.email_password)
                 server.send_message(msg)
                 
-            print(f"INFO: OTP email sent to {data.email}")
+            logger.info("OTP email sent to %s", data.email)
             return {"message": f"OTP sent to {data.email}"} 
             
         except Exception as e:
-            print(f"SMTP Error: {e}")
+            logger.error("SMTP error sending OTP to %s: %s", data.email, e)
             raise HTTPException(status_code=500, detail="Failed to send OTP email")
     
-    print("ERROR: SMTP Credentials missing")
+    logger.error("SMTP Credentials missing")
     raise HTTPException(status_code=500, detail="Email service not configured")
 
 @router.post("/verify-email-otp")
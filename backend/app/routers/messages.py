@@ -1,13 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_, desc, func
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, or_, and_, desc, func, case
 from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime
 
-from app.database import get_db
+from app.database import get_async_db
 from app import models
-from app.auth import get_current_user
+from app.auth import get_current_user_async
 from app.websocket import manager
 
 router = APIRouter()
@@ -36,14 +36,25 @@ class ConversationSummary(BaseModel):
     timestamp: datetime
     unread_count: int
 
+class ReadReceipt(BaseModel):
+    other_user_id: int
+    up_to_id: Optional[int]
+    marked_read: int
+
+def conversation_filter(user_id: int, other_user_id: int):
+    return or_(
+        and_(models.Message.sender_id == user_id, models.Message.receiver_id == other_user_id),
+        and_(models.Message.sender_id == other_user_id, models.Message.receiver_id == user_id)
+    )
+
 @router.post("/send", response_model=MessageOut)
 async def send_message(
     msg: MessageCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user_async)
 ):
     # Verify receiver exists
-    receiver = db.query(models.User).filter(models.User.id == msg.receiver_id).first()
+    receiver = await db.get(models.User, msg.receiver_id)
     if not receiver:
         raise HTTPException(status_code=404, detail="Receiver not found")
 
@@ -54,8 +65,8 @@ async def send_message(
         ride_id=msg.ride_id
     )
     db.add(new_message)
-    db.commit()
-    db.refresh(new_message)
+    await db.commit()
+    await db.refresh(new_message)
 
     # Prepare real-time notification
     notification = {
@@ -76,60 +87,119 @@ async def send_message(
     return new_message
 
 @router.get("/conversation/{other_user_id}", response_model=List[MessageOut])
-def get_conversation(
+async def get_conversation(
     other_user_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    response: Response,
+    before: Optional[int] = Query(None, ge=1, description="Only messages older than this message id"),
+    after: Optional[int] = Query(None, ge=0, description="Only messages newer than this message id"),
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user_async)
 ):
-    messages = db.query(models.Message).filter(
-        or_(
-            and_(models.Message.sender_id == current_user.id, models.Message.receiver_id == other_user_id),
-            and_(models.Message.sender_id == other_user_id, models.Message.receiver_id == current_user.id)
-        )
-    ).order_by(models.Message.created_at.asc()).all()
+    """One page of a conversation in chronological order; the latest page by default"""
+    Message = models.Message
+    query = select(Message).where(conversation_filter(current_user.id, other_user_id))
+    if before is not None:
+        query = query.where(Message.id < before)
+    if after is not None:
+        query = query.where(Message.id > after)
     
-    # Mark received messages as read
-    unread = [m for m in messages if m.receiver_id == current_user.id and not m.is_read]
-    for m in unread:
-        m.is_read = True
-    if unread:
-        db.commit()
-        
+    # Keyset paging on id: walk forward from `after`, otherwise backward from the newest / `before`.
+    # One extra row tells whether the page is full; X-Next-Cursor is the id to continue from.
+    order = Message.id.asc() if after is not None else Message.id.desc()
+    messages = (await db.execute(query.order_by(order).limit(limit + 1))).scalars().all()
+    if len(messages) > limit:
+        messages = messages[:limit]
+        response.headers["X-Next-Cursor"] = str(messages[-1].id)
+    if after is None:
+        messages.reverse()
+    
+    # Read state is only changed through POST /conversation/{id}/read
     return messages
 
+@router.post("/conversation/{other_user_id}/read", response_model=ReadReceipt)
+async def mark_conversation_read(
+    other_user_id: int,
+    up_to_id: Optional[int] = Query(None, ge=1, description="Newest message id the client has shown; defaults to all"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user_async)
+):
+    """Mark messages received from other_user_id as read and notify the sender"""
+    Message = models.Message
+    received = and_(Message.sender_id == other_user_id, Message.receiver_id == current_user.id)
+    if up_to_id is None:
+        # Pin the receipt to the newest message now, so later arrivals stay unread
+        up_to_id = (await db.execute(select(func.max(Message.id)).where(received))).scalar()
+        if up_to_id is None:
+            return ReadReceipt(other_user_id=other_user_id, up_to_id=None, marked_read=0)
+    
+    result = await db.execute(
+        update(Message)
+        .where(received, Message.is_read == False, Message.id <= up_to_id)
+        .values(is_read=True)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    marked = result.rowcount or 0
+    
+    if marked:
+        await manager.send_personal_message({
+            "type": "messages_read",
+            "reader_id": current_user.id,
+            "up_to_id": up_to_id
+        }, other_user_id)
+    
+    return ReadReceipt(other_user_id=other_user_id, up_to_id=up_to_id, marked_read=marked)
+
 @router.get("/recent", response_model=List[ConversationSummary])
-def get_recent_conversations(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+async def get_recent_conversations(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user_async)
 ):
-    # This query is a bit complex. We want the latest message per conversation.
-    # We'll fetch all messages involving the user, then group by the other person in python for simplicity 
-    # (SQL optimization can be done later if needed)
+    """Latest message and unread count per counterpart, most recent conversation first"""
+    Message = models.Message
+    me = current_user.id
+    other_id = case((Message.sender_id == me, Message.receiver_id), else_=Message.sender_id)
+    unread = case((and_(Message.receiver_id == me, Message.is_read == False), 1), else_=0)
     
-    all_messages = db.query(models.Message).filter(
-        or_(models.Message.sender_id == current_user.id, models.Message.receiver_id == current_user.id)
-    ).order_by(models.Message.created_at.desc()).all()
+    # Rank each conversation's messages newest first and total its unread ones in the same pass
+    ranked = select(
+        other_id.label("other_id"),
+        Message.content,
+        Message.created_at,
+        func.row_number().over(
+            partition_by=other_id,
+            order_by=(Message.created_at.desc(), Message.id.desc())
+        ).label("position"),
+        func.sum(unread).over(partition_by=other_id).label("unread_count")
+    ).where(
+        or_(Message.sender_id == me, Message.receiver_id == me)
+    ).subquery()
     
-    conversations = {}
+    result = await db.execute(
+        select(
+            ranked.c.other_id,
+            func.coalesce(models.User.name, "Unknown"),
+            ranked.c.content,
+            ranked.c.created_at,
+            ranked.c.unread_count
+        )
+        .outerjoin(models.User, models.User.id == ranked.c.other_id)
+        .where(ranked.c.position == 1)
+        .order_by(ranked.c.created_at.desc(), ranked.c.other_id.desc())
+        .offset(skip)
+        .limit(limit)
+    )
     
-    for msg in all_messages:
-        other_id = msg.receiver_id if msg.sender_id == current_user.id else msg.sender_id
-        
-        if other_id not in conversations:
-            # Fetch other user name
-            other_user = db.query(models.User).filter(models.User.id == other_id).first()
-            name = other_user.name if other_user else "Unknown"
-            
-            conversations[other_id] = {
-                "user_id": other_id,
-                "name": name,
-                "last_message": msg.content,
-                "timestamp": msg.created_at,
-                "unread_count": 0
-            }
-        
-        # Count unread
-        if msg.receiver_id == current_user.id and not msg.is_read:
-             conversations[other_id]["unread_count"] += 1
-             
-    return list(conversations.values())
+    return [
+        {
+            "user_id": user_id,
+            "name": name,
+            "last_message": content,
+            "timestamp": created_at,
+            "unread_count": unread_count or 0
+        }
+        for user_id, name, content, created_at, unread_count in result.all()
+    ]
@@ -1,55 +1,54 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_
+from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Query
+from sqlalchemy.orm import Session, contains_eager, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, or_, and_, func, cast, Numeric
 from typing import List, Optional
 import math
-from datetime import datetime
+from datetime import datetime, timezone
 
-from app.database import get_db
-from app.database import get_db
-from app.models import User, Ride, DriverProfile, RideStatus, UserRole, Transaction
+from app.database import get_async_db
+from app.models import User, Ride, DriverProfile, RideStatus, UserRole
 from app.schemas import RideCreate, RideResponse, RideUpdate, RideRating, LocationUpdate
-from app.auth import get_current_active_user
+from app.auth import get_current_active_user_async, invalidate_principal_on_commit
 from app.websocket import manager
 from app.constants import CITY_COORDINATES
+from app.services.driver_index import driver_spatial_index, driver_city_index, tokenize_location
+from app.services.dispatch import dispatch_engine
+from app.services.ledger import ledger_service
 
 from app.routers.vacation_scheduler import schedule_next_ride
+from app.log import get_logger
 
 router = APIRouter()
+logger = get_logger(__name__)
 
-from app.utils import calculate_fare, calculate_distance
+from app.utils import calculate_fare, calculate_distance, calculate_distances, escape_like, vehicle_type_variants
 
 def find_nearby_drivers(db: Session, pickup_lat: float, pickup_lng: float, max_distance_km: float = 50.0) -> List[User]:
     """Find drivers within specified distance of pickup location"""
-    # Get all available drivers with location data
-    drivers = db.query(User).join(DriverProfile).filter(
+    # Only the grid cells around the pickup are scanned; the DB re-check below
+    # drops drivers that went offline since the index was last refreshed
+    driver_spatial_index.ensure_fresh(db)
+    matches = driver_spatial_index.query_radius(pickup_lat, pickup_lng, max_distance_km)
+    if not matches:
+        logger.debug("Found 0 nearby drivers for pickup at (%s, %s)", pickup_lat, pickup_lng)
+        return []
+
+    drivers = db.query(User).join(DriverProfile).options(contains_eager(User.driver_profile)).filter(
         and_(
+            User.id.in_([driver_id for driver_id, _ in matches]),
             User.role == UserRole.DRIVER,
             User.is_active == True,
-            DriverProfile.is_available == True,
-            DriverProfile.current_lat != None,
-            DriverProfile.current_lng != None
+            DriverProfile.is_available == True
         )
     ).all()
-    
-    nearby_drivers = []
-    for driver in drivers:
-        if driver.driver_profile and driver.driver_profile.current_lat is not None and driver.driver_profile.current_lng is not None:
-            try:
-                distance = calculate_distance(
-                    pickup_lat, pickup_lng,
-                    float(driver.driver_profile.current_lat),
-                    float(driver.driver_profile.current_lng)
-                )
-                if distance <= max_distance_km:
-                    nearby_drivers.append(driver)
-            except (ValueError, TypeError) as e:
-                print(f"Error calculating distance for driver {driver.id}: {e}")
-                continue
-    
-    print(f"Found {len(nearby_drivers)} nearby drivers for pickup at ({pickup_lat}, {pickup_lng})")
-    for driver in nearby_drivers:
-        print(f"  Driver {driver.id} at ({driver.driver_profile.current_lat}, {driver.driver_profile.current_lng})")
+
+    # Keep nearest-first ordering from the index
+    drivers_by_id = {driver.id: driver for driver in drivers}
+    nearby_drivers = [drivers_by_id[driver_id] for driver_id, _ in matches if driver_id in drivers_by_id]
+
+    logger.debug("Found %d nearby drivers for pickup at (%s, %s): %s",
+                 len(nearby_drivers), pickup_lat, pickup_lng, [driver.id for driver in nearby_drivers])
     
     return nearby_drivers
 
@@ -58,12 +57,8 @@ def match_location_tokens(driver_city: str, pickup_address: str) -> bool:
     if not driver_city or not pickup_address:
         return False
         
-    import re
-    def get_tokens(text):
-        return {w.lower() for w in re.split(r'[\s,-]+', str(text)) if len(w) > 2}
-        
-    driver_tokens = get_tokens(driver_city)
-    pickup_tokens = get_tokens(pickup_address)
+    driver_tokens = tokenize_location(driver_city)
+    pickup_tokens = tokenize_location(pickup_address)
     
     # If ANY significant token matches, we consider it a match
     overlap = driver_tokens.intersection(pickup_tokens)
@@ -73,59 +68,56 @@ def find_drivers_by_city_string(db: Session, pickup_address: str) -> List[User]:
     """Find drivers matching the city string in pickup address"""
     nearby_drivers = []
     try:
-        # Get all active drivers with a city set
-        possible_drivers = db.query(User).join(DriverProfile).filter(
+        # Token lookups against the city index instead of scanning every driver
+        driver_city_index.ensure_fresh(db)
+        candidate_ids = driver_city_index.match_address(pickup_address)
+        logger.debug("City index matched %d drivers against %r", len(candidate_ids), pickup_address)
+        if not candidate_ids:
+            return []
+
+        nearby_drivers = db.query(User).join(DriverProfile).options(contains_eager(User.driver_profile)).filter(
             and_(
+                User.id.in_(candidate_ids),
                 User.role == UserRole.DRIVER,
                 User.is_active == True,
                 DriverProfile.is_available == True,
                 DriverProfile.city != None
             )
         ).all()
-        
-        print(f"Checking {len(possible_drivers)} active drivers for city match against: '{pickup_address}'")
-        for driver in possible_drivers:
-            driver_city = driver.driver_profile.city
-            if match_location_tokens(driver_city, pickup_address):
-                nearby_drivers.append(driver)
-                print(f"  -> Match found: Driver {driver.id} (City: {driver_city})")
-    except Exception as e:
-        print(f"Error in string matching: {e}")
+    except Exception:
+        logger.exception("City string matching failed for %r", pickup_address)
             
     return nearby_drivers
 
+# RideResponse renders rider/driver (and their driver profiles); an AsyncSession
+# cannot lazy-load them during serialization, so they are loaded up front
+RIDE_RESPONSE_OPTIONS = (
+    selectinload(Ride.rider).selectinload(User.driver_profile),
+    selectinload(Ride.driver).selectinload(User.driver_profile)
+)
+
+async def load_rides_for_response(db: AsyncSession, ride_ids: List[int]) -> List[Ride]:
+    """Fresh copies of the given rides with response relationships loaded, in the given order"""
+    if not ride_ids:
+        return []
+    result = await db.execute(
+        select(Ride).options(*RIDE_RESPONSE_OPTIONS).where(Ride.id.in_(ride_ids))
+        .execution_options(populate_existing=True)
+    )
+    rides_by_id = {ride.id: ride for ride in result.scalars().all()}
+    return [rides_by_id[ride_id] for ride_id in ride_ids if ride_id in rides_by_id]
+
+async def load_ride_for_response(db: AsyncSession, ride_id: int) -> Optional[Ride]:
+    rides = await load_rides_for_response(db, [ride_id])
+    return rides[0] if rides else None
 
-async def notify_drivers_task(ride_data: dict, driver_ids: List[int]):
-    """Background task to send WebSocket notifications to drivers"""
-    print(f"=== [BG TASK] Starting notification for ride {ride_data.get('ride_id')} to {len(driver_ids)} drivers ===")
-    
-    notification_sent = False
-    
-    # Notify specific drivers
-    for driver_id in driver_ids:
-        try:
-            await manager.send_personal_message(ride_data, driver_id)
-            print(f"-> [BG] Sent to driver {driver_id}")
-            notification_sent = True
-        except Exception as e:
-            print(f"!!! [BG] Failed to send to driver {driver_id}: {e}")
-            
-    # Default broadcast if no specific notifications succeeded (or list was empty but we wanted to try)
-    if not notification_sent and not driver_ids:
-        try:
-            print("=== [BG] Broadcasting to all drivers (fallback) ===")
-            await manager.broadcast(ride_data)
-        except Exception as e:
-            print(f"!!! [BG] Broadcast failed: {e}")
-            
-    print("=== [BG TASK] Completed ===")
 
 @router.post("/", response_model=RideResponse, status_code=status.HTTP_201_CREATED)
 async def create_ride(
     ride_data: RideCreate,
     background_tasks: BackgroundTasks,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new ride request"""
     # Robust role check
@@ -142,12 +134,13 @@ async def create_ride(
         )
 
     # CHECK FOR EXISTING ACTIVE RIDE
-    active_ride = db.query(Ride).filter(
+    result = await db.execute(select(Ride.status).where(
         and_(
             Ride.rider_id == current_user.id,
             Ride.status.in_([RideStatus.PENDING, RideStatus.ACCEPTED, RideStatus.IN_PROGRESS])
         )
-    ).first()
+    ).limit(1))
+    active_ride = result.first()
 
     if active_ride:
         raise HTTPException(
@@ -183,38 +176,41 @@ async def create_ride(
     )
     
     db.add(new_ride)
-    db.commit()
-    db.refresh(new_ride)
+    await db.commit()
+    await db.refresh(new_ride)
     
     # Find nearby drivers synchronously (should be fast)
-    print(f"=== [STEP 1] FINDING NEARBY DRIVERS FOR RIDE {new_ride.id} ===")
     nearby_drivers = []
     try:
-        nearby_drivers = find_nearby_drivers(
-            db, 
+        nearby_drivers = await db.run_sync(
+            find_nearby_drivers,
             float(ride_data.pickup_lat), 
             float(ride_data.pickup_lng), 
             max_distance_km=50.0
         )
-        print(f"=== [STEP 2] Found {len(nearby_drivers)} nearby drivers ===")
-    except Exception as e:
-        print(f"!!! ERROR finding drivers: {e}")
+    except Exception:
+        logger.exception("Finding nearby drivers failed for ride %s", new_ride.id)
         
     # [STEP 2.5] ALSO FIND DRIVERS BY CITY STRING MATCH
     # This covers cases where GPS is stale/missing or user wants broad city match
     try:
-        print(f"=== [STEP 2.5] Finding drivers by City String Match for '{ride_data.pickup_address}' ===")
-        city_drivers = find_drivers_by_city_string(db, ride_data.pickup_address)
-        print(f"=== [STEP 2.5] Found {len(city_drivers)} city-matched drivers ===")
+        city_drivers = await db.run_sync(find_drivers_by_city_string, ride_data.pickup_address)
         
         # Merge lists (avoid duplicates)
         nearby_drivers = list({d.id: d for d in (nearby_drivers + city_drivers)}.values())
-        print(f"=== [STEP 2.5] Total Unique Drivers to Notify: {len(nearby_drivers)} ===")
-    except Exception as e:
-        print(f"!!! ERROR finding city drivers: {e}")
+    except Exception:
+        logger.exception("Finding city drivers failed for ride %s", new_ride.id)
         
+    # Rank candidates so the ride is offered to the best few drivers first
+    ranked_drivers = []
+    try:
+        ranked_drivers = await db.run_sync(dispatch_engine.rank_candidates, new_ride, nearby_drivers)
+    except Exception:
+        logger.exception("Ranking drivers failed for ride %s", new_ride.id)
+        ranked_drivers = [(d, 0.0) for d in nearby_drivers]
+
     # Prepare data for background task
-    driver_ids = [int(d.id) for d in nearby_drivers if d.id is not None]
+    driver_ids = [int(d.id) for d, _ in ranked_drivers if d.id is not None]
     
     notification_data = {
         "type": "new_ride_request",
@@ -226,18 +222,30 @@ async def create_ride(
         "vehicle_type": new_ride.vehicle_type.value if new_ride.vehicle_type is not None else "economy"
     }
 
-    # Offload notification to background task
-    background_tasks.add_task(notify_drivers_task, notification_data, driver_ids)
-    print("=== [STEP 3] Notification task queued ===")
+    # Offload wave-by-wave offers to background task
+    background_tasks.add_task(dispatch_engine.dispatch, notification_data, driver_ids)
+    logger.info("Ride %s created; dispatching to %d candidate drivers", new_ride.id, len(driver_ids),
+                extra={"ride_id": new_ride.id, "top_candidates": [(d.id, score) for d, score in ranked_drivers[:10]]})
+
+    return await load_ride_for_response(db, new_ride.id)
 
-    return new_ride
+def pickup_bounding_box(lat: float, lng: float, radius_km: float):
+    """SQL prefilter on pickup coordinates covering a radius around a point"""
+    lat_span = radius_km / 111.32
+    lng_span = radius_km / (111.32 * max(math.cos(math.radians(lat)), 0.01))
+    return and_(
+        Ride.pickup_lat.between(lat - lat_span, lat + lat_span),
+        Ride.pickup_lng.between(lng - lng_span, lng + lng_span)
+    )
 
 @router.get("/available", response_model=List[RideResponse])
 async def get_available_rides(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=200),
+    current_user: User = Depends(get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get available rides for drivers"""
+    """Get available rides for drivers, nearest pickup first"""
     # Robust role check
     user_role = current_user.role
     if hasattr(user_role, 'value'):
@@ -251,121 +259,90 @@ async def get_available_rides(
             detail="Only drivers can view available rides"
         )
     
-    # Get driver's vehicle type
-    driver_vehicle_type = None
-    if current_user.driver_profile and current_user.driver_profile.vehicle_type:
-        driver_vehicle_type = current_user.driver_profile.vehicle_type
-    
-    # DEBUG LOGGING TO FILE
-    # with open("rides_debug.log", "a") as f:
-    #     f.write(f"\n[{datetime.now()}] Checking rides for Driver {current_user.id} ({current_user.name})\n")
-    #     f.write(f"Driver Vehicle Type: {driver_vehicle_type}\n")
-
-    # print(f"DEBUG: Driver {current_user.id} Vehicle Check: {driver_vehicle_type} (Type: {type(driver_vehicle_type)})")
-
-    # Get all pending rides without a driver and match vehicle type
+    # Get all pending rides without a driver
     query_filters = [
         Ride.status == RideStatus.PENDING,
         Ride.driver_id == None
     ]
     
-    # RELAXED FILTER: Temporarily DISABLED SQL filter to handle case sensitivity in Python
-    # if driver_vehicle_type:
-    #      print(f"DEBUG: Filtering for vehicle_type={driver_vehicle_type}")
-    #      query_filters.append(Ride.vehicle_type == driver_vehicle_type)
+    # 1. Filter by Vehicle Type (case-insensitive, done in SQL)
+    driver_profile = current_user.driver_profile
+    if driver_profile and driver_profile.vehicle_type:
+        query_filters.append(Ride.vehicle_type.in_(vehicle_type_variants(driver_profile.vehicle_type)))
 
-    rides = db.query(Ride).filter(and_(*query_filters)).order_by(Ride.created_at.desc()).all()
-    print(f"DEBUG: Found {len(rides)} pending rides before manual filtering")
-    
-    # with open("rides_debug.log", "a") as f:
-    #     f.write(f"Found {len(rides)} pending rides in DB (Status=PENDING, Driver=None)\n")
-
-    # 1. Filter by Vehicle Type (Strict Match)
-    if driver_vehicle_type:
-        try:
-            # Normalize driver type to string
-            driver_type_str = str(driver_vehicle_type.value if hasattr(driver_vehicle_type, 'value') else driver_vehicle_type).lower()
-            
-            with open("rides_debug.log", "a") as f:
-                 f.write(f"Filtering for Driver Type: '{driver_type_str}'\n")
-
-            filtered_rides = []
-            for r in rides:
-                # Normalize ride type to string
-                ride_type_str = str(r.vehicle_type.value if hasattr(r.vehicle_type, 'value') else r.vehicle_type).lower()
-                
-                match = ride_type_str == driver_type_str
-                with open("rides_debug.log", "a") as f:
-                      f.write(f" - Ride {r.id}: Type='{ride_type_str}' Match={match}\n")
-
-                if match:
-                    filtered_rides.append(r)
-                # else:
-                #     print(f" - Skipping Ride {r.id}: Type mismatch ({ride_type_str} != {driver_type_str})")
-            
-            rides = filtered_rides
-            print(f"DEBUG: Filtered to {len(rides)} rides matching vehicle type '{driver_type_str}'")
-            
-        except Exception as e:
-            print(f"!!! Error in vehicle type filtering: {e}")
-            with open("rides_debug.log", "a") as f:
-                 f.write(f"ERROR filtering: {e}\n")
-            pass
-
-    # 2. Filter by Location (City Match) - TOKEN BASED
-    # Uses the shared helper function for robust matching
     # 2. Filter by Location: Hybrid (City String OR GPS Distance)
     # Allows rides if EITHER the City Name matches OR the driver is physically nearby (GPS)
-    if current_user.driver_profile:
-        driver_profile = current_user.driver_profile
+    driver_city = ""
+    driver_lat = driver_lng = None
+    if driver_profile:
         driver_city = (driver_profile.city or "").strip().lower()
         driver_lat = driver_profile.current_lat
         driver_lng = driver_profile.current_lng
-        
-        # Only filter if we have some criteria to filter by (City or GPS)
-        if driver_city or (driver_lat and driver_lng):
-            print(f"DEBUG: Filtering rides for Driver: City='{driver_city}', Loc=({driver_lat}, {driver_lng})")
-            
-            location_filtered_rides = []
-            for r in rides:
-                # Condition A: String Match
-                string_match = False
-                if driver_city:
-                    pickup = r.pickup_address.lower() if r.pickup_address else ""
-                    string_match = match_location_tokens(driver_city, pickup)
-                    
-                # Condition B: GPS Distance (within 50km)
-                distance_match = False
-                if driver_lat is not None and driver_lng is not None and r.pickup_lat is not None and r.pickup_lng is not None:
-                    try:
-                        # calculate_distance imported from app.utils
-                        dist = calculate_distance(float(driver_lat), float(driver_lng), float(r.pickup_lat), float(r.pickup_lng))
-                        if dist <= 50.0:
-                            distance_match = True
-                    except Exception:
-                        pass
-                
-                # If matched by EITHER, keep it
-                if string_match or distance_match:
-                    location_filtered_rides.append(r)
-                else:
-                    # Debug log why it failed? (Optional, skipping to save IO)
-                    pass
-            
-            rides = location_filtered_rides
-            print(f"DEBUG: Hybrid Filter kept {len(rides)} rides (String OR GPS)")
-
-
-    return rides
+    has_gps = driver_lat is not None and driver_lng is not None
+    city_tokens = driver_city_index.city_tokens(current_user.id, driver_city) if driver_city else frozenset()
+
+    # SQL prefilter: pickup inside the 50km bounding box OR address containing a city token.
+    # Exact token / haversine checks below drop the prefilter's false positives.
+    location_filters = []
+    if has_gps:
+        location_filters.append(pickup_bounding_box(float(driver_lat), float(driver_lng), 50.0))
+    for token in city_tokens:
+        location_filters.append(Ride.pickup_address.ilike(f"%{escape_like(token)}%", escape="\\"))
+    if driver_profile and (driver_city or has_gps):
+        if not location_filters:
+            return []
+        query_filters.append(or_(*location_filters))
+
+    # Nearest pickup first (flat-earth distance is enough to order within 50km), else newest first
+    order_by = [Ride.created_at.desc(), Ride.id.desc()]
+    if has_gps:
+        lng_scale = math.cos(math.radians(float(driver_lat)))
+        d_lat = Ride.pickup_lat - float(driver_lat)
+        d_lng = (Ride.pickup_lng - float(driver_lng)) * lng_scale
+        order_by.insert(0, d_lat * d_lat + d_lng * d_lng)
+
+    if not (driver_profile and (driver_city or has_gps)):
+        result = await db.execute(select(Ride.id).where(and_(*query_filters)).order_by(*order_by).offset(skip).limit(limit))
+        return await load_rides_for_response(db, result.scalars().all())
+
+    # The prefilter can over-match (substring vs token, box vs radius), so page through
+    # it in SQL order and keep exact matches until the requested page is filled
+    wanted = skip + limit
+    batch_size = max(wanted, 100)
+    candidates = select(Ride.id, Ride.pickup_address, Ride.pickup_lat, Ride.pickup_lng).where(and_(*query_filters)).order_by(*order_by)
+    kept: List[int] = []
+    offset = 0
+    while len(kept) < wanted:
+        rows = (await db.execute(candidates.offset(offset).limit(batch_size))).all()
+        if not rows:
+            break
+        pickup_distances = None
+        if has_gps:
+            pickup_distances = calculate_distances(
+                float(driver_lat), float(driver_lng),
+                [r.pickup_lat for r in rows],
+                [r.pickup_lng for r in rows]
+            )
+        for i, r in enumerate(rows):
+            string_match = bool(city_tokens) and not city_tokens.isdisjoint(tokenize_location(r.pickup_address))
+            distance_match = pickup_distances is not None and bool(pickup_distances[i] <= 50.0)
+            if string_match or distance_match:
+                kept.append(r.id)
+        if len(rows) < batch_size:
+            break
+        offset += batch_size
+
+    # Nested rider/driver only for the page being returned
+    return await load_rides_for_response(db, kept[skip:wanted])
 
 @router.get("/", response_model=List[RideResponse])
 async def get_rides(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db),
     status: Optional[str] = None
 ):
     """Get rides for current user"""
-    query = db.query(Ride)
+    query = select(Ride).options(*RIDE_RESPONSE_OPTIONS)
     
     try:
         # Robust role check
@@ -375,13 +352,12 @@ async def get_rides(
         else:
             user_role = str(user_role).lower()
             
-        print(f"DEBUG: get_rides user_id={current_user.id} role={user_role}")
 
         if user_role == UserRole.RIDER.value:
-            query = query.filter(Ride.rider_id == current_user.id)
+            query = query.where(Ride.rider_id == current_user.id)
         elif user_role == UserRole.DRIVER.value:
             # For drivers, show their assigned rides and pending rides
-            query = query.filter(
+            query = query.where(
                 or_(
                     Ride.driver_id == current_user.id,
                     and_(
@@ -395,14 +371,12 @@ async def get_rides(
              pass
             
         if status:
-            query = query.filter(Ride.status == status)
+            query = query.where(Ride.status == status)
         
-        rides = query.order_by(Ride.created_at.desc()).all()
-        return rides
+        result = await db.execute(query.order_by(Ride.created_at.desc()))
+        return result.scalars().all()
     except Exception as e:
-        import traceback
-        print(f"ERROR in get_rides: {str(e)}")
-        traceback.print_exc()
+        logger.exception("get_rides failed")
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
 
 
@@ -410,35 +384,20 @@ async def get_rides(
 async def rate_ride(
     ride_id: int,
     rating_data: RideRating,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Rate a completed ride"""
-    import os
-    
-    # helper for logging
-    def log_debug(msg):
-        with open("rating_debug.log", "a") as f:
-            f.write(f"{datetime.now()}: {msg}\n")
-            
-    log_debug(f"=== RATING RIDE {ride_id} ===")
-    log_debug(f"User: {current_user.id} ({current_user.role})")
-    log_debug(f"Data: {rating_data}")
-    
-    ride = db.query(Ride).filter(Ride.id == ride_id).first()
+    ride = await db.get(Ride, ride_id)
     
     if not ride:
-        log_debug("Ride not found")
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Ride not found"
         )
     
-    log_debug(f"Ride found. Rider ID: {ride.rider_id}, Status: {ride.status}")
-    
     # Robust ID comparison
     if str(ride.rider_id) != str(current_user.id):
-        log_debug(f"Authorization failed. Rider ID: {ride.rider_id}, User ID: {current_user.id}")
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to rate this ride"
@@ -448,7 +407,6 @@ async def rate_ride(
     expected = RideStatus.COMPLETED.value.lower()
     
     if current_status != expected:
-        log_debug(f"Invalid status: {ride.status} (Expected: {RideStatus.COMPLETED.value})")
         # Double check if it's just a casing issue or different enum representation
         if "completed" not in current_status:
              raise HTTPException(
@@ -457,61 +415,49 @@ async def rate_ride(
             )
     
     try:
-        ride.rating = int(str(rating_data.rating))
-        ride.feedback = rating_data.feedback
-        log_debug(f"Rating updated in object: {ride.rating}")
+        new_rating = int(str(rating_data.rating))
+        # Compare-and-swap on the stored score, so two concurrent first ratings
+        # can't both count as new: the loser re-reads and is applied as a re-rating
+        while True:
+            previous_rating = (await db.execute(select(Ride.rating).where(Ride.id == ride.id))).scalar()
+            swapped = await db.execute(update(Ride).where(
+                Ride.id == ride.id,
+                Ride.rating.is_not_distinct_from(previous_rating)
+            ).values(
+                rating=new_rating,
+                feedback=rating_data.feedback
+            ).execution_options(synchronize_session=False))
+            if swapped.rowcount:
+                break
         
-        # Update driver rating
+        # Update driver rating from running totals (re-rating replaces the old score)
         if ride.driver_id is not None:
-            driver_profile = db.query(DriverProfile).filter(
+            sum_delta = new_rating - (int(previous_rating) if previous_rating is not None else 0)
+            count_delta = 0 if previous_rating is not None else 1
+            new_sum = func.coalesce(DriverProfile.rating_sum, 0) + sum_delta
+            new_count = func.coalesce(DriverProfile.rating_count, 0) + count_delta
+            
+            result = await db.execute(update(DriverProfile).where(
                 DriverProfile.user_id == ride.driver_id
-            ).first()
-            if driver_profile:
-                # Commit ride rating first so it's included in the query
-                db.commit()
-                db.refresh(ride)
-                
-                # Now calculate average
-                total_rated_rides = db.query(Ride).filter(
-                    Ride.driver_id == ride.driver_id,
-                    Ride.rating != None
-                ).count()
-                
-                log_debug(f"Total rated rides for driver {ride.driver_id}: {total_rated_rides}")
-                
-                total_rating_sum = 0
-                ratings = db.query(Ride.rating).filter(
-                    Ride.driver_id == ride.driver_id,
-                    Ride.rating != None
-                ).all()
-                
-                for r in ratings:
-                    try:
-                        if r[0] is not None:
-                            total_rating_sum += int(r[0])
-                    except (ValueError, TypeError):
-                        pass
-                
-                avg_rating = total_rating_sum / total_rated_rides if total_rated_rides > 0 else 5.0
-                driver_profile.rating = float(str(round(avg_rating, 2)))
-                log_debug(f"Driver rating updated to {driver_profile.rating}")
-                
-            else:
-                 log_debug(f"Driver profile not found for user_id {ride.driver_id}")
-        else:
-             log_debug("No driver assigned to this ride")
+            ).values({
+                DriverProfile.rating_sum: new_sum,
+                DriverProfile.rating_count: new_count,
+                DriverProfile.rating: func.coalesce(
+                    func.round(cast(new_sum, Numeric) / func.nullif(new_count, 0), 2),
+                    5.0
+                )
+            }).execution_options(synchronize_session=False))
+            
+            if not result.rowcount:
+                logger.warning("Driver profile not found for user_id %s", ride.driver_id)
                 
-        db.commit()
-        db.refresh(ride)
-        log_debug("Successfully committed to DB")
-        return ride
+        invalidate_principal_on_commit(db.sync_session, ride.driver_id)
+        await db.commit()
+        return await load_ride_for_response(db, ride.id)
         
     except Exception as e:
-        db.rollback()
-        import traceback
-        error_trace = traceback.format_exc()
-        log_debug(f"EXCEPTION: {e}\n{error_trace}")
-        print(f"Failed to rate ride: {e}")
+        await db.rollback()
+        logger.exception("Failed to rate ride %s", ride_id)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to submit rating: {str(e)}"
@@ -520,11 +466,11 @@ async def rate_ride(
 @router.delete("/{ride_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def cancel_ride(
     ride_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Cancel a ride"""
-    ride = db.query(Ride).filter(Ride.id == ride_id).first()
+    ride = await db.get(Ride, ride_id)
     
     if not ride:
         raise HTTPException(
@@ -548,7 +494,7 @@ async def cancel_ride(
     
     # Cancel the ride
     ride.status = RideStatus.CANCELLED.value
-    db.commit()
+    await db.commit()
 
     return None
 
@@ -557,11 +503,11 @@ async def cancel_ride(
 async def update_ride(
     ride_id: int,
     ride_update: RideUpdate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update ride status (accept, start, complete, etc.)"""
-    ride = db.query(Ride).filter(Ride.id == ride_id).first()
+    ride = await db.get(Ride, ride_id)
     
     if not ride:
         raise HTTPException(
@@ -576,7 +522,7 @@ async def update_ride(
     else:
         user_role = str(user_role).lower()
         
-    print(f"DEBUG: update_ride {ride_id} status={ride_update.status} user={current_user.id} role={user_role}")
+    logger.debug("update_ride %s status=%s user=%s role=%s", ride_id, ride_update.status, current_user.id, user_role)
         
 
     # Helper to safe get status string
@@ -595,16 +541,20 @@ async def update_ride(
             if user_role != UserRole.DRIVER.value:
                 raise HTTPException(status_code=403, detail="Only drivers can accept rides")
             
+            if current_status_str in [RideStatus.ACCEPTED.value, RideStatus.IN_PROGRESS.value] and ride.driver_id != current_user.id:
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Ride was already accepted by another driver")
+
             if current_status_str != RideStatus.PENDING.value:
                 raise HTTPException(status_code=400, detail=f"Ride is not pending (current status: {current_status_str})")
             
             # CHECK IF DRIVER ALREADY HAS AN ACTIVE RIDE
-            active_driver_ride = db.query(Ride).filter(
+            result = await db.execute(select(Ride.id).where(
                 and_(
                     Ride.driver_id == current_user.id,
                     Ride.status.in_([RideStatus.ACCEPTED, RideStatus.IN_PROGRESS])
                 )
-            ).first()
+            ).limit(1))
+            active_driver_ride = result.first()
 
             if active_driver_ride:
                 raise HTTPException(
@@ -612,8 +562,21 @@ async def update_ride(
                     detail="You already have an active ride. Complete it before accepting a new one."
                 )
 
-            ride.driver_id = current_user.id
-            ride.status = RideStatus.ACCEPTED.value
+            # Conditional claim: only one concurrent accept can match the WHERE clause.
+            # Vacation legs are created pending with their driver pre-assigned.
+            result = await db.execute(update(Ride).where(
+                Ride.id == ride.id,
+                Ride.status == RideStatus.PENDING,
+                or_(Ride.driver_id == None, Ride.driver_id == current_user.id)
+            ).values(
+                {Ride.driver_id: current_user.id, Ride.status: RideStatus.ACCEPTED}
+            ).execution_options(synchronize_session=False))
+            await db.commit()
+
+            if not result.rowcount:
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Ride was already accepted by another driver")
+
+            await db.refresh(ride)
             
             # Send WebSocket notification to rider
             try:
@@ -624,7 +587,7 @@ async def update_ride(
                     "vehicle": f"{current_user.driver_profile.vehicle_color} {current_user.driver_profile.vehicle_model} ({current_user.driver_profile.vehicle_plate})" if current_user.driver_profile else "Unknown Vehicle"
                 }, int(ride.rider_id))
             except Exception as e:
-                print(f"Failed to send notification: {e}")
+                logger.warning("Failed to send notification for ride %s: %s", ride.id, e)
                 
         # Starting a ride
         elif new_status == "in_progress":
@@ -638,7 +601,7 @@ async def update_ride(
                 raise HTTPException(status_code=400, detail=f"Ride must be accepted before starting (current status: {current_status_str})")
                 
             ride.status = RideStatus.IN_PROGRESS.value
-            ride.start_time = datetime.now()
+            ride.started_at = datetime.now(timezone.utc)
             
             # WebSocket notification
             try:
@@ -647,7 +610,7 @@ async def update_ride(
                     "ride_id": ride.id
                 }, int(ride.rider_id))
             except Exception as e:
-                print(f"Failed to send notification: {e}")
+                logger.warning("Failed to send notification for ride %s: %s", ride.id, e)
 
         # Completing a ride
         elif new_status == "completed":
@@ -661,46 +624,10 @@ async def update_ride(
                 raise HTTPException(status_code=400, detail=f"Ride must be in progress before completing (current status: {current_status_str})")
                 
             ride.status = RideStatus.COMPLETED.value
-            ride.end_time = datetime.now()
+            ride.completed_at = datetime.now(timezone.utc)
             
-            # Process Payment (80/20 Split)
-            driver = db.query(User).filter(User.id == current_user.id).first()
-            if driver:
-                # Calculate Split
-                total_fare = float(ride.final_fare or ride.estimated_fare or 0)
-                driver_cut = total_fare * 0.80
-                platform_cut = total_fare * 0.20
-                
-                # Credit Driver (80%)
-                current_driver_balance = float(driver.wallet_balance or 0)
-                driver.wallet_balance = current_driver_balance + driver_cut
-                
-                # Create Driver Transaction
-                # Create Driver Transaction
-                driver_txn = Transaction(
-                    user_id=driver.id,
-                    amount=driver_cut,
-                    type="credit",
-                    description=f"Payment from {ride.rider.name}"
-                )
-                db.add(driver_txn)
-                
-                # Credit Admin/Platform (20%)
-                # Assuming Admin ID is 1. If not, just logging it for now.
-                admin_user = db.query(User).filter(User.role == UserRole.ADMIN).first()
-                if admin_user:
-                    current_admin_balance = float(admin_user.wallet_balance or 0)
-                    admin_user.wallet_balance = current_admin_balance + platform_cut
-                    
-                    admin_txn = Transaction(
-                        user_id=admin_user.id,
-                        amount=platform_cut,
-                        type="credit",
-                        description=f"Platform Fee for ride #{ride.id} (20% of ₹{total_fare})"
-                    )
-                    db.add(admin_txn)
-                else:
-                    print(f"WARNING: No Admin user found to credit platform fee of {platform_cut}")
+            # Process Payment (80/20 Split) as atomic wallet increments
+            await db.run_sync(ledger_service.settle_ride, ride)
             
             # Check if this is part of a vacation and schedule next ride if so
             # DISABLED: Auto-scheduling is disabled to allow manual trigger via "Start Next Leg" button
@@ -718,8 +645,7 @@ async def update_ride(
                     "fare": ride.estimated_fare
                 }, int(ride.rider_id))
             except Exception as e:
-                print(f"Failed to send notification: {e}")
+                logger.warning("Failed to send notification for ride %s: %s", ride.id, e)
 
-    db.commit()
-    db.refresh(ride)
-    return ride
+    await db.commit()
+    return await load_ride_for_response(db, ride.id)
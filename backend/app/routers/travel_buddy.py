@@ -1,9 +1,13 @@
 from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
+import json
 from app.services.travel_buddy_agent import travel_buddy_agent
+from app.log import get_logger
 
 router = APIRouter()
+logger = get_logger(__name__)
 
 class TravelBuddyRequest(BaseModel):
     city: str = Field(..., description="Destination city name, e.g., 'Goa', 'Paris', 'Tokyo'")
@@ -26,7 +30,7 @@ async def generate_travel_guide(request: TravelBuddyRequest):
     and local events happening this week, formatting the results into a clean structured document.
     """
     try:
-        result = travel_buddy_agent.execute(
+        result = await travel_buddy_agent.aexecute(
             city=request.city,
             budget=request.budget,
             days=request.days or 3,
@@ -35,12 +39,39 @@ async def generate_travel_guide(request: TravelBuddyRequest):
         )
         return result
     except Exception as e:
-        print(f"[TravelBuddy Error] Failed to generate travel guide: {e}")
+        logger.warning("Failed to generate travel guide: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to generate travel guide: {str(e)}"
         )
 
+@router.post("/generate/stream")
+async def stream_travel_guide(request: TravelBuddyRequest):
+    """
+    Same as /generate as Server-Sent Events: a `step` event for each agent
+    step as it completes, then one `result` event with the full response
+    (or an `error` event).
+    """
+    async def events():
+        try:
+            async for event in travel_buddy_agent.astream(
+                city=request.city,
+                budget=request.budget,
+                days=request.days or 3,
+                currency=request.currency,
+                travel_style=request.travel_style or "explorer"
+            ):
+                yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+        except Exception as e:
+            logger.warning("Failed to stream travel guide: %s", e)
+            yield f"event: error\ndata: {json.dumps({'detail': f'Failed to generate travel guide: {str(e)}'})}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/health")
 async def health_check():
     return {
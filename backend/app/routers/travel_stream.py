@@ -1,11 +1,16 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 import json
 import asyncio
-import requests
 import urllib.parse
 from datetime import datetime
+from typing import List, Set
+from app.config import settings
+from app.log import get_logger
+from app.services.http_client import get_http_client
+from app.services import weather
 
 router = APIRouter()
+logger = get_logger(__name__)
 
 WMO_WEATHER_CODES = {
     0: ("Clear Sky", "☀️"),
@@ -31,41 +36,13 @@ WMO_WEATHER_CODES = {
     99: ("Thunderstorm with Heavy Hail", "⛈️"),
 }
 
-async def fetch_weather_and_stays(destination: str, from_date: str, to_date: str, budget: float, days: int, websocket: WebSocket):
-    # 1. Geocoding
-    await websocket.send_json({"status": "thinking", "message": f"Geocoding {destination}..."})
-    geo_url = f"https://geocoding-api.open-meteo.com/v1/search?name={destination}&count=1&language=en&format=json"
-    
-    try:
-        geo_res = requests.get(geo_url, timeout=5).json()
-        if not geo_res.get("results"):
-            await websocket.send_json({"status": "error", "message": "Destination not found"})
-            return
-            
-        location = geo_res["results"][0]
-        lat = location["latitude"]
-        lon = location["longitude"]
-    except Exception as e:
-        await websocket.send_json({"status": "error", "message": f"Geocoding failed: {str(e)}"})
-        return
-        
-    # 2. Fetch Weather
-    await asyncio.sleep(1) # Simulate thinking
-    await websocket.send_json({"status": "thinking", "message": "Fetching live weather data..."})
-    
+async def fetch_forecast(lat: float, lon: float, from_date: str, to_date: str) -> List[dict]:
     weather_data = []
     try:
-        # We request daily forecast
-        forecast_url = (
-            f"https://api.open-meteo.com/v1/forecast?"
-            f"latitude={lat}&longitude={lon}&daily=weathercode,temperature_2m_max,temperature_2m_min,precipitation_probability_max&"
-            f"start_date={from_date}&end_date={to_date}&timezone=auto"
-        )
-        forecast_res = requests.get(forecast_url, timeout=5)
+        # Daily forecast for the trip dates (cached per location and date range)
+        daily = await weather.daily_forecast(lat, lon, from_date, to_date)
         
-        if forecast_res.status_code == 200:
-            f_data = forecast_res.json()
-            daily = f_data.get("daily", {})
+        if daily:
             dates = daily.get("time", [])
             max_temps = daily.get("temperature_2m_max", [])
             min_temps = daily.get("temperature_2m_min", [])
@@ -88,28 +65,14 @@ async def fetch_weather_and_stays(destination: str, from_date: str, to_date: str
                     "rain": f"{precip}%"
                 })
     except Exception as e:
-        print(f"Weather error: {e}")
-        pass
-        
-    # Calculate stay budget per night
-    try:
-        total_budget = float(budget)
-        total_days = max(2, int(days))
-        stay_cost = total_budget * 0.4048
-        per_night = stay_cost / (total_days - 1)
-        per_night_rounded = round(per_night / 100) * 100
-        price_range = f"₹{max(0, per_night_rounded - 200)} – ₹{per_night_rounded + 300} per night"
-    except (ValueError, TypeError):
-        price_range = "Under Budget"
+        logger.warning("Weather error: %s", e)
+    return weather_data
 
-    # 3. Fetch Stays using Overpass API
-    await asyncio.sleep(1)
-    await websocket.send_json({"status": "thinking", "message": "Searching for real stays..."})
-    
+async def fetch_stays(lat: float, lon: float, destination: str, from_date: str, to_date: str, price_range: str) -> List[dict]:
+    """Up to three named hotels / guest houses / hostels within 5 km from OpenStreetMap"""
     stays_data = []
     try:
         # Overpass query: get hotels/hostels/guest_houses near lat, lon
-        overpass_url = "http://overpass-api.de/api/interpreter"
         overpass_query = f"""
         [out:json];
         (
@@ -119,7 +82,7 @@ async def fetch_weather_and_stays(destination: str, from_date: str, to_date: str
         );
         out 10;
         """
-        response = requests.get(overpass_url, params={'data': overpass_query}, timeout=10)
+        response = await get_http_client().get(settings.overpass_url, params={'data': overpass_query}, timeout=10)
         
         if response.status_code == 200:
             elements = response.json().get('elements', [])
@@ -145,8 +108,47 @@ async def fetch_weather_and_stays(destination: str, from_date: str, to_date: str
                     "quote": "Sourced live from OpenStreetMap."
                 })
     except Exception as e:
-        print(f"Overpass error: {e}")
-        pass
+        logger.warning("Overpass error: %s", e)
+    return stays_data
+
+async def fetch_weather_and_stays(destination: str, from_date: str, to_date: str, budget: float, days: int, websocket: WebSocket):
+    # 1. Geocoding (everything else needs the coordinates)
+    await websocket.send_json({"status": "thinking", "step": "geocoding", "message": f"Geocoding {destination}..."})
+    try:
+        place = await weather.geocode(destination)
+    except Exception as e:
+        await websocket.send_json({"status": "error", "message": f"Geocoding failed: {str(e)}"})
+        return
+    if place is None:
+        await websocket.send_json({"status": "error", "message": "Destination not found"})
+        return
+    lat, lon = place["latitude"], place["longitude"]
+    
+    # Calculate stay budget per night
+    per_night_rounded = 0
+    try:
+        total_budget = float(budget)
+        total_days = max(2, int(days))
+        stay_cost = total_budget * 0.4048
+        per_night = stay_cost / (total_days - 1)
+        per_night_rounded = round(per_night / 100) * 100
+        price_range = f"₹{max(0, per_night_rounded - 200)} – ₹{per_night_rounded + 300} per night"
+    except (ValueError, TypeError):
+        price_range = "Under Budget"
+    
+    # 2. Weather and stays only depend on the coordinates, so fetch them together
+    await websocket.send_json({"status": "thinking", "step": "searching", "message": "Fetching live weather data and searching for real stays..."})
+    
+    async def reported(step: str, message: str, fetch):
+        # Progress event as soon as this part lands, whichever finishes first
+        result = await fetch
+        await websocket.send_json({"status": "thinking", "step": step, "message": message})
+        return result
+    
+    weather_data, stays_data = await asyncio.gather(
+        reported("weather", "Live weather loaded", fetch_forecast(lat, lon, from_date, to_date)),
+        reported("stays", "Stay search finished", fetch_stays(lat, lon, destination, from_date, to_date, price_range))
+    )
 
     # If no stays found or less than 3, provide curated fallbacks with real dates
     while len(stays_data) < 3:
@@ -189,7 +191,6 @@ async def fetch_weather_and_stays(destination: str, from_date: str, to_date: str
             "quote": "Click link above to view live availability for your dates."
         })
 
-    await asyncio.sleep(1)
     await websocket.send_json({
         "status": "success", 
         "data": {
@@ -202,6 +203,8 @@ async def fetch_weather_and_stays(destination: str, from_date: str, to_date: str
 @router.websocket("/ws/travel-planner")
 async def travel_planner_websocket(websocket: WebSocket):
     await websocket.accept()
+    # Keep references so searches are not garbage collected mid-flight and can be cancelled
+    searches: Set[asyncio.Task] = set()
     try:
         while True:
             data = await websocket.receive_text()
@@ -213,9 +216,14 @@ async def travel_planner_websocket(websocket: WebSocket):
             days = req.get("days", 5)
             
             # Start background fetch
-            asyncio.create_task(fetch_weather_and_stays(destination, from_date, to_date, budget, days, websocket))
+            search = asyncio.create_task(fetch_weather_and_stays(destination, from_date, to_date, budget, days, websocket))
+            searches.add(search)
+            search.add_done_callback(searches.discard)
             
     except WebSocketDisconnect:
         pass
     except Exception as e:
-        print(f"WS error: {e}")
+        logger.warning("WS error: %s", e)
+    finally:
+        for search in searches:
+            search.cancel()
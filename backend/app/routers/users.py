@@ -1,28 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.orm import contains_eager
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, func, and_, or_
+from typing import List, Optional
 
-from app.database import get_db
-from app.database import get_db
-from app.models import User, DriverProfile, UserRole, Ride, RideStatus, Transaction, SavedCard
+from app.database import get_async_db
+from app.models import User, DriverProfile, UserRole, Ride, RideStatus, Transaction, SavedCard, VehicleType
 from app.schemas import UserResponse, DriverProfileResponse, DriverProfileUpdate, DriverWithProfile, LocationUpdate, WalletAdd, UserUpdate, TransactionResponse, SavedCardCreate, SavedCardResponse
-from app.auth import get_current_active_user
+from app.auth import get_current_active_user_async, invalidate_principal_on_commit
 from app.websocket import manager
+from app.services.driver_index import driver_spatial_index, driver_city_index
+from app.utils import escape_like, vehicle_type_variants
+from app.log import get_logger
 
 router = APIRouter()
+logger = get_logger(__name__)
 
 @router.get("/me", response_model=DriverWithProfile)
 async def get_current_user_info(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get current user information"""
     # If user is a driver, fetch their profile
     if current_user.role == UserRole.DRIVER:
-        driver_profile = db.query(DriverProfile).filter(
-            DriverProfile.user_id == current_user.id
-        ).first()
+        # Loaded together with the user by get_current_user
+        driver_profile = current_user.driver_profile
         
         # Create a dict from the user model
         user_dict = UserResponse.from_orm(current_user).dict()
@@ -38,65 +41,74 @@ async def get_current_user_info(
 
 @router.get("/me/debug", response_model=UserResponse)
 async def get_current_user_debug(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get current user with debug information"""
-    print(f"=== USER DEBUG ===")
-    print(f"User ID: {current_user.id}")
-    print(f"User Email: {current_user.email}")
-    print(f"User Role: {current_user.role}")
-    print(f"User Role Type: {type(current_user.role)}")
-    print(f"UserRole.DRIVER: {UserRole.DRIVER}")
-    print(f"UserRole.DRIVER Type: {type(UserRole.DRIVER)}")
-    print(f"UserRole.DRIVER.value: {UserRole.DRIVER.value}")
-    print(f"UserRole.DRIVER.value Type: {type(UserRole.DRIVER.value)}")
-    print(f"Role comparison: {str(current_user.role) == str(UserRole.DRIVER.value)}")
-    print(f"=== END USER DEBUG ===")
+    logger.info("User debug", extra={
+        "user_id": current_user.id,
+        "email": current_user.email,
+        "role": str(current_user.role),
+        "role_type": type(current_user.role).__name__,
+        "driver_role_value": UserRole.DRIVER.value,
+        "role_matches_driver": str(current_user.role) == str(UserRole.DRIVER.value)
+    })
     
     # Also check if user has a driver profile
-    driver_profile = db.query(DriverProfile).filter(
-        DriverProfile.user_id == current_user.id
-    ).first()
+    driver_profile = current_user.driver_profile
     
-    print(f"Driver profile exists: {driver_profile is not None}")
-    if driver_profile:
-        print(f"Driver profile available: {driver_profile.is_available}")
+    logger.info("Driver profile exists: %s, available: %s",
+                driver_profile is not None, driver_profile.is_available if driver_profile else None)
     
     return current_user
 
 @router.get("/drivers", response_model=List[DriverWithProfile])
 async def get_drivers(
-    db: Session = Depends(get_db),
-    available_only: bool = False
+    response: Response,
+    available_only: bool = False,
+    city: Optional[str] = None,
+    vehicle_type: Optional[VehicleType] = None,
+    cursor: Optional[int] = Query(None, ge=0, description="Driver id to continue after (X-Next-Cursor of the previous page)"),
+    limit: Optional[int] = Query(None, ge=1, le=500, description="Page size; 100 when only a cursor is given"),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get list of drivers"""
-    query = db.query(User).filter(User.role == UserRole.DRIVER)
-    drivers = query.all()
-    
-    result = []
-    for driver in drivers:
-        driver_profile = db.query(DriverProfile).filter(
-            DriverProfile.user_id == driver.id
-        ).first()
-        
-        if available_only and driver_profile and not driver_profile.is_available:
-            continue
-        
-        driver_dict = UserResponse.from_orm(driver).dict()
-        if driver_profile:
-            driver_dict['driver_profile'] = DriverProfileResponse.from_orm(driver_profile).dict()
-        else:
-            driver_dict['driver_profile'] = None
-        result.append(driver_dict)
+    """Get list of drivers ordered by id; paged when limit or cursor is passed, otherwise all of them"""
+    # One outer-joined query for users and profiles; filters and paging run in SQL
+    query = (
+        select(User)
+        .outerjoin(User.driver_profile)
+        .options(contains_eager(User.driver_profile))
+        .where(User.role == UserRole.DRIVER)
+    )
+    if available_only:
+        # Drivers that have not set up a profile yet were always listed
+        query = query.where(or_(DriverProfile.id.is_(None), DriverProfile.is_available == True))
+    if city:
+        query = query.where(DriverProfile.city.ilike(f"%{escape_like(city.strip())}%", escape="\\"))
+    if vehicle_type:
+        query = query.where(DriverProfile.vehicle_type.in_(vehicle_type_variants(vehicle_type)))
+    if cursor is not None:
+        query = query.where(User.id > cursor)
+    query = query.order_by(User.id)
+
+    # Unpaged callers (the admin dashboard) get the full list as before
+    if limit is None and cursor is None:
+        return (await db.execute(query)).scalars().all()
+    limit = limit or 100
+
+    # Fetch one extra row to know whether another page follows
+    drivers = (await db.execute(query.limit(limit + 1))).scalars().all()
+    if len(drivers) > limit:
+        drivers = drivers[:limit]
+        response.headers["X-Next-Cursor"] = str(drivers[-1].id)
     
-    return result
+    return drivers
 
 @router.patch("/driver/location", response_model=UserResponse)
 async def update_driver_location(
     location_data: LocationUpdate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update driver's current location"""
     if current_user.role.value != UserRole.DRIVER.value:
@@ -106,9 +118,7 @@ async def update_driver_location(
         )
     
     # Get or create driver profile
-    driver_profile = db.query(DriverProfile).filter(
-        DriverProfile.user_id == current_user.id
-    ).first()
+    driver_profile = current_user.driver_profile
     
     if not driver_profile:
         raise HTTPException(
@@ -120,17 +130,19 @@ async def update_driver_location(
     driver_profile.current_lat = location_data.lat
     driver_profile.current_lng = location_data.lng
     
-    db.commit()
-    db.refresh(driver_profile)
-    db.refresh(current_user)
+    await db.commit()
+    await db.refresh(driver_profile)
+    await db.refresh(current_user)
+    driver_spatial_index.sync_profile(driver_profile, bool(current_user.is_active))
     
     # Send WebSocket update to all riders with active rides with this driver
-    active_rides = db.query(Ride).filter(
+    result = await db.execute(select(Ride.id, Ride.rider_id).where(
         and_(
             Ride.driver_id == current_user.id,
             Ride.status.in_([RideStatus.ACCEPTED, RideStatus.IN_PROGRESS])
         )
-    ).all()
+    ))
+    active_rides = result.all()
     
     for ride in active_rides:
         # Send location update to rider
@@ -145,8 +157,8 @@ async def update_driver_location(
 
 @router.patch("/driver/availability", response_model=DriverWithProfile)
 async def toggle_driver_availability(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Toggle driver availability status"""
     
@@ -158,9 +170,7 @@ async def toggle_driver_availability(
         )
     
     # Get or create driver profile
-    driver_profile = db.query(DriverProfile).filter(
-        DriverProfile.user_id == current_user.id
-    ).first()
+    driver_profile = current_user.driver_profile
     
     if not driver_profile:
         # Create driver profile if it doesn't exist
@@ -171,14 +181,14 @@ async def toggle_driver_availability(
         )
         db.add(driver_profile)
         try:
-            db.commit()
+            await db.commit()
         except Exception as e:
-            db.rollback()
+            await db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Failed to create driver profile: {str(e)}"
             )
-        db.refresh(driver_profile)
+        await db.refresh(driver_profile)
     
     # Toggle availability
     # Toggle availability
@@ -189,12 +199,14 @@ async def toggle_driver_availability(
     driver_profile.is_available = not current_status
     
     try:
-        db.commit()
-        db.refresh(driver_profile)
-        db.refresh(current_user)
-        print(f"Driver {current_user.id} availability toggled to: {driver_profile.is_available}")
+        await db.commit()
+        await db.refresh(driver_profile)
+        await db.refresh(current_user)
+        driver_spatial_index.sync_profile(driver_profile, bool(current_user.is_active))
+        driver_city_index.sync_profile(driver_profile, bool(current_user.is_active))
+        logger.debug("Driver %s availability toggled to: %s", current_user.id, driver_profile.is_available)
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to update availability: {str(e)}"
@@ -209,35 +221,40 @@ async def toggle_driver_availability(
 @router.post("/wallet/add", response_model=UserResponse)
 async def add_money_to_wallet(
     wallet_data: WalletAdd,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Add money to user's wallet"""
     # Only riders can add money manually (drivers earn from rides)
     # But for testing/flexibility, we might allow both or restrict.
     # User request: "make the amount in the wallet initial amount to 0 in rider section only if he adds the amount"
     
-    current_user.wallet_balance = float(current_user.wallet_balance or 0) + wallet_data.amount
-    db.commit()
-    db.refresh(current_user)
+    # Atomic increment: current_user may be a cached snapshot with an old balance
+    await db.execute(update(User).where(User.id == current_user.id).values(
+        {User.wallet_balance: func.coalesce(User.wallet_balance, 0) + wallet_data.amount}
+    ).execution_options(synchronize_session=False))
+    invalidate_principal_on_commit(db.sync_session, current_user.id)
+    await db.commit()
+    await db.refresh(current_user)
     return current_user
 
 @router.get("/transactions", response_model=List[TransactionResponse])
 async def get_transactions(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get user's transaction history"""
-    transactions = db.query(Transaction).filter(
+    result = await db.execute(select(Transaction).where(
         Transaction.user_id == current_user.id
-    ).order_by(Transaction.created_at.desc()).all()
+    ).order_by(Transaction.created_at.desc()))
+    transactions = result.scalars().all()
     return transactions
 
 @router.put("/me/driver", response_model=DriverProfileResponse)
 async def update_driver_profile(
     profile_update: DriverProfileUpdate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update driver profile"""
     if current_user.role != UserRole.DRIVER:
@@ -246,9 +263,7 @@ async def update_driver_profile(
             detail="Only drivers can update their driver profile"
         )
     
-    driver_profile = db.query(DriverProfile).filter(
-        DriverProfile.user_id == current_user.id
-    ).first()
+    driver_profile = current_user.driver_profile
     
     if not driver_profile:
         raise HTTPException(
@@ -271,22 +286,24 @@ async def update_driver_profile(
     if profile_update.city is not None:
         driver_profile.city = profile_update.city
         
-    db.commit()
-    db.refresh(driver_profile)
+    await db.commit()
+    await db.refresh(driver_profile)
+    driver_city_index.sync_profile(driver_profile, bool(current_user.is_active))
     return driver_profile
 
 @router.put("/me", response_model=UserResponse)
 async def update_user_profile(
     user_update: UserUpdate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update user profile"""
     if user_update.name is not None:
         current_user.name = user_update.name
     if user_update.email is not None:
         # Check if email is taken
-        existing_user = db.query(User).filter(User.email == user_update.email).first()
+        result = await db.execute(select(User.id).where(User.email == user_update.email))
+        existing_user = result.first()
         if existing_user and existing_user.id != current_user.id:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -300,36 +317,38 @@ async def update_user_profile(
     if user_update.profile_picture is not None:
         current_user.profile_picture = user_update.profile_picture
         
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    await db.refresh(current_user)
     return current_user
 
 @router.get("/cards", response_model=List[SavedCardResponse])
 async def get_saved_cards(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get user's saved cards"""
-    cards = db.query(SavedCard).filter(
+    result = await db.execute(select(SavedCard).where(
         SavedCard.user_id == current_user.id
-    ).order_by(SavedCard.created_at.desc()).all()
+    ).order_by(SavedCard.created_at.desc()))
+    cards = result.scalars().all()
     return cards
 
 @router.post("/cards", response_model=SavedCardResponse)
 async def add_saved_card(
     card_data: SavedCardCreate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Add a new saved card"""
     # check if card already exists (simple check by last4 for now)
-    existing_card = db.query(SavedCard).filter(
+    result = await db.execute(select(SavedCard.id).where(
         and_(
             SavedCard.user_id == current_user.id,
             SavedCard.last4 == card_data.last4,
             SavedCard.brand == card_data.brand
         )
-    ).first()
+    ))
+    existing_card = result.first()
     
     if existing_card:
         raise HTTPException(
@@ -347,23 +366,24 @@ async def add_saved_card(
     )
     
     db.add(new_card)
-    db.commit()
-    db.refresh(new_card)
+    await db.commit()
+    await db.refresh(new_card)
     return new_card
 
 @router.delete("/cards/{card_id}")
 async def delete_saved_card(
     card_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete a saved card"""
-    card = db.query(SavedCard).filter(
+    result = await db.execute(select(SavedCard).where(
         and_(
             SavedCard.id == card_id,
             SavedCard.user_id == current_user.id
         )
-    ).first()
+    ))
+    card = result.scalars().first()
     
     if not card:
         raise HTTPException(
@@ -371,6 +391,6 @@ async def delete_saved_card(
             detail="Card not found"
         )
         
-    db.delete(card)
-    db.commit()
+    await db.delete(card)
+    await db.commit()
     return {"message": "Card deleted successfully"}
\ No newline at end of file
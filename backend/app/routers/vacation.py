@@ -4,20 +4,25 @@ from sqlalchemy import and_
 from typing import List
 import random
 import string
+import numpy as np
 from datetime import datetime
 from pydantic import BaseModel # Added
 
 from app.database import get_db
-from app.models import User, Vacation, UserRole, Transaction, LoyaltyPoints, RideStatus
+from app.models import User, Vacation, UserRole, LoyaltyPoints, RideStatus
 from app.schemas import VacationCreate, VacationResponse
 from app.auth import get_current_active_user
 from app.routers.vacation_scheduler import schedule_next_ride
-from app.utils import calculate_distance, calculate_fare
+from app.utils import calculate_distance, calculate_distances, calculate_fare
 from app.services.ai_visualizer import visualizer # Added
 from app.services.travel_buddy_agent import travel_buddy_agent # Added
+from app.services.ledger import ledger_service
 import json
+import logging
+from app.log import get_logger
 
 router = APIRouter()
+logger = get_logger(__name__)
 
 class TravelBuddyRequestModel(BaseModel):
     city: str
@@ -29,7 +34,7 @@ class TravelBuddyRequestModel(BaseModel):
 async def generate_vacation_travel_buddy(request: TravelBuddyRequestModel):
     """Travel Buddy Agent endpoint nested under /api/vacation/travel-buddy"""
     try:
-        return travel_buddy_agent.execute(
+        return await travel_buddy_agent.aexecute(
             city=request.city,
             budget=request.budget,
             currency=request.currency,
@@ -48,7 +53,7 @@ async def visualize_trip(request: VisualizeRequest):
         script = visualizer.generate_script(request.destination, request.trip_type)
         return {"script": script}
     except Exception as e:
-        print(f"Visualization Error: {e}")
+        logger.warning("Visualization Error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -94,14 +99,13 @@ def calculate_vacation_price(
     if activities:
         try:
             activities_list = json.loads(activities)
-            for i, activity in enumerate(activities_list):
-                # Simulate activity location with slight offset
-                activity_lat = 15.3000 + (i * 0.01)
-                activity_lng = 74.1250 + (i * 0.01)
-                
-                dist_activity = calculate_distance(goa_hotel_lat, goa_hotel_lng, activity_lat, activity_lng)
-                fare_activity = calculate_fare(dist_activity, vehicle_type)
-                total_fare += fare_activity
+            if activities_list:
+                # Simulate activity locations with slight offsets
+                offsets = np.arange(len(activities_list)) * 0.01
+                activity_distances = calculate_distances(goa_hotel_lat, goa_hotel_lng, 15.3000 + offsets, 74.1250 + offsets)
+                for dist_activity in activity_distances:
+                    fare_activity = calculate_fare(float(dist_activity), vehicle_type)
+                    total_fare += fare_activity
         except:
             pass
             
@@ -192,10 +196,10 @@ async def create_vacation(
         db.add(new_vacation)
         db.commit()
         db.refresh(new_vacation)
-        print(f"Vacation booking created successfully with ID: {new_vacation.id}")
+        logger.info("Vacation booking created successfully with ID: %s", new_vacation.id)
     except Exception as e:
         db.rollback()
-        print(f"Failed to create vacation booking: {e}")
+        logger.exception("Failed to create vacation booking")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to create vacation booking: {str(e)}"
@@ -217,9 +221,9 @@ async def create_vacation(
                 loyalty.tier = "silver"
             
             db.commit()
-            print(f"Loyalty points updated. New total: {loyalty.total_points}")
+            logger.info("Loyalty points updated. New total: %s", loyalty.total_points)
     except Exception as e:
-        print(f"Failed to update loyalty points: {e}")
+        logger.warning("Failed to update loyalty points: %s", e)
         # Don't fail the booking if loyalty points can't be updated
         pass
     
@@ -245,7 +249,7 @@ async def create_vacation(
                 )
             ).all()
             
-            print(f"Found {len(drivers)} available drivers to notify")
+            logger.info("Found %s available drivers to notify", len(drivers))
             
             # Send WebSocket notification to nearby drivers
             for driver in drivers:
@@ -260,24 +264,24 @@ async def create_vacation(
                         "total_price": float(new_vacation.total_price),
                         "passengers": new_vacation.passengers
                     }, int(driver.id) if driver.id is not None else 0)
-                    print(f"Sent vacation request notification to driver {driver.id}")
+                    logger.info("Sent vacation request notification to driver %s", driver.id)
                 except Exception as e:
-                    print(f"Failed to send WebSocket message to driver {driver.id}: {e}")
+                    logger.warning("Failed to send WebSocket message to driver %s: %s", driver.id, e)
         except Exception as e:
-            print(f"Failed to send WebSocket notifications: {e}")
+            logger.warning("Failed to send WebSocket notifications: %s", e)
             
     # For custom/automated packages, automatically schedule the first ride immediately
     # This specifically addresses the requirement: "the rider must get the button of START NEXT LEG not at the beginiinng itself"
     # By starting the first leg now, the rider will be in "Loop 1" (Ride 1), and "START NEXT LEG" will appear after this ride is done.
     if not vacation_data.is_fixed_package:
         try:
-            print(f"Auto-scheduling first ride for custom vacation {new_vacation.id}...")
+            logger.info("Auto-scheduling first ride for custom vacation %s...", new_vacation.id)
             # Import here to avoid circular dependency issues at top level if any
             from app.routers.vacation_scheduler import schedule_next_ride
             await schedule_next_ride(db, new_vacation.id)
-            print(f"Successfully auto-scheduled first ride for vacation {new_vacation.id}")
+            logger.info("Successfully auto-scheduled first ride for vacation %s", new_vacation.id)
         except Exception as e:
-            print(f"Failed to auto-schedule first ride: {e}")
+            logger.warning("Failed to auto-schedule first ride: %s", e)
             # We don't fail the booking, but log the error. 
             # The user might need to click "Start Next Leg" manually if this fails, 
             # or we could rely on the "Start Next Leg" button being available since status is confirmed.
@@ -321,12 +325,14 @@ async def get_vacations(
         query = query.filter(Vacation.user_id == current_user.id)
     
     vacations = query.order_by(Vacation.created_at.desc()).all()
-    print(f"DEBUG: Found {len(vacations)} vacations for user {current_user.email}")
-    for v in vacations:
-        try:
-            print(f"DEBUG: Vacation {v.id}: rides={len(v.rides)}, completed={v.completed_rides_count}, active={v.has_active_ride}")
-        except Exception as e:
-            print(f"ERROR processing vacation {v.id}: {e}")
+    logger.debug("Found %s vacations for user %s", len(vacations), current_user.email)
+    # Per-vacation details touch each vacation's rides; only pay for that when debugging
+    if logger.isEnabledFor(logging.DEBUG):
+        for v in vacations:
+            try:
+                logger.debug("Vacation %s: rides=%s, completed=%s, active=%s", v.id, len(v.rides), v.completed_rides_count, v.has_active_ride)
+            except Exception as e:
+                logger.warning("Error processing vacation %s: %s", v.id, e)
     return vacations
 
 @router.get("/available", response_model=List[VacationResponse])
@@ -400,10 +406,10 @@ async def cancel_vacation(
             detail="Not authorized to cancel this booking"
         )
     
-    print(f"DEBUG: Attempting to cancel vacation {vacation_id} for user {current_user.id}")
+    logger.debug("Attempting to cancel vacation %s for user %s", vacation_id, current_user.id)
     
     if vacation.status == "completed":
-        print(f"DEBUG: Cannot cancel completed vacation {vacation_id}")
+        logger.debug("Cannot cancel completed vacation %s", vacation_id)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Cannot cancel completed vacations"
@@ -413,20 +419,18 @@ async def cancel_vacation(
         vacation.status = "cancelled"
         
         # Cancel all associated pending/active rides
-        print(f"DEBUG: Cancelling {len(vacation.rides)} associated rides")
+        logger.debug("Cancelling %s associated rides", len(vacation.rides))
         for ride in vacation.rides:
             if ride.status not in [RideStatus.COMPLETED, RideStatus.CANCELLED]:
-                print(f"DEBUG: Cancelling ride {ride.id} with status {ride.status}")
+                logger.debug("Cancelling ride %s with status %s", ride.id, ride.status)
                 ride.status = RideStatus.CANCELLED
                 
         db.commit()
-        print(f"DEBUG: Vacation {vacation_id} cancelled successfully")
+        logger.debug("Vacation %s cancelled successfully", vacation_id)
         
     except Exception as e:
         db.rollback()
-        print(f"ERROR: Failed to cancel vacation: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Failed to cancel vacation %s", vacation_id)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to cancel vacation: {str(e)}"
@@ -442,7 +446,7 @@ async def confirm_vacation(
 ):
     """Confirm a vacation booking (driver action)"""
     # Debug logging
-    print(f"DEBUG: confirm_vacation user={current_user.email}, role={current_user.role}, type={type(current_user.role)}")
+    logger.debug("confirm_vacation user=%s, role=%s, type=%s", current_user.email, current_user.role, type(current_user.role))
     
     # Check if user is driver or admin
     # Robust role check
@@ -452,11 +456,11 @@ async def confirm_vacation(
     else:
         user_role = str(user_role).lower()
         
-    print(f"DEBUG: confirm_vacation user={current_user.email}, role={user_role}")
+    logger.debug("confirm_vacation user=%s, role=%s", current_user.email, user_role)
     
     # Check if user is driver or admin
     if user_role not in [UserRole.DRIVER.value, UserRole.ADMIN.value]:
-        print(f"DEBUG: Authorization failed for user {current_user.id} with role {user_role}")
+        logger.debug("Authorization failed for user %s with role %s", current_user.id, user_role)
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail=f"Only drivers and admins can confirm vacation bookings. Your role is: {user_role}"
@@ -482,7 +486,7 @@ async def confirm_vacation(
     db.refresh(vacation)
     
     # Schedule the first ride
-    print(f"Vacation {vacation.id} confirmed. Scheduling first ride...")
+    logger.info("Vacation %s confirmed. Scheduling first ride...", vacation.id)
     await schedule_next_ride(db, vacation.id)
     
     # Send WebSocket notification to rider
@@ -494,7 +498,7 @@ async def confirm_vacation(
             "status": "confirmed"
         }, int(vacation.user_id) if vacation.user_id is not None else 0)
     except Exception as e:
-        print(f"Failed to send WebSocket notification to rider: {e}")
+        logger.warning("Failed to send WebSocket notification to rider: %s", e)
     
     return {"message": "Vacation booking confirmed successfully", "vacation": vacation}
 
@@ -547,7 +551,7 @@ async def reject_vacation(
             "status": "rejected"
         }, int(vacation.user_id) if vacation.user_id is not None else 0)
     except Exception as e:
-        print(f"Failed to send WebSocket notification to rider: {e}")
+        logger.warning("Failed to send WebSocket notification to rider: %s", e)
     
     return {"message": "Vacation booking rejected successfully", "vacation": vacation}
 
@@ -605,7 +609,7 @@ async def start_vacation(
             "status": "in_progress"
         }, int(vacation.user_id) if vacation.user_id is not None else 0)
     except Exception as e:
-        print(f"Failed to send WebSocket notification to rider: {e}")
+        logger.warning("Failed to send WebSocket notification to rider: %s", e)
         
     return {"message": "Vacation started successfully", "vacation": vacation}
 
@@ -652,19 +656,12 @@ async def complete_vacation(
     
     vacation.status = "completed"
     
-    # Credit driver's wallet
-    driver = db.query(User).filter(User.id == current_user.id).first()
-    if driver:
-        driver.wallet_balance = float(driver.wallet_balance or 0) + vacation.total_price
-        
-        # Create transaction record
-        transaction = Transaction(
-            user_id=driver.id,
-            amount=vacation.total_price,
-            type="credit",
-            description=f"Payment for vacation booking #{vacation.id} ({vacation.destination})"
-        )
-        db.add(transaction)
+    # Credit driver's wallet (atomic increment + transaction record)
+    ledger_service.post(db, [(
+        current_user.id,
+        float(vacation.total_price or 0),
+        f"Payment for vacation booking #{vacation.id} ({vacation.destination})"
+    )])
         
     db.commit()
     db.refresh(vacation)
@@ -678,7 +675,7 @@ async def complete_vacation(
             "status": "completed"
         }, int(vacation.user_id) if vacation.user_id is not None else 0)
     except Exception as e:
-        print(f"Failed to send WebSocket notification to rider: {e}")
+        logger.warning("Failed to send WebSocket notification to rider: %s", e)
         
     return {"message": "Vacation completed successfully", "vacation": vacation}
 
@@ -709,9 +706,7 @@ async def get_loyalty_points(
             }.get(loyalty.tier, "Basic rewards")
         }
     except Exception as e:
-        print(f"Error in get_loyalty_points: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in get_loyalty_points")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Internal Server Error: {str(e)}"
@@ -9,8 +9,10 @@ from app.models import User, Vacation, Ride, DriverProfile, RideStatus, UserRole
 from app.schemas import RideCreate
 from app.auth import get_current_active_user
 from app.utils import calculate_fare, calculate_distance
+from app.log import get_logger
 
 router = APIRouter()
+logger = get_logger(__name__)
 
 def parse_schedule(vacation: Vacation) -> dict:
     """Parse the vacation schedule JSON data"""
@@ -35,7 +37,7 @@ async def schedule_next_ride(db: Session, vacation_id: int) -> Optional[Ride]:
     if ride_count > 0:
         last_ride = existing_rides[-1]
         if last_ride.status != RideStatus.COMPLETED:
-            print(f"Cannot schedule next ride. Previous ride {last_ride.id} is not completed (Status: {last_ride.status})")
+            logger.info("Cannot schedule next ride. Previous ride %s is not completed (Status: %s)", last_ride.id, last_ride.status)
             return None
     
     # Parse schedule data
@@ -111,7 +113,7 @@ async def schedule_next_ride(db: Session, vacation_id: int) -> Optional[Ride]:
                     driver_id=vacation.driver_id # Assign to the vacation driver
                 )
             except Exception as e:
-                print(f"Failed to create departure ride: {e}")
+                logger.warning("Failed to create departure ride: %s", e)
 
     # Ride 1: Airport -> Hotel (Arrival at Destination)
     elif ride_count == 1:
@@ -149,7 +151,7 @@ async def schedule_next_ride(db: Session, vacation_id: int) -> Optional[Ride]:
                     driver_id=vacation.driver_id
                 )
             except Exception as e:
-                print(f"Failed to create arrival ride: {e}")
+                logger.warning("Failed to create arrival ride: %s", e)
 
     # Rides 2 to N+1: Activities (Hotel -> Activity)
     elif ride_count <= len(activities) + 1:
@@ -183,7 +185,7 @@ async def schedule_next_ride(db: Session, vacation_id: int) -> Optional[Ride]:
                 driver_id=vacation.driver_id
             )
         except Exception as e:
-            print(f"Failed to create activity ride: {e}")
+            logger.warning("Failed to create activity ride: %s", e)
 
     # Last Ride: Hotel -> Airport (Departure from Destination)
     elif ride_count == len(activities) + 2:
@@ -218,7 +220,7 @@ async def schedule_next_ride(db: Session, vacation_id: int) -> Optional[Ride]:
                     driver_id=vacation.driver_id
                 )
             except Exception as e:
-                print(f"Failed to create return ride: {e}")
+                logger.warning("Failed to create return ride: %s", e)
 
     # Final Leg: Origin Airport -> Home
     elif ride_count == len(activities) + 3:
@@ -251,15 +253,15 @@ async def schedule_next_ride(db: Session, vacation_id: int) -> Optional[Ride]:
                 scheduled_time=datetime.now(),
                 driver_id=vacation.driver_id
             )
-            print(f"Created final leg: {origin_city} Airport -> Home")
+            logger.info("Created final leg: %s Airport -> Home", origin_city)
         except Exception as e:
-            print(f"Failed to create final home ride: {e}")
+            logger.warning("Failed to create final home ride: %s", e)
 
     # All ride legs completed
     elif ride_count > len(activities) + 3:
         # Check if the last ride is completed
         if existing_rides and existing_rides[-1].status == RideStatus.COMPLETED:
-            print(f"All rides completed for vacation {vacation_id}. Updating status.")
+            logger.info("All rides completed for vacation %s. Updating status.", vacation_id)
             vacation.status = "completed"
             db.commit()
             return None
@@ -269,7 +271,7 @@ async def schedule_next_ride(db: Session, vacation_id: int) -> Optional[Ride]:
             db.add(new_ride)
             db.commit()
             db.refresh(new_ride)
-            print(f"Scheduled next ride for vacation {vacation_id}: {new_ride.id}")
+            logger.info("Scheduled next ride for vacation %s: %s", vacation_id, new_ride.id)
             
             # Notify drivers about the new ride
             try:
@@ -283,14 +285,14 @@ async def schedule_next_ride(db: Session, vacation_id: int) -> Optional[Ride]:
                     "estimated_fare": new_ride.estimated_fare,
                     "vehicle_type": new_ride.vehicle_type.value if new_ride.vehicle_type else "economy"
                 }, int(new_ride.driver_id))
-                print(f"Sent new ride request notification to driver {new_ride.driver_id}")
+                logger.info("Sent new ride request notification to driver %s", new_ride.driver_id)
             except Exception as e:
-                print(f"Failed to send WebSocket notification: {e}")
+                logger.warning("Failed to send WebSocket notification: %s", e)
                 
             return new_ride
         except Exception as e:
             db.rollback()
-            print(f"Failed to save new ride: {e}")
+            logger.warning("Failed to save new ride: %s", e)
             return None
             
     return None
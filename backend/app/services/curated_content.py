@@ -0,0 +1,151 @@
+"""
+Curated restaurants and events for the Travel Buddy tools.
+
+Content lives in app/data/curated_places.json, one entry per place with its
+spelling variants listed as aliases (chikmagalur / chikkamagaluru / ...)
+instead of duplicated copies. It is read on first lookup, not at import,
+and indexed once per worker:
+
+- names: normalized name or alias -> place (exact lookups)
+- prefixes: each prefix covering at least 3/4 of a name -> first place in
+  file order, so unfinished input like "bangalo" or "chikkamagal" still
+  resolves; it is only consulted for single-word input, and whole words
+  like "Bengal" fall through to the generic content
+- restaurants are also kept sorted by the low end of `price_for_two`, so
+  putting the in-budget picks first is a bisect instead of a scan
+"""
+
+import json
+import math
+import re
+import threading
+from bisect import bisect_right
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.log import get_logger
+
+logger = get_logger(__name__)
+
+DATA_PATH = Path(__file__).resolve().parent.parent / "data" / "curated_places.json"
+MIN_PREFIX = 3
+PREFIX_COVERAGE = 0.75
+
+_NON_WORD = re.compile(r"[^\w]+")
+_AMOUNT = re.compile(r"\d[\d,]*")
+
+
+def normalize_place(name: str) -> str:
+    """Lowercase, punctuation -> spaces, whitespace collapsed"""
+    return " ".join(_NON_WORD.sub(" ", str(name or "").lower()).split())
+
+
+def price_range(price_for_two: str) -> Tuple[int, int]:
+    """(low, high) from strings like "₹180 - ₹350"; (0, 0) if there are no amounts"""
+    amounts = [int(a.replace(",", "")) for a in _AMOUNT.findall(price_for_two or "")]
+    if not amounts:
+        return 0, 0
+    return min(amounts), max(amounts)
+
+
+def _shortest_partial(length: int) -> int:
+    """Fewest characters of a `length`-long name that still count as a match"""
+    return max(MIN_PREFIX, math.ceil(length * PREFIX_COVERAGE))
+
+
+class CuratedPlace:
+    """One place's curated content plus its restaurants pre-sorted by price"""
+
+    __slots__ = ("order", "name", "currency", "restaurants", "events", "_by_price", "_price_floors")
+
+    def __init__(self, order: int, entry: Dict[str, Any]):
+        self.order = order
+        self.name = entry["name"]
+        self.currency = entry.get("currency")
+        self.restaurants: List[Dict[str, Any]] = entry.get("restaurants", [])
+        self.events: List[Dict[str, Any]] = entry.get("events", [])
+        priced = sorted(self.restaurants, key=lambda r: price_range(r.get("price_for_two", ""))[0])
+        self._by_price = priced
+        self._price_floors = [price_range(r.get("price_for_two", ""))[0] for r in priced]
+
+    def affordable_restaurants(self, meal_budget: float, currency: str) -> List[Dict[str, Any]]:
+        """All picks, with the ones whose cheapest meal for two fits `meal_budget` first.
+
+        Curated order is kept when everything (or nothing) fits, or when the
+        request is in a currency the prices aren't listed in.
+        """
+        if not self.currency or currency.upper() != self.currency or meal_budget <= 0:
+            return self.restaurants
+        fitting = bisect_right(self._price_floors, meal_budget)
+        if fitting == 0 or fitting == len(self._by_price):
+            return self.restaurants
+        return self._by_price
+
+
+class CuratedStore:
+    """Lazily loaded, indexed view of the curated places file"""
+
+    def __init__(self, path: Path = DATA_PATH):
+        self.path = path
+        self._names: Optional[Dict[str, CuratedPlace]] = None
+        self._prefixes: Dict[str, CuratedPlace] = {}
+        self._lock = threading.Lock()
+
+    def _ensure_loaded(self) -> Dict[str, CuratedPlace]:
+        if self._names is None:
+            with self._lock:
+                if self._names is None:
+                    self._load()
+        return self._names
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                entries = json.load(f).get("places", [])
+        except (OSError, ValueError) as e:
+            logger.error("Could not load curated places from %s: %s", self.path, e)
+            entries = []
+
+        names: Dict[str, CuratedPlace] = {}
+        prefixes: Dict[str, CuratedPlace] = {}
+        for order, entry in enumerate(entries):
+            place = CuratedPlace(order, entry)
+            for name in [entry["name"], *entry.get("aliases", [])]:
+                key = normalize_place(name)
+                names.setdefault(key, place)
+                for end in range(_shortest_partial(len(key)), len(key) + 1):
+                    prefixes.setdefault(key[:end], place)
+        self._prefixes = prefixes
+        self._names = names
+        logger.info("Loaded %d curated places (%d names)", len(entries), len(names))
+
+    def _match(self, term: str, partial: bool = False) -> Optional[CuratedPlace]:
+        names = self._names
+        place = names.get(term)
+        if place is not None or len(term) < MIN_PREFIX:
+            return place
+        # term is most of a known name ("bangalo", single words only), or a known name is most of the term ("goan")
+        if partial:
+            place = self._prefixes.get(term)
+            if place is not None:
+                return place
+        for end in range(len(term) - 1, _shortest_partial(len(term)) - 1, -1):
+            place = names.get(term[:end])
+            if place is not None:
+                return place
+        return None
+
+    def find(self, city: str) -> Optional[CuratedPlace]:
+        """Curated place for free-text city input ("North Goa", "Bengaluru, KA"), or None"""
+        self._ensure_loaded()
+        query = normalize_place(city)
+        if not query:
+            return None
+        place = self._match(query, partial=" " not in query)
+        if place is not None:
+            return place
+        matches = [p for p in map(self._match, query.split()) if p is not None]
+        return min(matches, key=lambda p: p.order) if matches else None
+
+
+curated_store = CuratedStore()
@@ -0,0 +1,145 @@
+"""
+Ride dispatch engine.
+
+Ranks candidate drivers for a new ride and offers it to the best few in
+waves instead of notifying every matched driver at once. Each wave waits
+for a timeout; if the ride is still unassigned the next batch of drivers
+is offered the ride.
+"""
+
+import asyncio
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models import User, Ride, RideStatus
+from app.utils import calculate_distances, vehicle_type_variants
+from app.websocket import manager
+from app.log import get_logger
+
+logger = get_logger(__name__)
+
+
+class DispatchEngine:
+    """Scores candidate drivers and offers rides to the top K per wave"""
+
+    def __init__(
+        self,
+        wave_size: int = 5,
+        wave_timeout_seconds: float = 15.0,
+        max_waves: int = 5,
+        max_distance_km: float = 50.0,
+        max_idle_minutes: float = 60.0
+    ):
+        self.wave_size = max(1, wave_size)
+        self.wave_timeout_seconds = wave_timeout_seconds
+        self.max_waves = max_waves
+        self.max_distance_km = max_distance_km
+        self.max_idle_minutes = max_idle_minutes
+        # Relative weight of each normalized (0..1) scoring component
+        self.weights = {
+            "distance": 0.45,
+            "rating": 0.2,
+            "vehicle": 0.25,
+            "idle": 0.1
+        }
+
+    def _last_activity(self, db: Session, driver_ids: List[int]) -> Dict[int, datetime]:
+        """Most recent ride timestamp per driver, in one grouped query"""
+        rows = db.query(
+            Ride.driver_id,
+            func.max(func.coalesce(Ride.completed_at, Ride.created_at))
+        ).filter(Ride.driver_id.in_(driver_ids)).group_by(Ride.driver_id).all()
+        return {driver_id: last_seen for driver_id, last_seen in rows if last_seen is not None}
+
+    def rank_candidates(self, db: Session, ride: Ride, drivers: List[User]) -> List[Tuple[User, float]]:
+        """Return (driver, score) pairs, best first"""
+        if not drivers:
+            return []
+
+        # Distance: drivers matched by city only (no GPS fix) score as if at the edge of the radius
+        lats = [d.driver_profile.current_lat if d.driver_profile and d.driver_profile.current_lat is not None else np.nan for d in drivers]
+        lngs = [d.driver_profile.current_lng if d.driver_profile and d.driver_profile.current_lng is not None else np.nan for d in drivers]
+        distances = calculate_distances(float(ride.pickup_lat), float(ride.pickup_lng), lats, lngs)
+        distances = np.where(np.isnan(distances), self.max_distance_km, distances)
+        distance_scores = 1.0 - np.minimum(distances, self.max_distance_km) / self.max_distance_km
+
+        accepted_types = set(vehicle_type_variants(ride.vehicle_type)) if ride.vehicle_type is not None else set()
+        last_activity = self._last_activity(db, [d.id for d in drivers])
+        now = datetime.now(timezone.utc)
+
+        ranked = []
+        for i, driver in enumerate(drivers):
+            profile = driver.driver_profile
+            rating = float(profile.rating) if profile and profile.rating is not None else 5.0
+            vehicle_match = 1.0 if profile and profile.vehicle_type in accepted_types else 0.0
+
+            # Drivers with no ride history count as fully idle
+            idle_minutes = self.max_idle_minutes
+            last_seen = last_activity.get(driver.id)
+            if last_seen is not None:
+                if last_seen.tzinfo is None:
+                    last_seen = last_seen.replace(tzinfo=timezone.utc)
+                idle_minutes = max(0.0, (now - last_seen).total_seconds() / 60)
+
+            score = (
+                self.weights["distance"] * float(distance_scores[i])
+                + self.weights["rating"] * min(max(rating, 0.0), 5.0) / 5.0
+                + self.weights["vehicle"] * vehicle_match
+                + self.weights["idle"] * min(idle_minutes, self.max_idle_minutes) / self.max_idle_minutes
+            )
+            ranked.append((driver, round(score, 4)))
+
+        ranked.sort(key=lambda item: item[1], reverse=True)
+        return ranked
+
+    async def _is_open(self, ride_id: int) -> bool:
+        """Whether the ride is still pending and unassigned"""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(Ride.status, Ride.driver_id).where(Ride.id == ride_id))
+            ride = result.first()
+            return bool(ride) and ride.driver_id is None and ride.status == RideStatus.PENDING
+
+    async def dispatch(self, ride_data: dict, driver_ids: List[int]):
+        """Offer a ride to driver_ids (best first) wave by wave until someone accepts"""
+        ride_id = ride_data.get("ride_id")
+        waves = [driver_ids[i:i + self.wave_size] for i in range(0, len(driver_ids), self.wave_size)]
+        if self.max_waves:
+            waves = waves[:self.max_waves]
+
+        logger.info("Ride %s: %s candidates in %s waves", ride_id, len(driver_ids), len(waves))
+        for wave_number, wave in enumerate(waves, start=1):
+            if not await self._is_open(ride_id):
+                logger.info("Ride %s taken or cancelled before wave %s", ride_id, wave_number)
+                return
+
+            offer = {
+                **ride_data,
+                "offer_wave": wave_number,
+                "offer_expires_in": self.wave_timeout_seconds
+            }
+            results = await asyncio.gather(
+                *(manager.send_personal_message(offer, driver_id) for driver_id in wave),
+                return_exceptions=True
+            )
+            for driver_id, result in zip(wave, results):
+                if isinstance(result, Exception):
+                    logger.warning("Failed to offer ride %s to driver %s: %s", ride_id, driver_id, result)
+            logger.debug("Ride %s wave %s offered to %s", ride_id, wave_number, wave)
+
+            if wave_number < len(waves):
+                await asyncio.sleep(self.wave_timeout_seconds)
+
+        logger.debug("Ride %s: all waves sent", ride_id)
+
+
+dispatch_engine = DispatchEngine(
+    wave_size=settings.dispatch_wave_size,
+    wave_timeout_seconds=settings.dispatch_wave_timeout_seconds,
+    max_waves=settings.dispatch_max_waves
+)
@@ -0,0 +1,269 @@
+"""
+Live in-memory indexes of available drivers used by ride matching.
+
+- DriverSpatialIndex buckets drivers into a fixed lat/lng grid so radius
+  queries only touch the cells around the pickup point.
+- DriverCityIndex maps normalized city tokens to drivers so pickup
+  addresses are matched with set lookups instead of re-tokenizing every
+  driver's city.
+
+Both are fed from the profile / location / availability endpoints and
+rebuilt from the database periodically so other workers' updates are
+picked up.
+"""
+
+import math
+import re
+import threading
+import time
+import numpy as np
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import and_
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import User, DriverProfile, UserRole
+from app.utils import calculate_distances
+
+KM_PER_DEGREE_LAT = 111.32
+
+Cell = Tuple[int, int]
+
+
+@lru_cache(maxsize=4096)
+def tokenize_location(text: str) -> FrozenSet[str]:
+    """Lowercased significant tokens of an address / city string"""
+    if not text:
+        return frozenset()
+    return frozenset(w.lower() for w in re.split(r'[\s,-]+', str(text)) if len(w) > 2)
+
+
+class DriverSpatialIndex:
+    """Grid-bucketed positions of available, active drivers"""
+
+    def __init__(self, cell_size_deg: float = 0.1, refresh_seconds: int = 30):
+        self.cell_size_deg = cell_size_deg
+        self.refresh_seconds = refresh_seconds
+        self._cells: Dict[Cell, Set[int]] = {}
+        self._positions: Dict[int, Tuple[float, float, Cell]] = {}
+        self._lock = threading.Lock()
+        self._loaded_at: Optional[float] = None
+
+    def _cell_for(self, lat: float, lng: float) -> Cell:
+        return (
+            int(math.floor(lat / self.cell_size_deg)),
+            int(math.floor(lng / self.cell_size_deg))
+        )
+
+    def _remove_locked(self, driver_id: int):
+        previous = self._positions.pop(driver_id, None)
+        if previous:
+            bucket = self._cells.get(previous[2])
+            if bucket is not None:
+                bucket.discard(driver_id)
+                if not bucket:
+                    del self._cells[previous[2]]
+
+    def update(self, driver_id: int, lat: float, lng: float):
+        """Insert or move a driver"""
+        lat, lng = float(lat), float(lng)
+        cell = self._cell_for(lat, lng)
+        with self._lock:
+            self._remove_locked(driver_id)
+            self._positions[driver_id] = (lat, lng, cell)
+            self._cells.setdefault(cell, set()).add(driver_id)
+
+    def remove(self, driver_id: int):
+        """Drop a driver that went offline, got deactivated or was deleted"""
+        with self._lock:
+            self._remove_locked(driver_id)
+
+    def sync_profile(self, profile: DriverProfile, is_active: bool = True):
+        """Mirror a driver profile's current availability and position"""
+        if (
+            is_active
+            and profile.is_available
+            and profile.current_lat is not None
+            and profile.current_lng is not None
+        ):
+            self.update(profile.user_id, profile.current_lat, profile.current_lng)
+        else:
+            self.remove(profile.user_id)
+
+    def rebuild(self, db: Session):
+        """Reload every available driver position from the database"""
+        rows = db.query(
+            DriverProfile.user_id, DriverProfile.current_lat, DriverProfile.current_lng
+        ).join(User, User.id == DriverProfile.user_id).filter(
+            and_(
+                User.role == UserRole.DRIVER,
+                User.is_active == True,
+                DriverProfile.is_available == True,
+                DriverProfile.current_lat != None,
+                DriverProfile.current_lng != None
+            )
+        ).all()
+
+        cells: Dict[Cell, Set[int]] = {}
+        positions: Dict[int, Tuple[float, float, Cell]] = {}
+        for user_id, lat, lng in rows:
+            try:
+                lat, lng = float(lat), float(lng)
+            except (ValueError, TypeError):
+                continue
+            cell = self._cell_for(lat, lng)
+            positions[user_id] = (lat, lng, cell)
+            cells.setdefault(cell, set()).add(user_id)
+
+        with self._lock:
+            self._cells = cells
+            self._positions = positions
+            self._loaded_at = time.monotonic()
+
+    def ensure_fresh(self, db: Session):
+        """Rebuild on first use and whenever the snapshot is older than refresh_seconds"""
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at > self.refresh_seconds:
+            self.rebuild(db)
+
+    def query_radius(self, lat: float, lng: float, radius_km: float) -> List[Tuple[int, float]]:
+        """Return (driver_id, distance_km) pairs within radius_km, nearest first"""
+        lat, lng = float(lat), float(lng)
+        lat_span = radius_km / KM_PER_DEGREE_LAT
+        cos_lat = max(math.cos(math.radians(lat)), 0.01)
+        lng_span = min(radius_km / (KM_PER_DEGREE_LAT * cos_lat), 180.0)
+
+        min_row, min_col = self._cell_for(lat - lat_span, lng - lng_span)
+        max_row, max_col = self._cell_for(lat + lat_span, lng + lng_span)
+
+        driver_ids: List[int] = []
+        lats: List[float] = []
+        lngs: List[float] = []
+        with self._lock:
+            for row in range(min_row, max_row + 1):
+                for col in range(min_col, max_col + 1):
+                    for driver_id in self._cells.get((row, col), ()):
+                        driver_lat, driver_lng, _ = self._positions[driver_id]
+                        driver_ids.append(driver_id)
+                        lats.append(driver_lat)
+                        lngs.append(driver_lng)
+
+        if not driver_ids:
+            return []
+
+        distances = calculate_distances(lat, lng, lats, lngs)
+        within = np.flatnonzero(distances <= radius_km)
+        ordered = within[np.argsort(distances[within], kind="stable")]
+        return [(driver_ids[i], float(distances[i])) for i in ordered]
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+
+class DriverCityIndex:
+    """Inverted index from city token to available, active drivers"""
+
+    def __init__(self, refresh_seconds: int = 30):
+        self.refresh_seconds = refresh_seconds
+        self._drivers_by_token: Dict[str, Set[int]] = {}
+        self._tokens_by_driver: Dict[int, FrozenSet[str]] = {}
+        self._lock = threading.Lock()
+        self._loaded_at: Optional[float] = None
+
+    def _remove_locked(self, driver_id: int):
+        for token in self._tokens_by_driver.pop(driver_id, ()):
+            bucket = self._drivers_by_token.get(token)
+            if bucket is not None:
+                bucket.discard(driver_id)
+                if not bucket:
+                    del self._drivers_by_token[token]
+
+    def update(self, driver_id: int, city: str):
+        """Insert a driver or re-point them to a new city"""
+        tokens = tokenize_location(city)
+        with self._lock:
+            self._remove_locked(driver_id)
+            if tokens:
+                self._tokens_by_driver[driver_id] = tokens
+                for token in tokens:
+                    self._drivers_by_token.setdefault(token, set()).add(driver_id)
+
+    def remove(self, driver_id: int):
+        """Drop a driver that went offline, got deactivated or was deleted"""
+        with self._lock:
+            self._remove_locked(driver_id)
+
+    def sync_profile(self, profile: DriverProfile, is_active: bool = True):
+        """Mirror a driver profile's current availability and city"""
+        if is_active and profile.is_available and profile.city:
+            self.update(profile.user_id, profile.city)
+        else:
+            self.remove(profile.user_id)
+
+    def rebuild(self, db: Session):
+        """Reload every available driver city from the database"""
+        rows = db.query(DriverProfile.user_id, DriverProfile.city).join(
+            User, User.id == DriverProfile.user_id
+        ).filter(
+            and_(
+                User.role == UserRole.DRIVER,
+                User.is_active == True,
+                DriverProfile.is_available == True,
+                DriverProfile.city != None
+            )
+        ).all()
+
+        drivers_by_token: Dict[str, Set[int]] = {}
+        tokens_by_driver: Dict[int, FrozenSet[str]] = {}
+        for user_id, city in rows:
+            tokens = tokenize_location(city)
+            if not tokens:
+                continue
+            tokens_by_driver[user_id] = tokens
+            for token in tokens:
+                drivers_by_token.setdefault(token, set()).add(user_id)
+
+        with self._lock:
+            self._drivers_by_token = drivers_by_token
+            self._tokens_by_driver = tokens_by_driver
+            self._loaded_at = time.monotonic()
+
+    def ensure_fresh(self, db: Session):
+        """Rebuild on first use and whenever the snapshot is older than refresh_seconds"""
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at > self.refresh_seconds:
+            self.rebuild(db)
+
+    def lookup(self, tokens: Iterable[str]) -> Set[int]:
+        """Drivers whose city shares at least one token with the given set"""
+        with self._lock:
+            matched: Set[int] = set()
+            for token in tokens:
+                matched.update(self._drivers_by_token.get(token, ()))
+            return matched
+
+    def match_address(self, address: str) -> Set[int]:
+        """Drivers whose city loosely matches an address"""
+        return self.lookup(tokenize_location(address))
+
+    def city_tokens(self, driver_id: int, city: Optional[str] = None) -> FrozenSet[str]:
+        """Normalized tokens of a driver's city, falling back to tokenizing it directly"""
+        tokens = self._tokens_by_driver.get(driver_id)
+        if tokens is not None:
+            return tokens
+        return tokenize_location(city or "")
+
+    def __len__(self) -> int:
+        return len(self._tokens_by_driver)
+
+
+driver_spatial_index = DriverSpatialIndex(
+    cell_size_deg=settings.driver_index_cell_deg,
+    refresh_seconds=settings.driver_index_refresh_seconds
+)
+
+driver_city_index = DriverCityIndex(
+    refresh_seconds=settings.driver_index_refresh_seconds
+)
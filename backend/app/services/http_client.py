@@ -0,0 +1,38 @@
+"""
+Shared async HTTP client for outbound calls (weather, geocoding, OSM).
+
+One pooled httpx.AsyncClient per worker keeps connections (and TLS
+sessions) to the upstream APIs alive between requests instead of opening
+a new one per call, and never blocks the event loop. Created lazily on
+first use and closed from the app lifespan.
+"""
+
+from typing import Optional
+
+import httpx
+
+from app.config import settings
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.http_timeout_seconds),
+            limits=httpx.Limits(
+                max_connections=settings.http_max_connections,
+                max_keepalive_connections=settings.http_max_connections
+            ),
+            headers={"User-Agent": "voyago-backend"},
+            follow_redirects=True
+        )
+    return _client
+
+
+async def close_http_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,128 @@
+"""
+Wallet ledger for ride payments.
+
+Balance changes are applied as in-database increments
+(wallet_balance = wallet_balance + :amount) instead of read-modify-write on
+ORM objects, and the platform (admin) account id is cached so completing a
+ride does not look the admin user up every time. Many completions can be
+settled together with one UPDATE per affected wallet.
+"""
+
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.auth import invalidate_principal_on_commit
+from app.models import User, UserRole, Ride, Transaction
+from app.log import get_logger
+
+logger = get_logger(__name__)
+
+# (user_id, amount, description)
+Posting = Tuple[int, float, str]
+
+
+class LedgerService:
+    """Posts ride settlements to user wallets and the transactions table"""
+
+    def __init__(self, driver_share: float = 0.80):
+        self.driver_share = driver_share
+        self._platform_account_id: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def platform_account_id(self, db: Session) -> Optional[int]:
+        """Id of the admin user that collects platform fees (cached)"""
+        account_id = self._platform_account_id
+        if account_id is None:
+            row = db.query(User.id).filter(User.role == UserRole.ADMIN).order_by(User.id).first()
+            if row:
+                with self._lock:
+                    self._platform_account_id = account_id = row[0]
+        return account_id
+
+    def invalidate_platform_account(self):
+        with self._lock:
+            self._platform_account_id = None
+
+    def ride_postings(self, db: Session, ride: Ride, rider_name: Optional[str] = None) -> List[Posting]:
+        """80/20 split of a completed ride between its driver and the platform"""
+        total_fare = float(ride.final_fare or ride.estimated_fare or 0)
+        driver_cut = total_fare * self.driver_share
+        platform_cut = total_fare - driver_cut
+
+        if rider_name is None:
+            rider_name = ride.rider.name if ride.rider else "Rider"
+
+        postings: List[Posting] = [
+            (ride.driver_id, driver_cut, f"Payment from {rider_name}")
+        ]
+
+        platform_id = self.platform_account_id(db)
+        if platform_id is not None:
+            postings.append((
+                platform_id,
+                platform_cut,
+                f"Platform Fee for ride #{ride.id} ({round((1 - self.driver_share) * 100)}% of ₹{total_fare})"
+            ))
+        else:
+            logger.warning("No Admin user found to credit platform fee of %s", platform_cut)
+
+        return postings
+
+    def post(self, db: Session, postings: Iterable[Posting]) -> Dict[int, float]:
+        """
+        Apply postings in the caller's transaction (caller commits).
+        Credits to the same wallet are summed into a single increment.
+        """
+        postings = list(postings)
+        totals: Dict[int, float] = defaultdict(float)
+        for user_id, amount, _ in postings:
+            totals[user_id] += amount
+
+        for user_id, amount in totals.items():
+            updated = db.query(User).filter(User.id == user_id).update(
+                {User.wallet_balance: func.coalesce(User.wallet_balance, 0) + amount},
+                synchronize_session=False
+            )
+            if not updated and user_id == self._platform_account_id:
+                # Cached platform account disappeared; look it up again next time
+                self.invalidate_platform_account()
+            # Bulk UPDATE bypasses the ORM flush hooks, so queue the cached principal explicitly
+            invalidate_principal_on_commit(db, user_id)
+
+        db.add_all([
+            Transaction(user_id=user_id, amount=amount, type="credit", description=description)
+            for user_id, amount, description in postings
+        ])
+        return dict(totals)
+
+    def settle_ride(self, db: Session, ride: Ride) -> Dict[int, float]:
+        """Credit driver and platform for one completed ride (caller commits)"""
+        return self.post(db, self.ride_postings(db, ride))
+
+    def settle_rides(self, db: Session, rides: List[Ride]) -> Dict[int, float]:
+        """Settle many completed rides in one transaction and commit it"""
+        rider_ids = {ride.rider_id for ride in rides}
+        rider_names = dict(
+            db.query(User.id, User.name).filter(User.id.in_(rider_ids)).all()
+        ) if rider_ids else {}
+
+        postings: List[Posting] = []
+        for ride in rides:
+            if ride.driver_id is None:
+                continue
+            postings.extend(self.ride_postings(db, ride, rider_names.get(ride.rider_id, "Rider")))
+
+        try:
+            totals = self.post(db, postings)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return totals
+
+
+ledger_service = LedgerService()
@@ -0,0 +1,73 @@
+"""
+Password hashing off the event loop.
+
+bcrypt is deliberately slow, so hashing/verifying inside an async handler
+stalls every other request and WebSocket on the worker. The async methods
+here run passlib in a small dedicated thread pool (bcrypt releases the GIL)
+so only the caller waits. The cost factor comes from settings; hashes made
+with a different cost are transparently re-hashed on the next login.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+from app.config import settings
+
+
+def build_context(rounds: int) -> CryptContext:
+    # Pinning min/max to the configured cost makes passlib flag other costs for update
+    options = dict(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds
+    )
+    try:
+        return CryptContext(**options)
+    except AttributeError:
+        # Fallback if there's an issue with bcrypt version detection
+        return CryptContext(bcrypt__backends=["bcrypt"], **options)
+
+
+class PasswordService:
+    """bcrypt hashing with sync helpers for scripts and async ones for request handlers"""
+
+    def __init__(self, rounds: int = 12, max_workers: int = 4):
+        self.context = build_context(rounds)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="bcrypt")
+
+    def hash_sync(self, password: str) -> str:
+        return self.context.hash(password)
+
+    def verify_sync(self, password: str, hashed_password: str) -> bool:
+        return self.context.verify(password, hashed_password)
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(self.context.verify, password, hashed_password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """(matches, new_hash); new_hash is set when the stored hash uses an outdated cost"""
+        try:
+            return await self._run(self.context.verify_and_update, password, hashed_password)
+        except ValueError:
+            # Unrecognized / malformed stored hash
+            return False, None
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+password_service = PasswordService(
+    rounds=settings.bcrypt_rounds,
+    max_workers=settings.password_hash_workers
+)
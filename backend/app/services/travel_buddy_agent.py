@@ -7,12 +7,21 @@ Coordinates multiple research tools to discover:
 4. Generates a pristine, publication-grade Markdown travel document.
 """
 
+import asyncio
 import json
+import math
 import os
 import random
-import requests
 from datetime import datetime, timedelta
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, AsyncIterator, Awaitable, Callable, List, Optional
+
+from app.config import settings
+from app.log import get_logger
+from app.services import weather
+from app.services.curated_content import curated_store
+from app.services.ttl_cache import create_cache
+
+logger = get_logger(__name__)
 
 # Attempt LangChain imports
 try:
@@ -51,88 +60,68 @@ WMO_WEATHER_CODES = {
     99: ("Thunderstorm with Heavy Hail", "⛈️"),
 }
 
-def get_weather_forecast(city: str) -> Dict[str, Any]:
-    """
-    Fetches real-time multi-day weather forecast and packing recommendations
-    for any city worldwide using Open-Meteo APIs.
-    """
-    try:
-        # Step 1: Geocode city name to lat/lon
-        geo_url = f"https://geocoding-api.open-meteo.com/v1/search?name={city}&count=1&language=en&format=json"
-        geo_res = requests.get(geo_url, timeout=5)
-        
-        if geo_res.status_code == 200 and geo_res.json().get("results"):
-            location_data = geo_res.json()["results"][0]
-            lat = location_data["latitude"]
-            lon = location_data["longitude"]
-            resolved_city = location_data.get("name", city)
-            country = location_data.get("country", "")
-            
-            # Step 2: Fetch 7-day daily forecast
-            forecast_url = (
-                f"https://api.open-meteo.com/v1/forecast?"
-                f"latitude={lat}&longitude={lon}&daily=weathercode,temperature_2m_max,temperature_2m_min,precipitation_probability_max,windspeed_10m_max&timezone=auto"
-            )
-            forecast_res = requests.get(forecast_url, timeout=5)
+FALLBACK_WEATHER_SOURCE = "Fallback Atmospheric Simulation"
+
+def build_weather_report(city: str, location_data: Dict[str, Any], daily: Dict[str, Any]) -> Dict[str, Any]:
+    """Forecast summary and packing tips from an Open-Meteo `daily` block"""
+    resolved_city = location_data.get("name") or city
+    country = location_data.get("country", "")
+    
+    dates = daily.get("time", [])
+    max_temps = daily.get("temperature_2m_max", [])
+    min_temps = daily.get("temperature_2m_min", [])
+    weathercodes = daily.get("weathercode", [])
+    precips = daily.get("precipitation_probability_max", [])
+    
+    forecast_days = []
+    avg_max = sum(max_temps[:5]) / max(len(max_temps[:5]), 1)
+    has_rain = False
+    
+    for i in range(min(5, len(dates))):
+        date_obj = datetime.strptime(dates[i], "%Y-%m-%d")
+        day_name = date_obj.strftime("%A, %b %d")
+        code = weathercodes[i] if i < len(weathercodes) else 0
+        condition, emoji = WMO_WEATHER_CODES.get(code, ("Pleasant", "🌤️"))
+        precip = precips[i] if i < len(precips) else 0
+        if precip and precip > 30:
+            has_rain = True
             
-            if forecast_res.status_code == 200:
-                f_data = forecast_res.json()
-                daily = f_data.get("daily", {})
-                dates = daily.get("time", [])
-                max_temps = daily.get("temperature_2m_max", [])
-                min_temps = daily.get("temperature_2m_min", [])
-                weathercodes = daily.get("weathercode", [])
-                precips = daily.get("precipitation_probability_max", [])
-                
-                forecast_days = []
-                avg_max = sum(max_temps[:5]) / max(len(max_temps[:5]), 1)
-                has_rain = False
-                
-                for i in range(min(5, len(dates))):
-                    date_obj = datetime.strptime(dates[i], "%Y-%m-%d")
-                    day_name = date_obj.strftime("%A, %b %d")
-                    code = weathercodes[i] if i < len(weathercodes) else 0
-                    condition, emoji = WMO_WEATHER_CODES.get(code, ("Pleasant", "🌤️"))
-                    precip = precips[i] if i < len(precips) else 0
-                    if precip and precip > 30:
-                        has_rain = True
-                        
-                    forecast_days.append({
-                        "date": day_name,
-                        "condition": condition,
-                        "emoji": emoji,
-                        "temp_max": round(max_temps[i]) if i < len(max_temps) else 28,
-                        "temp_min": round(min_temps[i]) if i < len(min_temps) else 20,
-                        "precip_chance": precip
-                    })
-                
-                # Dynamic Packing Tips based on real conditions
-                packing_tips = []
-                if avg_max > 30:
-                    packing_tips.extend(["Breathable linen/cotton wear", "High SPF Sunscreen & UV sunglasses", "Refillable hydration bottle"])
-                elif avg_max < 15:
-                    packing_tips.extend(["Warm fleece or jacket", "Thermal innerwear", "Cozy wool socks & beanie"])
-                else:
-                    packing_tips.extend(["Comfortable walking shoes", "Light layer cardigan or hoodie", "Casual daywear"])
-                    
-                if has_rain:
-                    packing_tips.append("Compact travel umbrella or waterproof jacket")
-                else:
-                    packing_tips.append("Sun hat or cap for daytime excursions")
-
-                return {
-                    "city": resolved_city,
-                    "country": country,
-                    "avg_temp": f"{round(avg_max)}°C",
-                    "forecast_summary": f"Expect mostly {forecast_days[0]['condition'].lower()} conditions with daytime highs around {round(avg_max)}°C.",
-                    "daily_forecast": forecast_days,
-                    "packing_tips": packing_tips,
-                    "source": "Open-Meteo Live API"
-                }
-    except Exception as e:
-        print(f"[Weather Tool] Error fetching live weather: {e}")
+        forecast_days.append({
+            "date": day_name,
+            "condition": condition,
+            "emoji": emoji,
+            "temp_max": round(max_temps[i]) if i < len(max_temps) else 28,
+            "temp_min": round(min_temps[i]) if i < len(min_temps) else 20,
+            "precip_chance": precip
+        })
+    
+    # Dynamic Packing Tips based on real conditions
+    packing_tips = []
+    if avg_max > 30:
+        packing_tips.extend(["Breathable linen/cotton wear", "High SPF Sunscreen & UV sunglasses", "Refillable hydration bottle"])
+    elif avg_max < 15:
+        packing_tips.extend(["Warm fleece or jacket", "Thermal innerwear", "Cozy wool socks & beanie"])
+    else:
+        packing_tips.extend(["Comfortable walking shoes", "Light layer cardigan or hoodie", "Casual daywear"])
+        
+    if has_rain:
+        packing_tips.append("Compact travel umbrella or waterproof jacket")
+    else:
+        packing_tips.append("Sun hat or cap for daytime excursions")
+
+    return {
+        "city": resolved_city,
+        "country": country,
+        "avg_temp": f"{round(avg_max)}°C",
+        "forecast_summary": f"Expect mostly {forecast_days[0]['condition'].lower()} conditions with daytime highs around {round(avg_max)}°C.",
+        "daily_forecast": forecast_days,
+        "packing_tips": packing_tips,
+        "source": "Open-Meteo Live API"
+    }
+
 
-    # Fallback realistic weather data
+def fallback_weather(city: str) -> Dict[str, Any]:
+    """Fallback realistic weather data when the live forecast is unavailable"""
     base_date = datetime.now()
     return {
         "city": city.title(),
@@ -144,389 +133,45 @@ def get_weather_forecast(city: str) -> Dict[str, Any]:
             for i in range(5)
         ],
         "packing_tips": ["Comfortable cotton clothing", "Sunglasses & sunscreen", "Casual sneakers", "Light evening layer"],
-        "source": "Fallback Atmospheric Simulation"
+        "source": FALLBACK_WEATHER_SOURCE
     }
 
 
+async def aget_weather_forecast(city: str) -> Dict[str, Any]:
+    """
+    Fetches real-time multi-day weather forecast and packing recommendations
+    for any city worldwide using Open-Meteo APIs (cached, single-flight).
+    """
+    try:
+        location_data = await weather.geocode(city)
+        if location_data:
+            daily = await weather.daily_forecast(location_data["latitude"], location_data["longitude"])
+            if daily:
+                return build_weather_report(city, location_data, daily)
+    except Exception as e:
+        logger.warning("Weather tool: error fetching live weather: %s", e)
+
+    return fallback_weather(city)
+
+
 # ==============================================================================
 # TOOL 2: Top 3 Affordable Restaurants Finder
 # ==============================================================================
 
-CURATED_RESTAURANTS_DB = {
-    "chikmagalur": [
-        {
-            "name": "Town Canteen (Since 1966)",
-            "cuisine": "World-Famous Malnad Benne Dosa & Filter Kaapi",
-            "location": "RG Road / MG Road, Chikmagalur Town",
-            "price_for_two": "₹180 - ₹350",
-            "cost_level": "$",
-            "signature_dishes": "Crispy Butter Masala Dosa, Hot Gulab Jamun, Pure Filter Coffee",
-            "rating": "4.7/5 (6.8k reviews)",
-            "budget_vibe": "Chikmagalur's legendary breakfast institution, famous across Karnataka for melt-in-mouth butter dosas."
-        },
-        {
-            "name": "Siri Coffee & Plantation Rest Stop",
-            "cuisine": "Malnad Snacks, Akki Roti & Fresh Estate Brews",
-            "location": "KM Road, Near Allampura (Giant Stone Statue)",
-            "price_for_two": "₹250 - ₹450",
-            "cost_level": "$",
-            "signature_dishes": "Malnad Akki Roti with Coconut Chutney, Crispy Mirchi Bajji, Robusta Filter Coffee",
-            "rating": "4.5/5 (5.1k reviews)",
-            "budget_vibe": "Surrounded by sprawling coffee plantations, perfect scenic stop for fresh brews and local snacks."
-        },
-        {
-            "name": "The Planters Court / Vishnu Delicacy",
-            "cuisine": "Traditional Malnad Vegetarian Thali & Neer Dosa",
-            "location": "Indira Gandhi Road / Post Office Road",
-            "price_for_two": "₹350 - ₹600",
-            "cost_level": "$$",
-            "signature_dishes": "Unlimited Malnad Veg Thali, Soft Neer Dosa with Veg Sagu, Kesari Bath",
-            "rating": "4.4/5 (3.2k reviews)",
-            "budget_vibe": "Wholesome, hygienic traditional thalis that recharge you after mountain trekking."
-        }
-    ],
-    "chikkamagaluru": [
-        {
-            "name": "Town Canteen (Since 1966)",
-            "cuisine": "World-Famous Malnad Benne Dosa & Filter Kaapi",
-            "location": "RG Road / MG Road, Chikmagalur Town",
-            "price_for_two": "₹180 - ₹350",
-            "cost_level": "$",
-            "signature_dishes": "Crispy Butter Masala Dosa, Hot Gulab Jamun, Pure Filter Coffee",
-            "rating": "4.7/5 (6.8k reviews)",
-            "budget_vibe": "Chikmagalur's legendary breakfast institution, famous across Karnataka for melt-in-mouth butter dosas."
-        },
-        {
-            "name": "Siri Coffee & Plantation Rest Stop",
-            "cuisine": "Malnad Snacks, Akki Roti & Fresh Estate Brews",
-            "location": "KM Road, Near Allampura (Giant Stone Statue)",
-            "price_for_two": "₹250 - ₹450",
-            "cost_level": "$",
-            "signature_dishes": "Malnad Akki Roti with Coconut Chutney, Crispy Mirchi Bajji, Robusta Filter Coffee",
-            "rating": "4.5/5 (5.1k reviews)",
-            "budget_vibe": "Surrounded by sprawling coffee plantations, perfect scenic stop for fresh brews and local snacks."
-        },
-        {
-            "name": "The Planters Court / Vishnu Delicacy",
-            "cuisine": "Traditional Malnad Vegetarian Thali & Neer Dosa",
-            "location": "Indira Gandhi Road / Post Office Road",
-            "price_for_two": "₹350 - ₹600",
-            "cost_level": "$$",
-            "signature_dishes": "Unlimited Malnad Veg Thali, Soft Neer Dosa with Veg Sagu, Kesari Bath",
-            "rating": "4.4/5 (3.2k reviews)",
-            "budget_vibe": "Wholesome, hygienic traditional thalis that recharge you after mountain trekking."
-        }
-    ],
-    "chickmagalur": [
-        {
-            "name": "Town Canteen (Since 1966)",
-            "cuisine": "World-Famous Malnad Benne Dosa & Filter Kaapi",
-            "location": "RG Road / MG Road, Chikmagalur Town",
-            "price_for_two": "₹180 - ₹350",
-            "cost_level": "$",
-            "signature_dishes": "Crispy Butter Masala Dosa, Hot Gulab Jamun, Pure Filter Coffee",
-            "rating": "4.7/5 (6.8k reviews)",
-            "budget_vibe": "Chikmagalur's legendary breakfast institution, famous across Karnataka for melt-in-mouth butter dosas."
-        },
-        {
-            "name": "Siri Coffee & Plantation Rest Stop",
-            "cuisine": "Malnad Snacks, Akki Roti & Fresh Estate Brews",
-            "location": "KM Road, Near Allampura (Giant Stone Statue)",
-            "price_for_two": "₹250 - ₹450",
-            "cost_level": "$",
-            "signature_dishes": "Malnad Akki Roti with Coconut Chutney, Crispy Mirchi Bajji, Robusta Filter Coffee",
-            "rating": "4.5/5 (5.1k reviews)",
-            "budget_vibe": "Surrounded by sprawling coffee plantations, perfect scenic stop for fresh brews and local snacks."
-        },
-        {
-            "name": "The Planters Court / Vishnu Delicacy",
-            "cuisine": "Traditional Malnad Vegetarian Thali & Neer Dosa",
-            "location": "Indira Gandhi Road / Post Office Road",
-            "price_for_two": "₹350 - ₹600",
-            "cost_level": "$$",
-            "signature_dishes": "Unlimited Malnad Veg Thali, Soft Neer Dosa with Veg Sagu, Kesari Bath",
-            "rating": "4.4/5 (3.2k reviews)",
-            "budget_vibe": "Wholesome, hygienic traditional thalis that recharge you after mountain trekking."
-        }
-    ],
-    "coorg": [
-        {
-            "name": "Taste of Coorg",
-            "cuisine": "Authentic Kodava Pork, Kadambuttu & Akki Roti",
-            "location": "Stuart Hill, Madikeri",
-            "price_for_two": "₹450 - ₹750",
-            "cost_level": "$$",
-            "signature_dishes": "Authentic Pandi Curry, Kadambuttu (Rice Dumplings), Bamboo Shoot Curry",
-            "rating": "4.6/5 (4.2k reviews)",
-            "budget_vibe": "The gold standard for homemade Kodava recipes at humble family prices."
-        },
-        {
-            "name": "Raintree Restaurant",
-            "cuisine": "Coastal & Traditional Kodava Dining",
-            "location": "Pension Lane, Madikeri",
-            "price_for_two": "₹600 - ₹950",
-            "cost_level": "$$",
-            "signature_dishes": "Coorg Pepper Chicken, Noolputtu with Koli Curry, Filter Kaapi",
-            "rating": "4.5/5 (3.8k reviews)",
-            "budget_vibe": "Heritage bungalow dining setting surrounded by misty hills."
-        },
-        {
-            "name": "Coorg Cuisine",
-            "cuisine": "Kodava Homestyle Meals",
-            "location": "Opposite Post Office, Madikeri",
-            "price_for_two": "₹350 - ₹600",
-            "cost_level": "$",
-            "signature_dishes": "Paputtu, Pandi Fry, Mango Curry with Akki Roti",
-            "rating": "4.4/5 (2.9k reviews)",
-            "budget_vibe": "Authentic local favorites without any tourist markups."
-        }
-    ],
-    "ladakh": [
-        {
-            "name": "The Tibetan Kitchen",
-            "cuisine": "Himalayan, Tibetan & Ladakhi Delicacies",
-            "location": "Fort Road, Leh",
-            "price_for_two": "₹500 - ₹850",
-            "cost_level": "$$",
-            "signature_dishes": "Steamed Mok-Mok (Momos), Gyathuk Noodle Soup, Tingmo Bread with Shapta",
-            "rating": "4.6/5 (5.4k reviews)",
-            "budget_vibe": "Cozy apricot-shaded courtyard, essential high-altitude comfort food."
-        },
-        {
-            "name": "Gesmo Restaurant (Since 1989)",
-            "cuisine": "Tibetan Bakery, Yak Cheese Pizza & Breakfast",
-            "location": "Old Fort Road, Leh",
-            "price_for_two": "₹350 - ₹600",
-            "cost_level": "$",
-            "signature_dishes": "Fresh Cinnamon Rolls, Yak Cheese Pizza, Hot Seabuckthorn Tea",
-            "rating": "4.5/5 (4.1k reviews)",
-            "budget_vibe": "Beloved backpacker landmark known for generous portions and warm fireplace ambiance."
-        },
-        {
-            "name": "Bon Appetit",
-            "cuisine": "Ladakhi Fusion & Mountain Views",
-            "location": "Changspa Lane, Leh",
-            "price_for_two": "₹600 - ₹950",
-            "cost_level": "$$",
-            "signature_dishes": "Ladakhi Khambir Bread, Roasted Trout, Apricot Crumble",
-            "rating": "4.6/5 (3.1k reviews)",
-            "budget_vibe": "Stunning minimalist stone architecture with panoramic views of the Stok Kangri peaks."
-        }
-    ],
-    "leh": [
-        {
-            "name": "The Tibetan Kitchen",
-            "cuisine": "Himalayan, Tibetan & Ladakhi Delicacies",
-            "location": "Fort Road, Leh",
-            "price_for_two": "₹500 - ₹850",
-            "cost_level": "$$",
-            "signature_dishes": "Steamed Mok-Mok (Momos), Gyathuk Noodle Soup, Tingmo Bread with Shapta",
-            "rating": "4.6/5 (5.4k reviews)",
-            "budget_vibe": "Cozy apricot-shaded courtyard, essential high-altitude comfort food."
-        },
-        {
-            "name": "Gesmo Restaurant (Since 1989)",
-            "cuisine": "Tibetan Bakery, Yak Cheese Pizza & Breakfast",
-            "location": "Old Fort Road, Leh",
-            "price_for_two": "₹350 - ₹600",
-            "cost_level": "$",
-            "signature_dishes": "Fresh Cinnamon Rolls, Yak Cheese Pizza, Hot Seabuckthorn Tea",
-            "rating": "4.5/5 (4.1k reviews)",
-            "budget_vibe": "Beloved backpacker landmark known for generous portions and warm fireplace ambiance."
-        },
-        {
-            "name": "Bon Appetit",
-            "cuisine": "Ladakhi Fusion & Mountain Views",
-            "location": "Changspa Lane, Leh",
-            "price_for_two": "₹600 - ₹950",
-            "cost_level": "$$",
-            "signature_dishes": "Ladakhi Khambir Bread, Roasted Trout, Apricot Crumble",
-            "rating": "4.6/5 (3.1k reviews)",
-            "budget_vibe": "Stunning minimalist stone architecture with panoramic views of the Stok Kangri peaks."
-        }
-    ],
-    "gokarna": [
-        {
-            "name": "Namaste Cafe",
-            "cuisine": "Coastal Seafood & Continental Bowls",
-            "location": "Om Beach (Waterfront)",
-            "price_for_two": "₹450 - ₹800",
-            "cost_level": "$$",
-            "signature_dishes": "Kingfish Rava Fry, Nutella Banana Pancake, Iced Lemon Tea",
-            "rating": "4.5/5 (7.8k reviews)",
-            "budget_vibe": "Iconic beachside perch directly overlooking the waves of Om Beach."
-        },
-        {
-            "name": "Chez Christophe",
-            "cuisine": "French Bakery & Garden Eats",
-            "location": "Kudle Beach Road",
-            "price_for_two": "₹400 - ₹700",
-            "cost_level": "$",
-            "signature_dishes": "Handmade Sourdough, Shakshuka, Fresh Passion Fruit Juice",
-            "rating": "4.6/5 (2.4k reviews)",
-            "budget_vibe": "Laid-back bohemian garden setting with live acoustic music."
-        },
-        {
-            "name": "Mantra Cafe",
-            "cuisine": "North Indian & Wood-fired Pizzas",
-            "location": "Zostel Cliff, Kudle Beach",
-            "price_for_two": "₹500 - ₹850",
-            "cost_level": "$$",
-            "signature_dishes": "Thin Crust Pizza, Butter Chicken, Cold Coffee",
-            "rating": "4.5/5 (3.9k reviews)",
-            "budget_vibe": "Cliff-edge sunset vista with 180-degree Arabian Sea panorama."
-        }
-    ],
-    "hampi": [
-        {
-            "name": "Mango Tree Restaurant",
-            "cuisine": "Thalis, Israeli Platters & Fresh Shakes",
-            "location": "Janana Enclosure Road, Kamalapur",
-            "price_for_two": "₹350 - ₹600",
-            "cost_level": "$",
-            "signature_dishes": "Unlimited South Indian Thali on Banana Leaf, Falafel Bowl, Mango Lassi",
-            "rating": "4.6/5 (8.2k reviews)",
-            "budget_vibe": "Legendary traveler haven with floor seating under banana trees."
-        },
-        {
-            "name": "Laughing Buddha Cafe",
-            "cuisine": "Continental, Woodfired Pizzas & Smoothies",
-            "location": "Hippy Island / Sanapur",
-            "price_for_two": "₹400 - ₹700",
-            "cost_level": "$",
-            "signature_dishes": "Wood-fired Pizza, Hummus Platter, Nutella Milkshake",
-            "rating": "4.4/5 (4.1k reviews)",
-            "budget_vibe": "Bouldering & river sunset vistas with mattress floor seating."
-        },
-        {
-            "name": "Gopi Guesthouse Rooftop",
-            "cuisine": "South & North Indian Favorites",
-            "location": "Near Virupaksha Temple",
-            "price_for_two": "₹300 - ₹550",
-            "cost_level": "$",
-            "signature_dishes": "Crispy Dosa, Paneer Butter Masala, Ginger Lemon Tea",
-            "rating": "4.4/5 (2.1k reviews)",
-            "budget_vibe": "Sit directly facing the ancient monolithic gopuram of Virupaksha Temple."
-        }
-    ],
-    "goa": [
-        {
-            "name": "Vinayak Family Restaurant",
-            "cuisine": "Authentic Goan Seafood & Thalis",
-            "location": "Assagao, North Goa",
-            "price_for_two": "₹450 - ₹700",
-            "cost_level": "$",
-            "signature_dishes": "Fish Curry Thali, Rava Fried Prawns, Sol Kadhi",
-            "rating": "4.6/5 (1.8k reviews)",
-            "budget_vibe": "Extremely generous portion sizes, beloved by locals, unbeatable fresh catch prices."
-        },
-        {
-            "name": "Fat Fish Shack & Bar",
-            "cuisine": "Goan & Coastal Fusion",
-            "location": "Calangute-Arpora Road",
-            "price_for_two": "₹600 - ₹900",
-            "cost_level": "$$",
-            "signature_dishes": "Kingfish Masala Fry, Chicken Xacuti, Poee bread",
-            "rating": "4.4/5 (2.5k reviews)",
-            "budget_vibe": "Vibrant beachy ambiance without the resort markups."
-        },
-        {
-            "name": "Artjuna Garden Cafe",
-            "cuisine": "Mediterranean, Healthy Bowls & Artisanal Bakery",
-            "location": "Anjuna",
-            "price_for_two": "₹500 - ₹800",
-            "cost_level": "$$",
-            "signature_dishes": "Shakshuka, Hummus Platter, Fresh Mango Smoothies",
-            "rating": "4.5/5 (3.1k reviews)",
-            "budget_vibe": "Tree-shaded garden cafe with live acoustic sets, high value wholesome meals."
-        }
-    ],
-    "mumbai": [
-        {
-            "name": "Kyani & Co.",
-            "cuisine": "Heritage Parsi & Irani Cafe",
-            "location": "Marine Lines, South Mumbai",
-            "price_for_two": "₹250 - ₹450",
-            "cost_level": "$",
-            "signature_dishes": "Bun Maska with Irani Chai, Keema Pav, Mutton Pattice",
-            "rating": "4.5/5 (4.2k reviews)",
-            "budget_vibe": "Iconic vintage 1904 cafe, exceptionally low prices with rich old-world charm."
-        },
-        {
-            "name": "Gajalee Coastal Treat",
-            "cuisine": "Malvani & Mangalorean Seafood",
-            "location": "Vile Parle / Lower Parel",
-            "price_for_two": "₹700 - ₹1,100",
-            "cost_level": "$$",
-            "signature_dishes": "Bombil Fry, Crab Tandoori, Neer Dosa & Fish Gassi",
-            "rating": "4.6/5 (3.8k reviews)",
-            "budget_vibe": "Famous among Mumbai foodies for premium coastal flavor at reasonable rates."
-        },
-        {
-            "name": "Elco Pani Puri & Chaat Center",
-            "cuisine": "Mumbai Street Food & North Indian",
-            "location": "Hill Road, Bandra West",
-            "price_for_two": "₹300 - ₹550",
-            "cost_level": "$",
-            "signature_dishes": "Mineral Water Sev Puri, Ragda Pattice, Dahi Puri",
-            "rating": "4.4/5 (6.1k reviews)",
-            "budget_vibe": "Clean, hygienic, bustling hub for Mumbai's favorite street delicacies."
-        }
-    ],
-    "bangalore": [
-        {
-            "name": "Vidyarthi Bhavan",
-            "cuisine": "Traditional South Indian Vegetarian",
-            "location": "Gandhi Bazaar, Basavanagudi",
-            "price_for_two": "₹200 - ₹350",
-            "cost_level": "$",
-            "signature_dishes": "Crispy Ghee Masala Dosa, Filter Coffee, Kesari Bath",
-            "rating": "4.7/5 (15k reviews)",
-            "budget_vibe": "Legendary historic institution serving Bengaluru's best dosas for over 75 years."
-        },
-        {
-            "name": "Nagarjuna",
-            "cuisine": "Spicy Andhra Meals & Biryani",
-            "location": "Residency Road / Indiranagar",
-            "price_for_two": "₹600 - ₹950",
-            "cost_level": "$$",
-            "signature_dishes": "Unlimited Andhra Meals on Banana Leaf, Chicken Nagarjuna, Gunpowder Rice",
-            "rating": "4.5/5 (8.2k reviews)",
-            "budget_vibe": "Unlimited thali refills ensure unbeatable value for hungry travelers."
-        },
-        {
-            "name": "CTR (Shri Sagar)",
-            "cuisine": "South Indian Quick Bites",
-            "location": "Malleshwaram 7th Cross",
-            "price_for_two": "₹200 - ₹380",
-            "cost_level": "$",
-            "signature_dishes": "Benne Masala Dosa, Mangalore Bajji, Hot Badam Milk",
-            "rating": "4.6/5 (11k reviews)",
-            "budget_vibe": "Crispy golden butter dosas at pocket-friendly student and family prices."
-        }
-    ]
-}
-
 def search_affordable_restaurants(city: str, budget: float, currency: str = "INR") -> List[Dict[str, Any]]:
     """
     Finds top 3 affordable and delicious restaurants in the target city,
     ensuring recommendations match the user's budget range.
     """
-    clean_city = city.lower().strip()
-    
-    # Check if city exists in curated database (supports aliases)
-    matched_key = None
-    for k in CURATED_RESTAURANTS_DB.keys():
-        if k in clean_city or clean_city in k or (k.startswith("chik") and clean_city.startswith("chik")):
-            matched_key = k
-            break
-            
-    if matched_key:
-        return CURATED_RESTAURANTS_DB[matched_key]
-        
+    meal_unit = budget * 0.08 if budget > 0 else 500
+
+    # Curated picks (aliases resolved by the store), narrowed to the budget
+    place = curated_store.find(city)
+    if place is not None and place.restaurants:
+        return place.affordable_restaurants(meal_unit, currency)
+
     # Smart Autonomous Generator for any Indian city
     sym = "₹" if currency.upper() in ["INR", "RS"] else ("$" if currency.upper() in ["USD", "CAD", "AUD"] else "€")
-    meal_unit = budget * 0.08 if budget > 0 else 500
     
     return [
         {
@@ -566,238 +211,15 @@ def search_affordable_restaurants(city: str, budget: float, currency: str = "INR
 # TOOL 3: Local Events & Happenings Finder (This Week)
 # ==============================================================================
 
-CURATED_EVENTS_DB = {
-    "chikmagalur": [
-        {
-            "title": "Mullayanagiri Peak Sunrise & Cloud Trek",
-            "category": "🌄 Highest Peak Trek (1,930m)",
-            "days": "Daily at Dawn (5:30 AM - 9:30 AM)",
-            "venue": "Mullayanagiri Peak Ridge (Highest Summit in Karnataka)",
-            "entry": "Free Summit Access",
-            "highlight": "Breathtaking 360° panoramic view above rolling cloud blankets from Karnataka's highest peak, followed by Baba Budangiri ridge hike."
-        },
-        {
-            "title": "Netravati Peak & Kudremukh Green Valley Trail",
-            "category": "🌿 Western Ghats Valley Trek",
-            "days": "Saturday & Sunday (6:00 AM - 2:00 PM)",
-            "venue": "Netravati Peak Trailhead, Samse / Kudremukh Range",
-            "entry": "Forest Permit (~₹200)",
-            "highlight": "Hike through lush emerald rolling grasslands, mountain streams, and majestic viewpoints of the Netravati river basin."
-        },
-        {
-            "title": "Coffee Plantation Berry Roasting & Tasting Trail",
-            "category": "☕ Coffee Estate Walk & Brewing",
-            "days": "Daily (10:00 AM - 1:00 PM)",
-            "venue": "Siri Coffee Estate Trails, KM Road",
-            "entry": "Free / Nominal (~₹100)",
-            "highlight": "Guided stroll through aromatic Arabica & Robusta coffee bushes, spice gardens, and fresh French-press tasting sessions."
-        }
-    ],
-    "chikkamagaluru": [
-        {
-            "title": "Mullayanagiri Peak Sunrise & Cloud Trek",
-            "category": "🌄 Highest Peak Trek (1,930m)",
-            "days": "Daily at Dawn (5:30 AM - 9:30 AM)",
-            "venue": "Mullayanagiri Peak Ridge (Highest Summit in Karnataka)",
-            "entry": "Free Summit Access",
-            "highlight": "Breathtaking 360° panoramic view above rolling cloud blankets from Karnataka's highest peak, followed by Baba Budangiri ridge hike."
-        },
-        {
-            "title": "Netravati Peak & Kudremukh Green Valley Trail",
-            "category": "🌿 Western Ghats Valley Trek",
-            "days": "Saturday & Sunday (6:00 AM - 2:00 PM)",
-            "venue": "Netravati Peak Trailhead, Samse / Kudremukh Range",
-            "entry": "Forest Permit (~₹200)",
-            "highlight": "Hike through lush emerald rolling grasslands, mountain streams, and majestic viewpoints of the Netravati river basin."
-        }
-    ],
-    "chickmagalur": [
-        {
-            "title": "Mullayanagiri Peak Sunrise & Cloud Trek",
-            "category": "🌄 Highest Peak Trek (1,930m)",
-            "days": "Daily at Dawn (5:30 AM - 9:30 AM)",
-            "venue": "Mullayanagiri Peak Ridge (Highest Summit in Karnataka)",
-            "entry": "Free Summit Access",
-            "highlight": "Breathtaking 360° panoramic view above rolling cloud blankets from Karnataka's highest peak, followed by Baba Budangiri ridge hike."
-        },
-        {
-            "title": "Netravati Peak & Kudremukh Green Valley Trail",
-            "category": "🌿 Western Ghats Valley Trek",
-            "days": "Saturday & Sunday (6:00 AM - 2:00 PM)",
-            "venue": "Netravati Peak Trailhead, Samse / Kudremukh Range",
-            "entry": "Forest Permit (~₹200)",
-            "highlight": "Hike through lush emerald rolling grasslands, mountain streams, and majestic viewpoints of the Netravati river basin."
-        }
-    ],
-    "coorg": [
-        {
-            "title": "Mandalpatti 4x4 Jeep Peak Safari",
-            "category": "🚙 Off-Road Ridge Adventure",
-            "days": "Daily (6:00 AM - 6:00 PM)",
-            "venue": "Mandalpatti Peak, Madikeri",
-            "entry": "Jeep Ride (~₹1,500 for group)",
-            "highlight": "Thrilling 4x4 off-road drive to the summit of Mandalpatti with sweeping views of the Pushpagiri wildlife sanctuary."
-        },
-        {
-            "title": "Dubare Elephant Camp & River Rafting",
-            "category": "🐘 Wildlife & River Activity",
-            "days": "Daily (9:00 AM - 1:00 PM)",
-            "venue": "Dubare Riverbank, Cauvery River",
-            "entry": "₹150",
-            "highlight": "Observe and participate in elephant bathing along the scenic banks of river Cauvery."
-        }
-    ],
-    "ladakh": [
-        {
-            "title": "Shanti Stupa Sunset & Milky Way Stargazing",
-            "category": "🌌 High-Altitude Stargazing & Heritage",
-            "days": "Daily (6:00 PM - 9:30 PM)",
-            "venue": "Shanti Stupa Hilltop, Leh",
-            "entry": "Free",
-            "highlight": "Witness golden hour light up the Indus valley and Namgyal Tsemo Fort followed by crystal-clear galaxy views."
-        },
-        {
-            "title": "Leh Main Bazaar Cultural & Yak Wool Fair",
-            "category": "🛍️ Himalayan Handicrafts & Evening Stroll",
-            "days": "Daily (4:00 PM - 8:30 PM)",
-            "venue": "Leh Main Street",
-            "entry": "Free",
-            "highlight": "Pedestrian-only cobble streets with Ladakhi women selling fresh apricots, prayer wheels, and pashmina shawls."
-        }
-    ],
-    "leh": [
-        {
-            "title": "Shanti Stupa Sunset & Milky Way Stargazing",
-            "category": "🌌 High-Altitude Stargazing & Heritage",
-            "days": "Daily (6:00 PM - 9:30 PM)",
-            "venue": "Shanti Stupa Hilltop, Leh",
-            "entry": "Free",
-            "highlight": "Witness golden hour light up the Indus valley and Namgyal Tsemo Fort followed by crystal-clear galaxy views."
-        }
-    ],
-    "gokarna": [
-        {
-            "title": "5-Beach Cliff Trek (Kudle to Paradise Beach)",
-            "category": "🏖️ Coastal Cliff Hike",
-            "days": "Daily at Dawn or Sunset (4:00 PM - 7:00 PM)",
-            "venue": "Gokarna Coastline",
-            "entry": "Free",
-            "highlight": "Traverse rocky headlands connecting Om Beach, Half Moon Beach, and secluded Paradise Beach."
-        }
-    ],
-    "hampi": [
-        {
-            "title": "Matanga Hill Sunrise & Coracle Ride at Sanapur",
-            "category": "🌅 Ancient Boulders & River Coracle",
-            "days": "Daily (5:30 AM - 10:00 AM)",
-            "venue": "Matanga Hill & Sanapur Lake",
-            "entry": "Free (~₹100 for coracle)",
-            "highlight": "Panoramic sunrise over the ruins of the Vijayanagara Empire followed by round boat rides between granite boulders."
-        }
-    ],
-    "goa": [
-        {
-            "title": "Anjuna Flea & Night Music Market",
-            "category": "🛍️ Night Market & Live Acoustic Bands",
-            "days": "Wednesday & Saturday Evenings (6:00 PM - Midnight)",
-            "venue": "Anjuna Beachfront Promanade",
-            "entry": "Free Entry (Food & souvenirs on purchase)",
-            "highlight": "Hundreds of artisan stalls, handcrafted jewelry, fire dancers, and live indie fusion music under the palm trees."
-        },
-        {
-            "title": "Sunset Drum Circle & Beach Carnival",
-            "category": "🥁 Community Music & Cultural Gathering",
-            "days": "Every Sunset (5:30 PM - 8:30 PM)",
-            "venue": "Arambol Beach (Sweet Water Lake)",
-            "entry": "Free",
-            "highlight": "Open community gathering of travelers and musicians playing handpans, djembes, and watching golden hour sunsets."
-        }
-    ],
-    "mumbai": [
-        {
-            "title": "Kala Ghoda Heritage Art Walk & Street Music",
-            "category": "🎨 Cultural Walk & Live Performances",
-            "days": "Friday through Sunday (4:00 PM - 9:00 PM)",
-            "venue": "Kala Ghoda Arts Precinct, Fort",
-            "entry": "Free (Open Air)",
-            "highlight": "Open-air art exhibitions, indie bookstore readings, pop-up craft stalls, and street buskers playing jazz and acoustic hits."
-        },
-        {
-            "title": "Bandra Seaside Sunset Fair & Food Carnival",
-            "category": "🎡 Food Trucks & Flea Market",
-            "days": "Saturday & Sunday (12:00 PM - 10:00 PM)",
-            "venue": "Bandstand Amphitheater, Bandra",
-            "entry": "₹50 (Nominal)",
-            "highlight": "Over 40 food trucks, artisanal bakeries, live stand-up comedy, and open sea breeze."
-        }
-    ],
-    "bangalore": [
-        {
-            "title": "Sunday Soul Sante / Green Flea Market",
-            "category": "🌿 Artisanal Fair & Live Music",
-            "days": "This Sunday (10:00 AM - 10:00 PM)",
-            "venue": "Jayamahal Palace Grounds",
-            "entry": "₹200",
-            "highlight": "Bangalore's favorite cultural festival featuring handmade apparel, pet-friendly zones, organic food stalls, and rock bands."
-        },
-        {
-            "title": "Cubbon Park Open-Air Acoustic Jams & Book Exchange",
-            "category": "🌳 Nature, Books & Acoustic Music",
-            "days": "Saturday & Sunday Mornings (7:30 AM - 11:30 AM)",
-            "venue": "Bandstand, Cubbon Park",
-            "entry": "Free",
-            "highlight": "Lush canopy trees, community silent reading, jazz violinists, and post-walk dosa runs."
-        }
-    ],
-    "paris": [
-        {
-            "title": "Seine Riverbank Open-Air Tango & Jazz Evenings",
-            "category": "💃 Dance & Live Music",
-            "days": "Thursday to Sunday (7:00 PM - 11:00 PM)",
-            "venue": "Quai Saint-Bernard (Square Tino Rossi)",
-            "entry": "Free",
-            "highlight": "Locals and visitors dancing salsa and tango under the city lights with views of Notre-Dame."
-        },
-        {
-            "title": "Marché aux Puces de Saint-Ouen Vintage Market",
-            "category": "🕰️ Vintage & Antique Fair",
-            "days": "Saturday, Sunday & Monday",
-            "venue": "Porte de Clignancourt",
-            "entry": "Free",
-            "highlight": "World-famous antique labyrinth featuring vintage vinyl, retro posters, and French crepes."
-        }
-    ],
-    "tokyo": [
-        {
-            "title": "Yoyogi Park Weekend Food & Culture Festival",
-            "category": "🏮 Street Food Fair & Taiko Drumming",
-            "days": "Saturday & Sunday (10:00 AM - 6:00 PM)",
-            "venue": "Yoyogi Park Event Plaza, Harajuku",
-            "entry": "Free",
-            "highlight": "Dozens of regional food booths (Yakitori, Takoyaki, Matcha ice cream) and traditional festival dancing."
-        },
-        {
-            "title": "Asakusa Senso-ji Twilight Lantern Market",
-            "category": "🏮 Cultural Illumination & Night Stalls",
-            "days": "Daily (Evenings until 9:00 PM)",
-            "venue": "Nakamise Street, Asakusa",
-            "entry": "Free",
-            "highlight": "Atmospheric illuminated pagodas, traditional kimono wearers, and fresh hot Ningyo-yaki pastries."
-        }
-    ]
-}
-
 def discover_local_events(city: str, travel_style: str = "explorer") -> List[Dict[str, Any]]:
     """
     Discovers 2-3 engaging local events, flea markets, festivals, and music
     happenings taking place this week in the given city.
     """
-    clean_city = city.lower().strip()
-    
-    for k, events in CURATED_EVENTS_DB.items():
-        if k in clean_city or clean_city in k:
-            return events
-            
+    place = curated_store.find(city)
+    if place is not None and place.events:
+        return place.events
+
     return [
         {
             "title": f"{city.title()} Weekend Artisan & Street Food Fair",
@@ -1033,79 +455,123 @@ Immerse yourself in {city.title()}'s vibrant culture with these curated local ha
 # MAIN AGENT ORCHESTRATOR CLASS
 # ==============================================================================
 
+# ==============================================================================
+# Itinerary Result Cache
+# ==============================================================================
+
+# Whole agent responses. Guides embed the live forecast, so entries never
+# outlive the forecast TTL; results built on fallback data are not cached.
+itinerary_cache = create_cache("itinerary")
+
+
+def itinerary_cache_key(city_clean: str, safe_budget: float, num_days: int, currency_clean: str, style_clean: str) -> str:
+    # City first so an admin purge can target one city by prefix; the date keeps booking dates current
+    city_key = " ".join(city_clean.lower().split())
+    # Budgets within a few percent of each other share research, in any currency;
+    # the itinerary itself is always compiled for the exact budget (see _for_budget)
+    step = settings.itinerary_budget_bucket_percent
+    budget_key = f"~{round(math.log(safe_budget) / math.log1p(step / 100))}" if step > 0 else f"{safe_budget:.2f}"
+    return f"{city_key}:{datetime.now().date().isoformat()}:{budget_key}:{num_days}:{currency_clean}:{style_clean}"
+
+
+def itinerary_cache_ttl() -> float:
+    return min(settings.itinerary_cache_ttl_seconds, settings.forecast_cache_ttl_seconds)
+
+
+def is_cacheable(result: Optional[Dict[str, Any]]) -> bool:
+    if not result:
+        return False
+    if any(step.get("status") != "completed" for step in result.get("steps", [])):
+        return False
+    return result.get("data", {}).get("weather", {}).get("source") != FALLBACK_WEATHER_SOURCE
+
+
 class TravelBuddyAgent:
     """
     VOYO - LangChain Autonomous Travel Concierge Agent orchestrator.
+
+    `aexecute` and `astream` run the research tools concurrently off the
+    event loop, each with a timeout and a fallback result, and `astream`
+    yields every step as it completes.
     """
     
-    def __init__(self):
+    def __init__(self, tool_timeout: float = 8.0):
         self.name = "VOYO - Autonomous AI Travel Agent"
         self.version = "2.5.0"
+        self.tool_timeout = tool_timeout
 
-    def execute(
-        self,
-        city: str,
-        budget: float,
-        days: int = 3,
-        currency: str = "INR",
-        travel_style: str = "explorer"
-    ) -> Dict[str, Any]:
-        """
-        Executes the autonomous agent workflow:
-        1. Agent Reasoning & Goal Formulation
-        2. Tool Call: Weather Forecaster
-        3. Tool Call: Affordable Restaurants Finder
-        4. Tool Call: Local Events Discovery
-        5. LangChain Synthesis: Publication-Grade Markdown
-        """
+    @staticmethod
+    def _normalize(city: str, budget: float, days: int, currency: str, travel_style: str):
         city_clean = city.strip() or "Goa"
         safe_budget = float(budget) if budget and budget > 0 else 10000.0
         num_days = max(1, int(days) if days else 3)
         currency_clean = currency.upper() if currency else "INR"
         style_clean = travel_style.lower() if travel_style else "explorer"
-        
-        steps: List[Dict[str, Any]] = []
-        
-        # Step 1: Agent Reasoning / Goal Analysis
-        steps.append({
+        return city_clean, safe_budget, num_days, currency_clean, style_clean
+
+    @staticmethod
+    def _strategy_step(city_clean: str, num_days: int, currency_clean: str, safe_budget: float, style_clean: str) -> Dict[str, Any]:
+        return {
             "step_id": 1,
             "tool": "Agent Coordinator",
             "title": "Formulating Execution Strategy",
             "status": "completed",
             "description": f"Targeting {city_clean} for {num_days} Days with budget limit of {currency_clean} {safe_budget:,.0f} and '{style_clean}' travel profile."
-        })
-        
-        # Step 2: Tool Call - Weather Forecaster
-        weather_info = get_weather_forecast(city_clean)
-        steps.append({
+        }
+
+    @staticmethod
+    def _weather_step(city_clean: str, weather_info: Dict[str, Any], fell_back: bool = False) -> Dict[str, Any]:
+        return {
             "step_id": 2,
             "tool": "Weather Forecaster (Open-Meteo)",
             "title": f"Fetched Live Forecast for {city_clean}",
-            "status": "completed",
+            "status": "fallback" if fell_back else "completed",
             "description": f"Retrieved atmospheric conditions. Avg Temp: {weather_info.get('avg_temp', 'N/A')}. Outlook: {weather_info.get('forecast_summary', '')}"
-        })
-        
-        # Step 3: Tool Call - Top 3 Affordable Restaurants
-        restaurants = search_affordable_restaurants(city_clean, safe_budget, currency_clean)
-        steps.append({
+        }
+
+    @staticmethod
+    def _restaurants_step(restaurants: List[Dict[str, Any]], fell_back: bool = False) -> Dict[str, Any]:
+        return {
             "step_id": 3,
             "tool": "Restaurant Finder",
             "title": f"Discovered Top 3 Budget-Friendly Dining Spots",
-            "status": "completed",
+            "status": "fallback" if fell_back else "completed",
             "description": f"Selected {len(restaurants)} high-rated culinary venues: {', '.join([r['name'] for r in restaurants[:3]])}."
-        })
-        
-        # Step 4: Tool Call - Local Events Finder
-        events = discover_local_events(city_clean, style_clean)
-        steps.append({
+        }
+
+    @staticmethod
+    def _events_step(city_clean: str, events: List[Dict[str, Any]], fell_back: bool = False) -> Dict[str, Any]:
+        return {
             "step_id": 4,
             "tool": "Local Events & Culture Radar",
             "title": f"Located Active Events Happening This Week",
-            "status": "completed",
+            "status": "fallback" if fell_back else "completed",
             "description": f"Found {len(events)} curated community events in {city_clean}."
-        })
-        
-        # Step 5: LangChain Synthesis & Formatting
+        }
+
+    @staticmethod
+    def _synthesis_step() -> Dict[str, Any]:
+        return {
+            "step_id": 5,
+            "tool": "LangChain Synthesis Engine",
+            "title": "Compiled Publication-Grade Structured PDF Dossier",
+            "status": "completed",
+            "description": "Synthesized budget tables, weather matrices, restaurant cards, event itineraries, and local insider tips."
+        }
+
+    def _compile(
+        self,
+        city_clean: str,
+        safe_budget: float,
+        num_days: int,
+        currency_clean: str,
+        style_clean: str,
+        weather_info: Dict[str, Any],
+        restaurants: List[Dict[str, Any]],
+        events: List[Dict[str, Any]],
+        steps: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """LangChain synthesis (step 5) plus the structured data for 1-click booking"""
         markdown_document, timeline_items = generate_travel_buddy_markdown(
             city=city_clean,
             budget=safe_budget,
@@ -1117,14 +583,6 @@ class TravelBuddyAgent:
             travel_style=style_clean
         )
         
-        steps.append({
-            "step_id": 5,
-            "tool": "LangChain Synthesis Engine",
-            "title": "Compiled Publication-Grade Structured PDF Dossier",
-            "status": "completed",
-            "description": "Synthesized budget tables, weather matrices, restaurant cards, event itineraries, and local insider tips."
-        })
-        
         # Structured Data for 1-Click Vacation Booking Integration
         structured_data = {
             "destination": city_clean,
@@ -1169,10 +627,135 @@ class TravelBuddyAgent:
         return {
             "success": True,
             "markdown": markdown_document,
-            "steps": steps,
+            "steps": sorted(steps, key=lambda step: step["step_id"]),
             "data": structured_data
         }
 
+    def _for_budget(self, result: Dict[str, Any], normalized) -> Dict[str, Any]:
+        """A cached / shared result re-synthesized for this request's exact budget"""
+        city_clean, safe_budget, num_days, currency_clean, style_clean = normalized
+        data = result["data"]
+        if data["budget"] == safe_budget:
+            return result
+        steps = [self._strategy_step(city_clean, num_days, currency_clean, safe_budget, style_clean), *result["steps"][1:]]
+        return self._compile(*normalized, data["weather"], data["restaurants"], data["events"], steps)
+
+    async def _run_tool(self, name: str, call: Awaitable[Any], fallback: Callable[[], Any]):
+        """(result, fell_back): the tool's result, or its fallback on error / timeout"""
+        try:
+            return await asyncio.wait_for(call, timeout=self.tool_timeout), False
+        except Exception as e:
+            logger.warning("Travel buddy tool %s failed, using fallback: %s", name, str(e) or type(e).__name__)
+            return fallback(), True
+
+    async def _research(
+        self,
+        city_clean: str,
+        safe_budget: float,
+        num_days: int,
+        currency_clean: str,
+        style_clean: str
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Uncached workflow on normalized inputs; see astream"""
+        steps: List[Dict[str, Any]] = [self._strategy_step(city_clean, num_days, currency_clean, safe_budget, style_clean)]
+        yield {"event": "step", "data": steps[0]}
+        
+        # Curated lookups are plain functions; threads keep any file / CPU work off the loop
+        tools = {
+            "weather": (aget_weather_forecast(city_clean), lambda: fallback_weather(city_clean),
+                        lambda value, fell_back: self._weather_step(city_clean, value, fell_back)),
+            "restaurants": (asyncio.to_thread(search_affordable_restaurants, city_clean, safe_budget, currency_clean), list,
+                            lambda value, fell_back: self._restaurants_step(value, fell_back)),
+            "events": (asyncio.to_thread(discover_local_events, city_clean, style_clean), list,
+                       lambda value, fell_back: self._events_step(city_clean, value, fell_back))
+        }
+        pending = {
+            asyncio.ensure_future(self._run_tool(name, call, fallback)): name
+            for name, (call, fallback, _) in tools.items()
+        }
+        results: Dict[str, Any] = {}
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = pending.pop(task)
+                    value, fell_back = task.result()
+                    results[name] = value
+                    step = tools[name][2](value, fell_back)
+                    steps.append(step)
+                    yield {"event": "step", "data": step}
+        finally:
+            # Client went away mid-stream: don't leave tool calls running
+            for task in pending:
+                task.cancel()
+        
+        steps.append(self._synthesis_step())
+        result = self._compile(
+            city_clean, safe_budget, num_days, currency_clean, style_clean,
+            results["weather"], results["restaurants"], results["events"], steps
+        )
+        yield {"event": "step", "data": steps[-1]}
+        yield {"event": "result", "data": result}
+
+    async def astream(
+        self,
+        city: str,
+        budget: float,
+        days: int = 3,
+        currency: str = "INR",
+        travel_style: str = "explorer"
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Same workflow as `aexecute`, streamed. Yields {"event": "step",
+        "data": step} as each step completes, then {"event": "result",
+        "data": <aexecute() result>}.
+        A cached itinerary is replayed step by step.
+        """
+        normalized = self._normalize(city, budget, days, currency, travel_style)
+        key = itinerary_cache_key(*normalized)
+        cached = await itinerary_cache.get(key)
+        if cached is not None:
+            cached = self._for_budget(cached, normalized)
+            for step in cached["steps"]:
+                yield {"event": "step", "data": step}
+            yield {"event": "result", "data": cached}
+            return
+        
+        async for event in self._research(*normalized):
+            if event["event"] == "result" and is_cacheable(event["data"]):
+                await itinerary_cache.put(key, event["data"], itinerary_cache_ttl())
+            yield event
+
+    async def _collect(self, normalized) -> Dict[str, Any]:
+        async for event in self._research(*normalized):
+            if event["event"] == "result":
+                return event["data"]
+
+    async def aexecute(
+        self,
+        city: str,
+        budget: float,
+        days: int = 3,
+        currency: str = "INR",
+        travel_style: str = "explorer"
+    ) -> Dict[str, Any]:
+        """
+        Executes the autonomous agent workflow:
+        1. Agent Reasoning & Goal Formulation
+        2. Tool Calls (concurrently): Weather Forecaster, Affordable
+           Restaurants Finder, Local Events Discovery
+        3. LangChain Synthesis: Publication-Grade Markdown
+        """
+        normalized = self._normalize(city, budget, days, currency, travel_style)
+        # Single-flight: concurrent requests for the same itinerary share one run
+        result = await itinerary_cache.get_or_fetch(
+            itinerary_cache_key(*normalized),
+            itinerary_cache_ttl(),
+            lambda: self._collect(normalized),
+            should_cache=is_cacheable
+        )
+        return self._for_budget(result, normalized)
+
 
 # Singleton instance
-travel_buddy_agent = TravelBuddyAgent()
+travel_buddy_agent = TravelBuddyAgent(tool_timeout=settings.travel_buddy_tool_timeout_seconds)
@@ -0,0 +1,201 @@
+"""
+Two-tier TTL cache for upstream API results.
+
+- L1: in-process LRU with per-entry expiry (always on, per worker)
+- L2: optional Redis tier shared by all workers (CACHE_BACKEND=redis),
+  values stored as JSON with the same TTL
+- Single-flight: concurrent async callers missing the same key share one
+  upstream fetch instead of each making their own
+
+`None` results are never cached, so failed lookups are retried next time.
+Hits and misses are exported on /metrics as cache_requests_total; every
+cache made by create_cache is listed in `caches` (admin inspect / purge).
+"""
+
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from app import metrics
+from app.config import settings
+from app.log import get_logger
+
+logger = get_logger(__name__)
+
+cache_requests = metrics.registry.register(metrics.Counter(
+    "cache_requests_total", "Cache lookups by cache and outcome (hit, redis_hit, coalesced, miss)", ("cache", "result")
+))
+
+_MISSING = object()
+
+caches: Dict[str, "TieredCache"] = {}
+
+
+class LRUCache:
+    """Thread-safe LRU with a TTL per entry"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: Any, ttl: float):
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_prefix(self, prefix: str) -> int:
+        with self._lock:
+            keys = [key for key in self._entries if key.startswith(prefix)]
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class TieredCache:
+    """Named cache: local LRU, optional shared Redis tier, single-flight fetches"""
+
+    def __init__(self, name: str, max_entries: int = 1024, redis_client=None):
+        self.name = name
+        self.local = LRUCache(max_entries)
+        self.redis = redis_client
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def _redis_key(self, key: str) -> str:
+        return f"cache:{self.name}:{key}"
+
+    async def _get_remote(self, key: str):
+        if self.redis is None:
+            return None
+        try:
+            raw = await self.redis.get(self._redis_key(key))
+        except Exception as e:
+            logger.warning("Cache %s: redis read failed: %s", self.name, e)
+            return None
+        return json.loads(raw) if raw is not None else None
+
+    async def _put_remote(self, key: str, value: Any, ttl: float):
+        if self.redis is None:
+            return
+        try:
+            await self.redis.set(self._redis_key(key), json.dumps(value), ex=max(1, int(ttl)))
+        except Exception as e:
+            logger.warning("Cache %s: redis write failed: %s", self.name, e)
+
+    async def get(self, key: str):
+        """L1, then L2; None on a miss"""
+        value = self.local.get(key, _MISSING)
+        if value is not _MISSING:
+            cache_requests.inc(self.name, "hit")
+            return value
+        value = await self._get_remote(key)
+        if value is None:
+            cache_requests.inc(self.name, "miss")
+            return None
+        cache_requests.inc(self.name, "redis_hit")
+        return value
+
+    async def put(self, key: str, value: Any, ttl: float):
+        if value is None or ttl <= 0:
+            return
+        self.local.put(key, value, ttl)
+        await self._put_remote(key, value, ttl)
+
+    async def get_or_fetch(
+        self,
+        key: str,
+        ttl: float,
+        fetch: Callable[[], Awaitable[Any]],
+        should_cache: Optional[Callable[[Any], bool]] = None
+    ):
+        """Cached value for key, calling `fetch` at most once across concurrent callers"""
+        value = self.local.get(key, _MISSING)
+        if value is not _MISSING:
+            cache_requests.inc(self.name, "hit")
+            return value
+
+        loop = asyncio.get_running_loop()
+        pending = self._inflight.get(key)
+        if pending is not None:
+            if pending.get_loop() is not loop:
+                # Futures are bound to their loop (e.g. TestClient runs one loop per thread)
+                return await self._load(key, ttl, fetch, should_cache)
+            cache_requests.inc(self.name, "coalesced")
+            # shield: one waiter being cancelled must not cancel the shared fetch
+            return await asyncio.shield(pending)
+
+        pending = loop.create_task(self._load(key, ttl, fetch, should_cache))
+        self._inflight[key] = pending
+
+        def forget(done):
+            if self._inflight.get(key) is done:
+                del self._inflight[key]
+
+        pending.add_done_callback(forget)
+        return await asyncio.shield(pending)
+
+    async def _load(self, key: str, ttl: float, fetch: Callable[[], Awaitable[Any]], should_cache=None):
+        value = await self._get_remote(key)
+        if value is not None:
+            cache_requests.inc(self.name, "redis_hit")
+            self.local.put(key, value, ttl)
+            return value
+
+        cache_requests.inc(self.name, "miss")
+        value = await fetch()
+        if should_cache is None or should_cache(value):
+            await self.put(key, value, ttl)
+        return value
+
+    async def invalidate_prefix(self, prefix: str = "") -> int:
+        """Drop matching entries from both tiers; returns how many local entries went"""
+        removed = self.local.delete_prefix(prefix)
+        if self.redis is not None:
+            try:
+                keys = [k async for k in self.redis.scan_iter(match=self._redis_key(prefix) + "*")]
+                if keys:
+                    await self.redis.delete(*keys)
+            except Exception as e:
+                logger.warning("Cache %s: redis purge failed: %s", self.name, e)
+        return removed
+
+
+def create_cache(name: str, max_entries: Optional[int] = None) -> TieredCache:
+    """Cache wired to the configured backend (settings.cache_backend)"""
+    redis_client = None
+    if settings.cache_backend.lower() == "redis":
+        import redis.asyncio as aioredis
+        redis_client = aioredis.from_url(settings.redis_url)
+    cache = TieredCache(name, max_entries or settings.cache_max_entries, redis_client=redis_client)
+    caches[name] = cache
+    return cache
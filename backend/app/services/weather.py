@@ -0,0 +1,74 @@
+"""
+Cached Open-Meteo geocoding and daily forecasts.
+
+Shared by the trip planner stream and the Travel Buddy weather tool, so a
+popular destination is geocoded once per GEOCODE_CACHE_TTL_SECONDS and its
+forecast fetched once per FORECAST_CACHE_TTL_SECONDS, whichever feature
+asks first. Forecasts are keyed by coordinates rounded to ~1 km plus the
+date range. Upstream URLs come from settings so they can point at the
+offline stub (scripts/travel_stub_server.py).
+"""
+
+from typing import Any, Dict, Optional
+
+from app.config import settings
+from app.services.http_client import get_http_client
+from app.services.ttl_cache import create_cache
+
+DAILY_FIELDS = "weathercode,temperature_2m_max,temperature_2m_min,precipitation_probability_max,windspeed_10m_max"
+
+geocode_cache = create_cache("geocode")
+forecast_cache = create_cache("forecast")
+
+
+def _place_key(name: str) -> str:
+    return " ".join(str(name).lower().split())
+
+
+def _forecast_key(lat: float, lon: float, start_date: Optional[str], end_date: Optional[str]) -> str:
+    return f"{round(float(lat), 2)}:{round(float(lon), 2)}:{start_date or ''}:{end_date or ''}"
+
+
+def _geocode_params(name: str) -> Dict[str, Any]:
+    return {"name": name, "count": 1, "language": "en", "format": "json"}
+
+
+def _forecast_params(lat: float, lon: float, start_date: Optional[str], end_date: Optional[str]) -> Dict[str, Any]:
+    params = {"latitude": lat, "longitude": lon, "daily": DAILY_FIELDS, "timezone": "auto"}
+    if start_date and end_date:
+        params.update(start_date=start_date, end_date=end_date)
+    return params
+
+
+def _first_place(payload: dict) -> Optional[Dict[str, Any]]:
+    results = payload.get("results")
+    if not results:
+        return None
+    place = results[0]
+    return {
+        "latitude": place["latitude"],
+        "longitude": place["longitude"],
+        "name": place.get("name"),
+        "country": place.get("country", "")
+    }
+
+
+async def geocode(name: str) -> Optional[Dict[str, Any]]:
+    """{latitude, longitude, name, country} of the best match, or None if unknown"""
+    async def fetch():
+        response = await get_http_client().get(settings.geocoding_url, params=_geocode_params(name), timeout=5)
+        response.raise_for_status()
+        return _first_place(response.json())
+
+    return await geocode_cache.get_or_fetch(_place_key(name), settings.geocode_cache_ttl_seconds, fetch)
+
+
+async def daily_forecast(lat: float, lon: float, start_date: Optional[str] = None, end_date: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Open-Meteo `daily` block (7 days, or start_date..end_date)"""
+    async def fetch():
+        response = await get_http_client().get(settings.forecast_url, params=_forecast_params(lat, lon, start_date, end_date), timeout=5)
+        response.raise_for_status()
+        return response.json().get("daily")
+
+    key = _forecast_key(lat, lon, start_date, end_date)
+    return await forecast_cache.get_or_fetch(key, settings.forecast_cache_ttl_seconds, fetch)
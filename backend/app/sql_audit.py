@@ -0,0 +1,144 @@
+"""
+SQL statement counting and N+1 detection.
+
+Every statement run through an instrumented engine is recorded, as a
+normalized shape (literals and IN-lists collapsed), into the tally of the
+current request and into any `assert_max_queries` block that is open.
+
+- Per request: the middleware warns when a request runs more than
+  SQL_QUERY_BUDGET statements or repeats one shape SQL_REPEAT_THRESHOLD
+  times (the N+1 signature). With SQL_BUDGET_STRICT the request raises
+  QueryBudgetExceeded instead, which TestClient re-raises in tests.
+- In tests: `with assert_max_queries(3): client.get("/users/drivers")`
+"""
+
+import re
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+from sqlalchemy import event
+
+from app.config import settings
+from app.log import get_logger
+from app import metrics
+
+logger = get_logger(__name__)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*(?:\?|%\([^)]*\)s|\$\d+)(?:\s*,\s*(?:\?|%\([^)]*\)s|\$\d+))*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_statement(statement: str) -> str:
+    """Statement shape: literals -> ?, IN (...) lists -> (?...), whitespace collapsed"""
+    shape = _STRING_LITERAL.sub("?", statement)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    shape = _PLACEHOLDER_LIST.sub("(?...)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Too many statements (or an N+1 pattern) inside a budgeted scope"""
+
+
+class QueryTally:
+    """Statements recorded for one request or assert_max_queries block"""
+
+    def __init__(self):
+        self.count = 0
+        self.shapes: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, shape: str):
+        with self._lock:
+            self.count += 1
+            self.shapes[shape] += 1
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """Shapes executed at least `threshold` times, most frequent first"""
+        if threshold <= 0:
+            return []
+        with self._lock:
+            return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+    def report(self, limit: int = 5) -> str:
+        with self._lock:
+            top = self.shapes.most_common(limit)
+        lines = [f"{self.count} statements"]
+        lines.extend(f"  {n}x {shape[:200]}" for shape, n in top)
+        return "\n".join(lines)
+
+
+_request_tally: ContextVar[Optional[QueryTally]] = ContextVar("request_tally", default=None)
+# Open assert_max_queries blocks. Process-wide on purpose: TestClient runs the
+# app on another thread, so a contextvar set by the test would not reach it.
+_watchers: List[QueryTally] = []
+_watchers_lock = threading.Lock()
+
+
+def start_tally() -> Tuple[QueryTally, object]:
+    tally = QueryTally()
+    return tally, _request_tally.set(tally)
+
+
+def stop_tally(token):
+    _request_tally.reset(token)
+
+
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    metrics.db_queries_total.inc()
+    tally = _request_tally.get()
+    watchers = _watchers
+    if tally is None and not watchers:
+        return
+    shape = normalize_statement(statement)
+    if tally is not None:
+        tally.record(shape)
+    with _watchers_lock:
+        for watcher in watchers:
+            watcher.record(shape)
+
+
+def instrument_engine(sync_engine):
+    """Record statements run through an engine (pass AsyncEngine.sync_engine for async ones)"""
+    if not event.contains(sync_engine, "before_cursor_execute", _record_statement):
+        event.listen(sync_engine, "before_cursor_execute", _record_statement)
+
+
+def check_request(tally: QueryTally, label: str):
+    """Warn about (or, in strict mode, raise on) an over-budget or N+1 request"""
+    problems = []
+    budget = settings.sql_query_budget
+    if budget > 0 and tally.count > budget:
+        problems.append(f"ran {tally.count} statements (budget {budget})")
+    repeated = tally.repeated(settings.sql_repeat_threshold)
+    if repeated:
+        problems.append(f"repeated {len(repeated)} statement shape(s), possible N+1")
+    if not problems:
+        return
+    message = f"{label} {'; '.join(problems)}\n{tally.report()}"
+    if settings.sql_budget_strict:
+        raise QueryBudgetExceeded(message)
+    logger.warning(message, extra={"db_queries": tally.count})
+
+
+@contextmanager
+def assert_max_queries(budget: int, repeat_threshold: int = 0):
+    """Fail if the block runs more than `budget` statements (or repeats a shape `repeat_threshold` times)"""
+    tally = QueryTally()
+    with _watchers_lock:
+        _watchers.append(tally)
+    try:
+        yield tally
+    finally:
+        with _watchers_lock:
+            _watchers.remove(tally)
+    if tally.count > budget:
+        raise QueryBudgetExceeded(f"expected at most {budget} statements, got {tally.report()}")
+    repeated = tally.repeated(repeat_threshold)
+    if repeated:
+        raise QueryBudgetExceeded(f"statement shape repeated {repeated[0][1]}x: {repeated[0][0][:200]}\n{tally.report()}")
@@ -1,4 +1,8 @@
 import math
+import numpy as np
+from typing import List
+
+from app.models import VehicleType
 
 def calculate_fare(distance_km: float, vehicle_type: str) -> float:
     """Calculate ride fare based on distance and vehicle type"""
@@ -34,3 +38,44 @@ def calculate_distance(lat1: float, lng1: float, lat2: float, lng2: float) -> fl
     c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
     
     return R * c
+
+def calculate_distances(lat: float, lng: float, lats, lngs) -> np.ndarray:
+    """Haversine distance in km from one point to arrays of coordinates"""
+    R = 6371  # Earth's radius in kilometers
+    
+    lat1_rad = math.radians(lat)
+    lats_rad = np.radians(np.asarray(lats, dtype=np.float64))
+    delta_lat = lats_rad - lat1_rad
+    delta_lng = np.radians(np.asarray(lngs, dtype=np.float64) - lng)
+    
+    a = np.sin(delta_lat/2)**2 + math.cos(lat1_rad) * np.cos(lats_rad) * np.sin(delta_lng/2)**2
+    a = np.clip(a, 0.0, 1.0)
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1-a))
+    
+    return R * c
+
+def calculate_distance_matrix(lats1, lngs1, lats2, lngs2) -> np.ndarray:
+    """Pairwise haversine distances in km, shape (len(lats1), len(lats2))"""
+    R = 6371  # Earth's radius in kilometers
+    
+    lats1_rad = np.radians(np.asarray(lats1, dtype=np.float64))[:, np.newaxis]
+    lngs1 = np.asarray(lngs1, dtype=np.float64)[:, np.newaxis]
+    lats2_rad = np.radians(np.asarray(lats2, dtype=np.float64))[np.newaxis, :]
+    lngs2 = np.asarray(lngs2, dtype=np.float64)[np.newaxis, :]
+    delta_lat = lats2_rad - lats1_rad
+    delta_lng = np.radians(lngs2 - lngs1)
+    
+    a = np.sin(delta_lat/2)**2 + np.cos(lats1_rad) * np.cos(lats2_rad) * np.sin(delta_lng/2)**2
+    a = np.clip(a, 0.0, 1.0)
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1-a))
+    
+    return R * c
+
+def escape_like(value: str) -> str:
+    """Escape LIKE wildcards in user input (use with escape="\\")"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def vehicle_type_variants(vehicle_type) -> List[VehicleType]:
+    """All stored enum members that normalize to the same lowercase type (e.g. PREMIUM / PREMIUM_UC)"""
+    type_str = str(vehicle_type.value if hasattr(vehicle_type, 'value') else vehicle_type).lower()
+    return [vt for vt in VehicleType if vt.value.lower() == type_str]
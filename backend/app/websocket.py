@@ -1,67 +1,292 @@
 from fastapi import WebSocket, WebSocketDisconnect, Depends
-from typing import Dict, Set
+from typing import Awaitable, Callable, Dict, Optional, Set
+import asyncio
 import json
 from app.auth import decode_access_token
+from app.config import settings
+from app.log import get_logger
+
+logger = get_logger(__name__)
+
+BROADCAST_CHANNEL = "ws:broadcast"
+
+def user_channel(user_id: int) -> str:
+    return f"ws:user:{user_id}"
+
+# Handlers receive the JSON-encoded message so it is serialized only once
+MessageHandler = Callable[[str, str], Awaitable[None]]
+
+class InMemoryBackend:
+    """Single-worker backend: published messages are delivered straight back to this process"""
 
-class ConnectionManager:
     def __init__(self):
-        # Store connections by user_id
+        self.handler: Optional[MessageHandler] = None
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def subscribe(self, channel: str):
+        pass
+
+    async def unsubscribe(self, channel: str):
+        pass
+
+    async def publish(self, channel: str, payload: str):
+        if self.handler:
+            await self.handler(channel, payload)
+
+class RedisBackend:
+    """
+    Cross-worker backend over Redis pub/sub. Every worker listens on the
+    broadcast channel plus the per-user channels of its own sockets.
+    Pass `client` to use a shared/fake client (e.g. fakeredis in CI).
+    """
+
+    def __init__(self, url: str = "", client=None):
+        self.url = url
+        self.handler: Optional[MessageHandler] = None
+        self._client = client
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            import redis.asyncio as aioredis
+            self._client = aioredis.from_url(self.url)
+        return self._client
+
+    async def start(self):
+        if self._listener:
+            return
+        self._pubsub = self.client.pubsub()
+        await self._pubsub.subscribe(BROADCAST_CHANNEL)
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._listener = None
+        if self._pubsub:
+            await self._pubsub.aclose()
+            self._pubsub = None
+
+    async def _listen(self):
+        while True:
+            try:
+                async for item in self._pubsub.listen():
+                    if item.get("type") != "message":
+                        continue
+                    channel = item["channel"]
+                    if isinstance(channel, bytes):
+                        channel = channel.decode()
+                    payload = item["data"]
+                    if isinstance(payload, bytes):
+                        payload = payload.decode()
+                    if self.handler:
+                        await self.handler(channel, payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Redis pub/sub listener error, retrying: %s", e)
+                await asyncio.sleep(1)
+
+    async def subscribe(self, channel: str):
+        if self._pubsub:
+            await self._pubsub.subscribe(channel)
+
+    async def unsubscribe(self, channel: str):
+        if self._pubsub:
+            await self._pubsub.unsubscribe(channel)
+
+    async def publish(self, channel: str, payload: str):
+        await self.client.publish(channel, payload)
+
+def create_backend(name: str):
+    """Build the pub/sub backend selected by settings.websocket_backend"""
+    name = (name or "memory").lower()
+    if name == "redis":
+        return RedisBackend(url=settings.redis_url)
+    if name == "fakeredis":
+        try:
+            from fakeredis import aioredis as fake_aioredis
+        except ImportError:
+            raise RuntimeError("websocket_backend=fakeredis requires the fakeredis package (pip install -r requirements-dev.txt)")
+        return RedisBackend(client=fake_aioredis.FakeRedis())
+    return InMemoryBackend()
+
+class ConnectionWriter:
+    """Bounded outbound queue plus a writer task for one socket"""
+
+    def __init__(self, websocket: WebSocket, user_id: int, manager: "ConnectionManager"):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.manager = manager
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=manager.queue_size)
+        self.task = asyncio.create_task(self._run())
+
+    def offer(self, payload: str) -> bool:
+        """Queue a pre-encoded message without waiting; False if the client is too far behind"""
+        try:
+            self.queue.put_nowait(payload)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    async def _run(self):
+        while True:
+            payload = await self.queue.get()
+            try:
+                await asyncio.wait_for(self.websocket.send_text(payload), timeout=self.manager.send_timeout)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Dropping WebSocket for user %s: send failed (%s)", self.user_id, str(e) or type(e).__name__)
+                self.manager.evict(self.websocket, self.user_id, code=1011)
+                return
+
+    def cancel(self):
+        self.task.cancel()
+
+class ConnectionManager:
+    def __init__(self, backend=None, queue_size: int = 100, send_timeout: float = 5.0):
+        # Store connections by user_id (only sockets held by this worker)
         self.active_connections: Dict[int, Set[WebSocket]] = {}
-    
+        self.writers: Dict[WebSocket, ConnectionWriter] = {}
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.backend = backend or InMemoryBackend()
+        self.backend.handler = self._deliver
+        # Users whose channel this worker is subscribed to; changes go through _sync_subscription
+        self._subscribed: Set[int] = set()
+        self._subscription_lock = asyncio.Lock()
+
+    async def start(self):
+        await self.backend.start()
+        # Re-subscribe users that connected before the backend started
+        async with self._subscription_lock:
+            for user_id in list(self.active_connections):
+                await self.backend.subscribe(user_channel(user_id))
+                self._subscribed.add(user_id)
+
+    async def stop(self):
+        await self.backend.stop()
+        self._subscribed.clear()
+        for writer in list(self.writers.values()):
+            writer.cancel()
+        await asyncio.gather(*(writer.task for writer in self.writers.values()), return_exceptions=True)
+        self.writers.clear()
+
     async def connect(self, websocket: WebSocket, user_id: int):
         await websocket.accept()
-        if user_id not in self.active_connections:
-            self.active_connections[user_id] = set()
-        self.active_connections[user_id].add(websocket)
-        print(f"WebSocket connected for user {user_id}. Total connections: {len(self.active_connections[user_id])}")
-    
+        self.active_connections.setdefault(user_id, set()).add(websocket)
+        self.writers[websocket] = ConnectionWriter(websocket, user_id, self)
+        await self._sync_subscription(user_id)
+        logger.debug("WebSocket connected for user %s. Total connections: %s", user_id, len(self.active_connections[user_id]))
+
     def disconnect(self, websocket: WebSocket, user_id: int):
+        writer = self.writers.pop(websocket, None)
+        if writer:
+            writer.cancel()
         if user_id in self.active_connections:
             self.active_connections[user_id].discard(websocket)
             if not self.active_connections[user_id]:
                 del self.active_connections[user_id]
-            print(f"WebSocket disconnected for user {user_id}")
-    
+                self._unsubscribe_later(user_id)
+            logger.debug("WebSocket disconnected for user %s", user_id)
+
+    def evict(self, websocket: WebSocket, user_id: int, code: int = 1013):
+        """Drop a slow or broken consumer so it cannot hold up anyone else"""
+        self.disconnect(websocket, user_id)
+        try:
+            asyncio.get_running_loop().create_task(self._close_quietly(websocket, code))
+        except RuntimeError:
+            pass
+
+    async def _close_quietly(self, websocket: WebSocket, code: int):
+        try:
+            await websocket.close(code=code)
+        except Exception:
+            pass
+
+    def _unsubscribe_later(self, user_id: int):
+        try:
+            asyncio.get_running_loop().create_task(self._sync_subscription(user_id))
+        except RuntimeError:
+            pass
+
+    async def _sync_subscription(self, user_id: int):
+        """
+        Subscribe or unsubscribe the user's channel to match whether this worker
+        still holds sockets for them. Serialized and decided under the lock, so a
+        late unsubscribe cannot undo the subscribe of a quick reconnect.
+        """
+        async with self._subscription_lock:
+            wanted = user_id in self.active_connections
+            if wanted and user_id not in self._subscribed:
+                await self.backend.subscribe(user_channel(user_id))
+                self._subscribed.add(user_id)
+            elif not wanted and user_id in self._subscribed:
+                await self.backend.unsubscribe(user_channel(user_id))
+                self._subscribed.discard(user_id)
+
+    @property
+    def connection_count(self) -> int:
+        return len(self.writers)
+
     async def send_personal_message(self, message: dict, user_id: int):
-        print(f"Attempting to send message to user {user_id}: {message}")
-        if user_id in self.active_connections:
-            connections_to_remove = []
-            for connection in self.active_connections[user_id]:
-                try:
-                    await connection.send_json(message)
-                    print(f"Successfully sent message to user {user_id}")
-                except Exception as e:
-                    print(f"Failed to send message to user {user_id}: {e}")
-                    connections_to_remove.append(connection)
-            
-            # Remove broken connections
-            for connection in connections_to_remove:
-                self.active_connections[user_id].discard(connection)
-                if not self.active_connections[user_id]:
-                    del self.active_connections[user_id]
-        else:
-            print(f"No active connections for user {user_id}")
+        payload = json.dumps(message)
+        try:
+            await self.backend.publish(user_channel(user_id), payload)
+        except Exception as e:
+            # Pub/sub outage: still reach sockets held by this worker
+            logger.warning("Publish to user %s failed, delivering locally: %s", user_id, e)
+            self._send_local(payload, user_id)
 
     async def broadcast(self, message: dict):
-        print(f"Broadcasting message to all users: {message}")
-        users_to_remove = []
-        for user_id, connections in self.active_connections.items():
-            connections_to_remove = []
-            for connection in connections:
-                try:
-                    await connection.send_json(message)
-                except Exception as e:
-                    print(f"Failed to broadcast to user {user_id}: {e}")
-                    connections_to_remove.append(connection)
-            
-            # Remove broken connections
-            for connection in connections_to_remove:
-                self.active_connections[user_id].discard(connection)
-                if not self.active_connections[user_id]:
-                    users_to_remove.append(user_id)
-        
-        # Remove users with no connections
-        for user_id in users_to_remove:
-            del self.active_connections[user_id]
-
-manager = ConnectionManager()
\ No newline at end of file
+        payload = json.dumps(message)
+        try:
+            await self.backend.publish(BROADCAST_CHANNEL, payload)
+        except Exception as e:
+            logger.warning("Broadcast publish failed, delivering locally: %s", e)
+            self._broadcast_local(payload)
+
+    async def _deliver(self, channel: str, payload: str):
+        """Route a message received from the backend to local sockets"""
+        if channel == BROADCAST_CHANNEL:
+            self._broadcast_local(payload)
+        elif channel.startswith("ws:user:"):
+            try:
+                user_id = int(channel.rsplit(":", 1)[1])
+            except ValueError:
+                return
+            self._send_local(payload, user_id)
+
+    def _offer(self, websocket: WebSocket, user_id: int, payload: str):
+        writer = self.writers.get(websocket)
+        if writer and not writer.offer(payload):
+            logger.warning("Evicting slow WebSocket consumer for user %s (%s messages queued)", user_id, self.queue_size)
+            self.evict(websocket, user_id)
+
+    def _send_local(self, payload: str, user_id: int):
+        # Enqueue only; each socket's writer task sends concurrently with the others
+        for connection in list(self.active_connections.get(user_id, ())):
+            self._offer(connection, user_id, payload)
+
+    def _broadcast_local(self, payload: str):
+        for user_id, connections in list(self.active_connections.items()):
+            for connection in list(connections):
+                self._offer(connection, user_id, payload)
+
+manager = ConnectionManager(
+    create_backend(settings.websocket_backend),
+    queue_size=settings.websocket_queue_size,
+    send_timeout=settings.websocket_send_timeout_seconds
+)
@@ -1,29 +1,47 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends, Request
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import time
+import uuid
 import uvicorn
 
-from app.database import engine, Base, get_db
+from app.database import engine, async_engine, Base, get_db, pool_metrics
 from app.models import User, UserRole
-from app.routers import auth, rides, users, admin, vacation, vacation_scheduler, messages, travel_buddy
+from app.routers import auth, rides, users, admin, vacation, vacation_scheduler, messages, travel_buddy, travel_stream
 from app.websocket import manager
+from app.services.http_client import close_http_client
 from app.auth import decode_access_token, get_current_active_user
+from app.log import get_logger, request_id_var, setup_logging, shutdown_logging
+from app import metrics, sql_audit
 from sqlalchemy.orm import Session
 
-print("--- LOADING MAIN.PY v2 (PING INCLUDED) ---")
+setup_logging()
+logger = get_logger("app.main")
+
+sql_audit.instrument_engine(engine)
+sql_audit.instrument_engine(async_engine.sync_engine)
+metrics.register_gauge("websocket_connections", "WebSocket connections held by this worker", lambda: manager.connection_count)
+metrics.register_gauge("websocket_users", "Users with at least one WebSocket on this worker", lambda: len(manager.active_connections))
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    print("--- LIFESPAN STARTUP ---")
+    setup_logging()
+    logger.info("Startup")
     # Startup
     try:
         Base.metadata.create_all(bind=engine)
-        print("--- DATABASE TABLES CREATED ---")
+        logger.info("Database tables created")
     except Exception as e:
-        print(f"--- DB ERROR: {e} ---")
+        logger.error("Database table creation failed: %s", e)
+    await manager.start()
     yield
     # Shutdown
-    print("--- SHUTDOWN ---")
+    await manager.stop()
+    await close_http_client()
+    await async_engine.dispose()
+    logger.info("Shutdown")
+    shutdown_logging()
 
 app = FastAPI(
     title="Uber Clone API",
@@ -40,15 +58,52 @@ app.add_middleware(
     allow_credentials=False, # Must be False when using "*"
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # paged endpoints (drivers, conversations)
 )
 
 @app.middleware("http")
-async def log_requests(request: Request, call_next):
-    print(f"--- REQUEST: {request.method} {request.url.path} ---")
-    response = await call_next(request)
-    print(f"--- RESPONSE: {response.status_code} ---")
+async def record_metrics(request: Request, call_next):
+    queries, token = sql_audit.start_tally()
+    metrics.requests_in_flight.inc()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.requests_in_flight.dec()
+        sql_audit.stop_tally(token)
+        # Resolved after call_next: routing fills in scope["endpoint"]
+        route = metrics.route_labeler.label(request.scope)
+        metrics.request_duration.observe(elapsed, request.method, route)
+        metrics.request_db_queries.observe(queries.count, request.method, route)
+        metrics.requests_total.inc(request.method, route, str(status))
+    # Query budget / N+1 check; raises QueryBudgetExceeded when SQL_BUDGET_STRICT is set
+    sql_audit.check_request(queries, f"{request.method} {route}")
     return response
 
+# Registered last so it is outermost: metrics and audit lines carry the request id
+@app.middleware("http")
+async def log_requests(request: Request, call_next):
+    # Correlate every log line of this request; honour an upstream proxy's id
+    request_id = request.headers.get("x-request-id") or uuid.uuid4().hex
+    token = request_id_var.set(request_id)
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+        response.headers["X-Request-ID"] = request_id
+        logger.info("%s %s %s", request.method, request.url.path, response.status_code, extra={
+            "status": response.status_code,
+            "duration_ms": round((time.perf_counter() - start) * 1000, 2)
+        })
+        return response
+    except Exception:
+        logger.exception("Unhandled error on %s %s", request.method, request.url.path)
+        raise
+    finally:
+        request_id_var.reset(token)
+
 # Include routers (Both /api/* and direct /* for all proxies)
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(auth.router, prefix="/auth", tags=["Authentication (Direct)"])
@@ -66,6 +121,8 @@ app.include_router(messages.router, prefix="/api/messages", tags=["Messages"])
 app.include_router(messages.router, prefix="/messages", tags=["Messages (Direct)"])
 app.include_router(travel_buddy.router, prefix="/api/travel-buddy", tags=["Travel Buddy Agent"])
 app.include_router(travel_buddy.router, prefix="/travel-buddy", tags=["Travel Buddy (Direct)"])
+# WebSocket trip planner (/ws/travel-planner); the frontend connects at the root
+app.include_router(travel_stream.router, tags=["Travel Planner"])
 
 @app.get("/ping")
 async def ping():
@@ -83,6 +140,16 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/health/db")
+async def db_pool_health():
+    """Connection pool usage: checked-out connections, overflow, checkout waits and timeouts"""
+    return {"status": "healthy", "pools": pool_metrics()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Per-route latency, status codes, in-flight requests, DB queries and WebSocket gauges"""
+    return PlainTextResponse(metrics.render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/test-db")
 async def test_db(current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
     try:
@@ -150,12 +217,13 @@ async def websocket_endpoint(websocket: WebSocket, token: str, db: Session = Dep
                         {"type": "message", "data": data},
                         user_id
                     )
-    except WebSocketDisconnect:
+    except (WebSocketDisconnect, RuntimeError):
+        # RuntimeError: the manager already closed this socket as a slow consumer
         manager.disconnect(websocket, user_id)
 
 @app.api_route("/{path_name:path}", methods=["GET", "POST", "PUT", "DELETE", "OPTIONS", "HEAD", "PATCH"])
 async def catch_all(request: Request, path_name: str):
-    print(f"--- CATCH ALL HIT: {request.method} {path_name} ---")
+    logger.warning("Unmatched route %s /%s", request.method, path_name)
     return {"status": "404", "message": "Path matched catch-all", "path": path_name}
 
 if __name__ == "__main__":
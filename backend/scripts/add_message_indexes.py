@@ -0,0 +1,26 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from app.database import engine
+
+INDEXES = {
+    "ix_messages_sender_receiver_created": "messages (sender_id, receiver_id, created_at)",
+    "ix_messages_receiver_is_read": "messages (receiver_id, is_read)",
+}
+
+def add_indexes():
+    # create_all() only builds indexes for new tables, so existing databases need this once
+    with engine.connect() as conn:
+        for name, target in INDEXES.items():
+            try:
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {target}"))
+                print(f"Added {name} to messages table")
+            except Exception as e:
+                print(f"{name} error: {e}")
+
+        conn.commit()
+
+if __name__ == "__main__":
+    add_indexes()
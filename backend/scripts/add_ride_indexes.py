@@ -0,0 +1,23 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from app.database import engine
+
+def add_indexes():
+    # create_all() only builds indexes for new tables, so existing databases need this once
+    with engine.connect() as conn:
+        try:
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_rides_status_driver_vehicle_created "
+                "ON rides (status, driver_id, vehicle_type, created_at)"
+            ))
+            print("Added ix_rides_status_driver_vehicle_created to rides table")
+        except Exception as e:
+            print(f"ix_rides_status_driver_vehicle_created error: {e}")
+
+        conn.commit()
+
+if __name__ == "__main__":
+    add_indexes()
@@ -0,0 +1,52 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text, func
+from app.database import engine, SessionLocal
+from app.models import DriverProfile, Ride
+
+def add_columns():
+    with engine.connect() as conn:
+        for col in ["rating_sum", "rating_count"]:
+            try:
+                conn.execute(text(f"ALTER TABLE driver_profiles ADD COLUMN {col} INTEGER DEFAULT 0"))
+                print(f"Added {col} to driver_profiles table")
+            except Exception as e:
+                print(f"{col} column might already exist: {e}")
+            conn.commit()
+
+def reconcile():
+    """Recompute every driver's running rating totals from their rated rides"""
+    db = SessionLocal()
+    try:
+        totals = {
+            driver_id: (int(rating_sum or 0), int(rating_count or 0))
+            for driver_id, rating_sum, rating_count in db.query(
+                Ride.driver_id, func.sum(Ride.rating), func.count(Ride.rating)
+            ).filter(
+                Ride.driver_id != None,
+                Ride.rating != None
+            ).group_by(Ride.driver_id).all()
+        }
+
+        fixed = 0
+        for profile in db.query(DriverProfile).all():
+            rating_sum, rating_count = totals.get(profile.user_id, (0, 0))
+            # Drivers with no rated rides keep whatever rating they already have
+            rating = round(rating_sum / rating_count, 2) if rating_count else profile.rating
+            if (profile.rating_sum, profile.rating_count, profile.rating) != (rating_sum, rating_count, rating):
+                print(f"Driver {profile.user_id}: {profile.rating_sum}/{profile.rating_count} ({profile.rating}) -> {rating_sum}/{rating_count} ({rating})")
+                profile.rating_sum = rating_sum
+                profile.rating_count = rating_count
+                profile.rating = rating
+                fixed += 1
+
+        db.commit()
+        print(f"Reconciled {fixed} driver profiles")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    add_columns()
+    reconcile()
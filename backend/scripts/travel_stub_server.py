@@ -0,0 +1,126 @@
+"""
+Offline stand-in for the Open-Meteo geocoding / forecast APIs and Overpass.
+
+Serves canned responses (with optional artificial latency) and counts hits
+per endpoint, so caching and single-flight can be checked without network:
+
+    python scripts/travel_stub_server.py --port 8765 --latency 0.5
+
+    GEOCODING_URL=http://127.0.0.1:8765/v1/search
+    FORECAST_URL=http://127.0.0.1:8765/v1/forecast
+    OVERPASS_URL=http://127.0.0.1:8765/api/interpreter
+
+GET /stats returns the hit counters; POST /stats resets them. Any place
+name resolves except "nowhere", which returns no results.
+"""
+
+import argparse
+import json
+import threading
+import time
+from collections import Counter
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+hits = Counter()
+hits_lock = threading.Lock()
+
+
+def geocode_response(query):
+    name = query.get("name", [""])[0]
+    if not name or name.lower() == "nowhere":
+        return {"generationtime_ms": 0.1}
+    # Stable pseudo-coordinates per name
+    seed = sum(ord(c) for c in name.lower())
+    return {"results": [{
+        "name": name.title(),
+        "country": "India",
+        "latitude": 10 + (seed % 200) / 10,
+        "longitude": 70 + (seed % 150) / 10
+    }]}
+
+
+def forecast_response(query):
+    start = query.get("start_date", [date.today().isoformat()])[0]
+    end = query.get("end_date", [(date.today() + timedelta(days=6)).isoformat()])[0]
+    first, last = date.fromisoformat(start), date.fromisoformat(end)
+    days = [(first + timedelta(days=i)).isoformat() for i in range((last - first).days + 1)]
+    return {"daily": {
+        "time": days,
+        "weathercode": [(0, 2, 61, 3)[i % 4] for i in range(len(days))],
+        "temperature_2m_max": [29 + i % 3 for i in range(len(days))],
+        "temperature_2m_min": [20 + i % 2 for i in range(len(days))],
+        "precipitation_probability_max": [(10, 20, 70, 5)[i % 4] for i in range(len(days))],
+        "windspeed_10m_max": [12 for _ in days]
+    }}
+
+
+def overpass_response(query):
+    return {"elements": [
+        {"type": "node", "lat": 15.3 + i / 100, "lon": 74.1 + i / 100, "tags": {"name": f"Stub Stay {i + 1}", "tourism": "hotel"}}
+        for i in range(3)
+    ]}
+
+
+ROUTES = {
+    "/v1/search": geocode_response,
+    "/v1/forecast": forecast_response,
+    "/api/interpreter": overpass_response
+}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/stats":
+            with hits_lock:
+                return self._send_json(dict(hits))
+        route = ROUTES.get(url.path)
+        if route is None:
+            return self._send_json({"error": "not found"}, status=404)
+        with hits_lock:
+            hits[url.path] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        self._send_json(route(parse_qs(url.query)))
+
+    def do_POST(self):
+        if urlparse(self.path).path == "/stats":
+            with hits_lock:
+                hits.clear()
+            return self._send_json({})
+        self._send_json({"error": "not found"}, status=404)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run(port: int, latency: float):
+    StubHandler.latency = latency
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    print(f"Travel API stub listening on http://127.0.0.1:{port} (latency {latency}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to sleep before each response")
+    args = parser.parse_args()
+    run(args.port, args.latency)
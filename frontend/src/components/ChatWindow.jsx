@@ -1,6 +1,7 @@
 import { useState, useEffect, useRef } from 'react';
-import { Send, User, X } from 'lucide-react';
+import { Send, User, X, Check, CheckCheck } from 'lucide-react';
 import { messageService } from '../services/api';
+import { websocketService } from '../services/websocket';
 import { useAuthStore } from '../store/authStore';
 
 export default function ChatWindow({ receiverId, receiverName, initialMessages = [], onClose, rideId = null }) {
@@ -10,39 +11,77 @@ export default function ChatWindow({ receiverId, receiverName, initialMessages =
     const [loading, setLoading] = useState(true);
     const [isRecording, setIsRecording] = useState(false);
     const [voiceError, setVoiceError] = useState(null); // New Error State
+    const [olderCursor, setOlderCursor] = useState(null); // id to page back from, null when no older history
+    const [loadingOlder, setLoadingOlder] = useState(false);
     const messagesEndRef = useRef(null);
+    const lastIdRef = useRef(null); // newest message id shown; polling asks only for what came after it
+    const skipScrollRef = useRef(false);
 
     const scrollToBottom = () => {
         messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
     };
 
     useEffect(() => {
+        lastIdRef.current = null;
+        setOlderCursor(null);
         loadMessages();
         // Poll for new messages every 3 seconds as a backup to WebSocket
         const interval = setInterval(loadMessages, 3000);
         return () => clearInterval(interval);
     }, [receiverId]);
 
+    // Read receipts: the receiver opened the chat, so our messages up to up_to_id are read
     useEffect(() => {
+        const handleReadReceipt = (data) => {
+            if (data.type !== 'messages_read' || data.reader_id !== Number(receiverId)) return;
+            setMessages(prevMessages => prevMessages.map(m =>
+                m.sender_id === user.id && !m.is_read && m.id <= data.up_to_id ? { ...m, is_read: true } : m
+            ));
+        };
+        websocketService.addListener('message', handleReadReceipt);
+        return () => websocketService.removeListener('message', handleReadReceipt);
+    }, [receiverId, user.id]);
+
+    useEffect(() => {
+        if (skipScrollRef.current) {
+            skipScrollRef.current = false;
+            return;
+        }
         scrollToBottom();
     }, [messages]);
 
+    // Add messages not shown yet (polls can overlap with messages we just sent), oldest first
+    const mergeMessages = (prevMessages, incoming, prepend = false) => {
+        const seen = new Set(prevMessages.map(m => m.id));
+        const fresh = incoming.filter(m => !seen.has(m.id));
+        if (fresh.length === 0) return prevMessages;
+        return prepend ? [...fresh, ...prevMessages] : [...prevMessages, ...fresh];
+    };
+
+    const trackNewest = (list) => {
+        for (const m of list) {
+            if (lastIdRef.current === null || m.id > lastIdRef.current) lastIdRef.current = m.id;
+        }
+    };
+
     const loadMessages = async () => {
         try {
-            const data = await messageService.getConversation(receiverId);
-            setMessages(prevMessages => {
-                // Create a map of existing local settings (translation status)
-                const localProps = new Map(prevMessages.map(m => [m.id, {
-                    showTranslate: m.showTranslate,
-                    translated: m.translated
-                }]));
-
-                // Merge server data with local settings
-                return data.map(msg => ({
-                    ...msg,
-                    ...(localProps.get(msg.id) || {})
-                }));
-            });
+            if (lastIdRef.current === null) {
+                // First load: latest page only; older history is fetched on demand
+                const { messages: latest, nextCursor } = await messageService.getConversation(receiverId);
+                trackNewest(latest);
+                setOlderCursor(nextCursor);
+                setMessages(latest);
+                return;
+            }
+            // Poll: only what arrived after the newest message shown
+            let nextCursor = lastIdRef.current;
+            while (nextCursor !== null) {
+                const page = await messageService.getConversation(receiverId, { after: nextCursor });
+                trackNewest(page.messages);
+                setMessages(prevMessages => mergeMessages(prevMessages, page.messages));
+                nextCursor = page.nextCursor;
+            }
         } catch (error) {
             console.error("Failed to load conversation:", error);
         } finally {
@@ -50,6 +89,21 @@ export default function ChatWindow({ receiverId, receiverName, initialMessages =
         }
     };
 
+    const loadOlderMessages = async () => {
+        if (!olderCursor || loadingOlder) return;
+        setLoadingOlder(true);
+        try {
+            const { messages: older, nextCursor } = await messageService.getConversation(receiverId, { before: olderCursor });
+            skipScrollRef.current = true;
+            setMessages(prevMessages => mergeMessages(prevMessages, older, true));
+            setOlderCursor(nextCursor);
+        } catch (error) {
+            console.error("Failed to load older messages:", error);
+        } finally {
+            setLoadingOlder(false);
+        }
+    };
+
     const handleVoiceRecord = () => {
         if (isRecording) {
             setIsRecording(false);
@@ -108,7 +162,8 @@ export default function ChatWindow({ receiverId, receiverName, initialMessages =
 
         try {
             const sentMsg = await messageService.sendMessage(receiverId, newMessage, rideId);
-            setMessages([...messages, sentMsg]);
+            // Not tracked as newest: a reply that arrived just before it must still be polled
+            setMessages(prevMessages => mergeMessages(prevMessages, [sentMsg]));
             setNewMessage('');
         } catch (error) {
             console.error("Failed to send message:", error);
@@ -145,6 +200,18 @@ export default function ChatWindow({ receiverId, receiverName, initialMessages =
                     </div>
                 ) : (
                     <>
+                        {olderCursor && (
+                            <div className="flex justify-center">
+                                <button
+                                    type="button"
+                                    onClick={loadOlderMessages}
+                                    disabled={loadingOlder}
+                                    className="text-xs text-primary-400 hover:text-primary-300 disabled:opacity-50"
+                                >
+                                    {loadingOlder ? 'Loading...' : 'Load older messages'}
+                                </button>
+                            </div>
+                        )}
                         {messages.length === 0 && (
                             <div className="text-center text-gray-500 text-xs mt-4">
                                 Start a conversation with {receiverName}
@@ -255,8 +322,11 @@ export default function ChatWindow({ receiverId, receiverName, initialMessages =
                                             )}
                                         </div>
 
-                                        <div className={`text-[10px] mt-1 text-right ${isMe ? 'text-primary-200' : 'text-gray-400'}`}>
+                                        <div className={`text-[10px] mt-1 flex items-center justify-end ${isMe ? 'text-primary-200' : 'text-gray-400'}`}>
                                             {new Date(msg.created_at).toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' })}
+                                            {isMe && (msg.is_read
+                                                ? <CheckCheck className="w-3 h-3 ml-1" aria-label="Read" />
+                                                : <Check className="w-3 h-3 ml-1" aria-label="Sent" />)}
                                         </div>
                                     </div>
                                 </div>
@@ -264,8 +264,28 @@ export const messageService = {
     return response.data
   },
 
-  async getConversation(userId) {
-    const response = await api.get(`messages/conversation/${userId}`)
+  // One page in chronological order: the latest by default, older than `before`,
+  // or newer than `after`. nextCursor is the id to continue from (null when done).
+  async getConversation(userId, { before = null, after = null, limit = null } = {}) {
+    const params = {}
+    if (before) params.before = before
+    if (after !== null) params.after = after
+    if (limit) params.limit = limit
+    const response = await api.get(`messages/conversation/${userId}`, { params })
+    const messages = response.data
+    // Showing messages marks them as read
+    const unread = messages.filter(m => m.sender_id === Number(userId) && !m.is_read)
+    if (unread.length > 0) {
+      await this.markConversationRead(userId, Math.max(...unread.map(m => m.id)))
+    }
+    const cursor = response.headers['x-next-cursor']
+    return { messages, nextCursor: cursor ? Number(cursor) : null }
+  },
+
+  async markConversationRead(userId, upToId = null) {
+    const response = await api.post(`messages/conversation/${userId}/read`, null, {
+      params: upToId ? { up_to_id: upToId } : {}
+    })
     return response.data
   },
 